@@ -1,16 +1,25 @@
-from flask import Flask, send_from_directory
+from flask import Flask
 from app.config import Config
 from .extensions import db, migrate, jwt, cors, mail
+from .utils.database import engine_options
 from .routes.category import category_bp
 from .routes.product import product_type_bp, product_bp
 from .routes.supplier import supplier_bp
 from .routes.brand import brand_bp
+from .routes.order import order_bp
+from .routes.chat import chat_bp
+from .routes.images import images_bp
+from .routes.metrics import metrics_bp
 
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config))
+    if app.config.get("DATABASE_REPLICA_URL"):
+        replica_url = app.config["DATABASE_REPLICA_URL"]
+        app.config.setdefault("SQLALCHEMY_BINDS", {"replica": {"url": replica_url, **engine_options(replica_url, app.config)}})
     # app.config['SQLALCHEMY_DATABASE_URI']= Config.SQLALCHEMY_DATABASE_URI
     db.init_app(app)
 
@@ -25,12 +34,6 @@ def create_app():
 
     mail.init_app(app)
 
-    @app.route('/images/<filename>', methods=['GET'])
-    def uploaded_file(filename):
-        return send_from_directory('images', filename, as_attachment=False)
-
-
-
     from app.routes.auth import auth_bp
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(category_bp)  # /categories/
@@ -38,6 +41,16 @@ def create_app():
     app.register_blueprint(supplier_bp)
     app.register_blueprint(product_bp)
     app.register_blueprint(brand_bp)
+    app.register_blueprint(order_bp)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(images_bp)
+    app.register_blueprint(metrics_bp)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.utils.query_stats import register_query_stats
+    register_query_stats(app)
 
     # db.create_all()
 
@@ -0,0 +1,62 @@
+import click
+
+
+def register_commands(app):
+    """Attach background job commands to the `flask` CLI"""
+
+    @app.cli.command("order-events")
+    @click.option("--batch-size", default=500, show_default=True, help="Events applied per transaction.")
+    @click.option("--interval", default=1.0, show_default=True, help="Seconds to sleep when idle.")
+    @click.option("--once", is_flag=True, help="Exit once the event log is drained.")
+    def order_events(batch_size, interval, once):
+        """Apply order events to seller dashboard aggregates."""
+        from app.services.order_events import run_order_event_consumer
+        run_order_event_consumer(batch_size=batch_size, idle_interval=interval, once=once)
+
+    @app.cli.command("email-worker")
+    @click.option("--batch-size", default=100, show_default=True, help="Emails claimed per batch.")
+    @click.option("--concurrency", default=None, type=int, help="Parallel SMTP connections [EMAIL_WORKER_CONCURRENCY].")
+    @click.option("--interval", default=2.0, show_default=True, help="Seconds to sleep when idle.")
+    @click.option("--once", is_flag=True, help="Exit once nothing is due.")
+    def email_worker(batch_size, concurrency, interval, once):
+        """Deliver queued emails from the outbox."""
+        from app.services.email_service import run_email_worker
+        run_email_worker(batch_size=batch_size, concurrency=concurrency, idle_interval=interval, once=once)
+
+    @app.cli.command("gc-uploads")
+    @click.option("--grace-hours", default=24.0, show_default=True, help="Keep unreferenced files younger than this.")
+    @click.option("--chunk-size", default=5000, show_default=True, help="Rows read per reference query.")
+    @click.option("--dry-run", is_flag=True, help="Report what would be deleted without deleting.")
+    def gc_uploads(grace_hours, chunk_size, dry_run):
+        """Delete uploaded files that no row references."""
+        from app.services.upload_gc import collect_garbage
+        report = collect_garbage(grace_seconds=grace_hours * 3600, dry_run=dry_run, chunk_size=chunk_size)
+        click.echo(
+            f"Scanned {report['scanned']} files, "
+            f"{'would delete' if dry_run else 'deleted'} {report['deleted']} "
+            f"({report['bytesReclaimed'] / (1024 * 1024):.1f} MB)"
+        )
+
+    @app.cli.command("sweep-rate-limits")
+    @click.option("--idle-hours", default=24.0, show_default=True, help="Drop buckets untouched for this long.")
+    def sweep_rate_limits(idle_hours):
+        """Delete idle buckets of the shared postgres rate limiter."""
+        from app.extensions import db
+        from app.utils.rate_limit import PostgresBackend
+        deleted = PostgresBackend(db.engine).sweep(idle_seconds=idle_hours * 3600)
+        click.echo(f"Deleted {deleted} idle rate-limit buckets")
+
+    @app.cli.command("sweep-emails")
+    @click.option("--retention-days", default=7.0, show_default=True, help="Keep sent and failed emails this long.")
+    def sweep_emails(retention_days):
+        """Drop lapsed unsent emails and delete old delivered or failed ones."""
+        from app.services.email_service import sweep_outbox
+        expired, deleted = sweep_outbox(retention_days=retention_days)
+        click.echo(f"Expired {expired} unsent emails, deleted {deleted} old emails")
+
+    @app.cli.command("sweep-tokens")
+    def sweep_tokens():
+        """Delete expired OTP codes and password-reset tokens."""
+        from app.services.token_store import get_token_store
+        deleted = get_token_store().sweep()
+        click.echo(f"Deleted {deleted} expired tokens")
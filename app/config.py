@@ -7,6 +7,25 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database connection pool, per process (see app/utils/database.py)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds; below server/proxy idle timeouts
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+    DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # ms, postgres only; 0 disables (needed behind PgBouncer)
+    DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "swiftsupply-api")  # shown in pg_stat_activity
+    # Read replica for lag-tolerant anonymous GETs (@read_replica)
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    REPLICA_RETRY_AFTER = int(os.getenv("REPLICA_RETRY_AFTER", 30))  # seconds on the primary after a replica failure
+
+    # Per-request SQL instrumentation (app/utils/query_stats.py)
+    SQL_STATS_ENABLED = os.getenv("SQL_STATS_ENABLED", "True") == "True"
+    SQL_STATS_SERVER_TIMING = {"True": True, "False": False}.get(os.getenv("SQL_STATS_SERVER_TIMING"))  # unset: only in debug or TESTING
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))  # repeats of one statement shape per request
+    SQL_STATS_LOG_MIN_QUERIES = int(os.getenv("SQL_STATS_LOG_MIN_QUERIES", 30))  # log requests running this many queries
+
     JWT_SECRET_KEY = os.getenv("SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = 86400    # 1 day (in seconds)
     JWT_REFRESH_TOKEN_EXPIRES = 604800  # 7 days (in seconds)
@@ -18,6 +37,32 @@ class Config:
     JWT_COOKIE_SAMESITE = "Lax"      # Or "Strict"
     JWT_COOKIE_CSRF_PROTECT = False  # Set True if you want CSRF protection
 
+    # Identity snapshots cached per worker for authenticated requests
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 30))  # seconds; bounds staleness across workers
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))
+
+    # Rate limiting
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per worker) or "postgres" (shared)
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))  # LRU bound of the memory backend
+
+    # Signup uniqueness checks
+    UNIQUENESS_BLOOM_ENABLED = os.getenv("UNIQUENESS_BLOOM_ENABLED", "False") == "True"  # per-worker fast path for check-unique
+    UNIQUENESS_BLOOM_REBUILD = int(os.getenv("UNIQUENESS_BLOOM_REBUILD", 300))  # seconds between full rebuilds
+
+    # OTP codes and password-reset tokens
+    TOKEN_STORE_BACKEND = os.getenv("TOKEN_STORE_BACKEND", "database")  # "database" or "memory" (single process, tests)
+    OTP_TTL = int(os.getenv("OTP_TTL", 600))  # seconds
+    OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))  # wrong guesses before the code is burned
+    RESET_TOKEN_TTL = int(os.getenv("RESET_TOKEN_TTL", 1800))  # seconds
+
+    # Passwords
+    PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")  # "pbkdf2", "scrypt" or "bcrypt"
+    PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", 1000000))
+    PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 32768))  # CPU/memory cost, power of two
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))  # log2 work factor
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # hashing processes, 0 hashes inline
+
     # Mail
     MAIL_SERVER = os.getenv("MAIL_SERVER")
     MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
@@ -25,7 +70,44 @@ class Config:
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = MAIL_USERNAME
+    MAIL_MAX_EMAILS = int(os.getenv("MAIL_MAX_EMAILS", 100)) or None  # messages per SMTP connection before reconnecting
+    EMAIL_WORKER_CONCURRENCY = int(os.getenv("EMAIL_WORKER_CONCURRENCY", 4))  # parallel SMTP connections
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+    EMAIL_RETRY_BASE = int(os.getenv("EMAIL_RETRY_BASE", 30))  # seconds, doubled per failed attempt
+    EMAIL_RETRY_MAX = int(os.getenv("EMAIL_RETRY_MAX", 3600))
 
     #Google
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+    GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")  # PEM certs by key id
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "app/images")
+    IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", 2))  # processes resizing uploads
+    MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", 10 * 1024 * 1024))
+    # Werkzeug refuses larger request bodies before parsing them (headroom for multipart framing)
+    MAX_CONTENT_LENGTH = MAX_IMAGE_UPLOAD_BYTES + 64 * 1024
+    # How /images is served: "direct", "x-sendfile" (Apache/lighttpd) or "x-accel" (nginx)
+    IMAGE_SERVE_MODE = os.getenv("IMAGE_SERVE_MODE", "direct")
+    IMAGE_ACCEL_PREFIX = os.getenv("IMAGE_ACCEL_PREFIX", "/protected-images")  # nginx internal location
+    USE_X_SENDFILE = IMAGE_SERVE_MODE == "x-sendfile"
+
+    # Blob storage
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local" (UPLOAD_FOLDER) or "s3"
+    PUBLIC_IMAGE_BASE_URL = os.getenv("PUBLIC_IMAGE_BASE_URL", "https://api-swiftsupply/images")  # CDN or bucket url for s3
+    STORAGE_S3_BUCKET = os.getenv("STORAGE_S3_BUCKET")
+    STORAGE_S3_ENDPOINT_URL = os.getenv("STORAGE_S3_ENDPOINT_URL")  # MinIO or another S3-compatible store
+    STORAGE_S3_REGION = os.getenv("STORAGE_S3_REGION")
+    STORAGE_S3_MAX_POOL = int(os.getenv("STORAGE_S3_MAX_POOL", 20))  # pooled HTTP connections per process
+    DIRECT_UPLOAD_EXPIRES = int(os.getenv("DIRECT_UPLOAD_EXPIRES", 900))  # seconds a presigned upload url is valid
+    UPLOAD_ATTACH_GRACE = int(os.getenv("UPLOAD_ATTACH_GRACE", 3600))  # seconds a fresh upload is kept while unreferenced
+
+    # Orders
+    ORDER_WORKER_ID = os.getenv("ORDER_WORKER_ID")  # pin the order-number worker id (0-1023) instead of leasing one
+    ORDER_WORKER_LEASE_TTL = int(os.getenv("ORDER_WORKER_LEASE_TTL", 600))  # seconds a leased worker id outlives its process
+
+    # Chat push
+    CHAT_BUS_BACKEND = os.getenv("CHAT_BUS_BACKEND", "local")  # "local" (single process) or "postgres"
+    CHAT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("CHAT_SUBSCRIBER_QUEUE_SIZE", 100))
+    CHAT_STREAM_HEARTBEAT = int(os.getenv("CHAT_STREAM_HEARTBEAT", 15))  # seconds
+
+    # Serving (wsgi.py / gunicorn.conf.py)
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))  # trusted reverse proxies setting X-Forwarded-For
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # bearer token for /metrics/*; unset leaves them open
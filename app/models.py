@@ -114,28 +114,24 @@ class User(db.Model):
     first_name = db.Column(db.String(50))
     last_name = db.Column(db.String(50))
     email = db.Column(db.String(120), unique=True, nullable=False)
-    contact = db.Column(db.String(20))
+    contact = db.Column(db.String(20), index=True)
     role = db.Column(PgEnum(UserRole), nullable=False)
     password_hash = db.Column(db.String(512))
     # profile_url = db.Column(db.String(255))
     is_verified = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    otp_code = db.Column(db.String(6), nullable=True)
-    otp_expiry = db.Column(db.DateTime, nullable=True)
-    reset_token = db.Column(db.String(256), nullable=True)
-    reset_token_expiry = db.Column(db.DateTime, nullable=True)
     # Relationships
     buyer_profile = db.relationship("BuyerProfile", uselist=False, back_populates="user")
     seller_profile = db.relationship("SellerProfile", uselist=False, back_populates="user")
 
     def set_password(self, password):
-        from werkzeug.security import generate_password_hash
-        self.password_hash = generate_password_hash(password)
+        from app.services.password_service import hash_password
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        from werkzeug.security import check_password_hash
-        return check_password_hash(self.password_hash, password)
+        from app.services.password_service import verify_password
+        return verify_password(self.password_hash, password)
 
 
 class Category(db.Model):
@@ -213,7 +209,7 @@ class BuyerProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     buyer_type = db.Column(PgEnum(UserType), nullable=False)
     company_name = db.Column(db.String(120))
-    company_reg = db.Column(db.String(120))
+    company_reg = db.Column(db.String(120), index=True)
     company_address = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -497,15 +493,17 @@ class Product(db.Model):
             self.rating = ((self.rating * self.review_count) + validated_rating) / (self.review_count + 1)
         self.review_count += 1
 
-    def to_dict(self):
-        """Convert product to dictionary matching frontend interface"""
+    def to_dict(self, image_size='detail'):
+        """Convert product to dictionary matching frontend interface.
+        image_size picks the variant served in `images` ('thumbnail', 'card', 'detail' or None for originals)"""
         return {
             'id': str(self.id),
             'name': self.name,
             'description': self.description,
             'price': self.price,
             'originalPrice': self.original_price,
-            'images': [img.url for img in self.images],
+            'images': [img.url_for(image_size) for img in self.images],
+            'imageVariants': [img.variants or {} for img in self.images],
             'category': self.product_type.category.name if self.product_type and self.product_type.category else '',
             'productType': self.product_type.name if self.product_type else '',
             'brand': self.brand.name if self.brand else '',
@@ -534,8 +532,23 @@ class ProductImage(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     url = db.Column(db.String(255), nullable=False)
     is_primary = db.Column(db.Boolean, default=False)
+    # SHA-256 of the stored blob; rows sharing it share one file on disk
+    content_hash = db.Column(db.String(64), index=True)
+    # Resized copies as {size: {format: url}}, filled in by the image pipeline
+    variants = db.Column(JSONDict, default=dict)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    def url_for(self, size=None, fmt='jpeg'):
+        """URL of the requested variant, falling back to the original upload"""
+        return self.pick_url(self.url, self.variants, size, fmt)
+
+    @staticmethod
+    def pick_url(url, variants, size=None, fmt='jpeg'):
+        """url_for over a bare (url, variants) pair, e.g. columns selected without loading the row"""
+        if size is None:
+            return url
+        return (variants or {}).get(size, {}).get(fmt) or url
+
 
 class ProductAttribute(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -591,6 +604,9 @@ class Order(db.Model):
     buyer = db.relationship('User', foreign_keys=[buyer_id], backref='orders')
     order_items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
 
+    # Seller order history, newest first
+    __table_args__ = (db.Index('ix_order_seller_created', 'seller_id', 'created_at'),)
+
     def to_dict(self):
         """Convert order to dictionary matching frontend interface"""
         return {
@@ -605,6 +621,15 @@ class Order(db.Model):
         }
 
 
+class OrderWorkerLease(db.Model):
+    """Order-number worker id held by one live process (see services/order_number.py)"""
+    __tablename__ = "order_worker_lease"
+
+    worker_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0-1023
+    holder = db.Column(db.String(255), nullable=False)  # '<host>:<pid>:<nonce>'
+    expires_at = db.Column(db.Float, nullable=False)  # epoch seconds; free to reclaim after this
+
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
@@ -627,6 +652,91 @@ class OrderItem(db.Model):
         }
 
 
+class OrderEvent(db.Model):
+    """Append-only log of order lifecycle events, consumed to maintain dashboard aggregates"""
+    __tablename__ = "order_event"
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('seller_profile.id'), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    event_type = db.Column(db.String(50), nullable=False)  # 'placed', 'status_changed'
+    from_status = db.Column(PgEnum(OrderStatus))
+    to_status = db.Column(PgEnum(OrderStatus), nullable=False)
+    payload = db.Column(JSONDict, default=dict)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationships
+    order = db.relationship('Order', backref=db.backref('events', lazy='dynamic'))
+
+    # Consumers scan the unprocessed tail in id order
+    __table_args__ = (
+        db.Index('ix_order_event_order', 'order_id', 'id'),
+        db.Index('ix_order_event_unprocessed', 'id', postgresql_where=db.text('processed_at IS NULL')),
+    )
+
+
+class EmailOutbox(db.Model):
+    """Outbound email queued by requests and delivered by the `flask email-worker` process.
+
+    body and html are cleared once a message is sent, failed or expired, so
+    OTPs and reset links do not outlive their delivery.
+    """
+    __tablename__ = "email_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(254), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sent', 'failed', 'expired'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)  # not delivered after this, e.g. when the OTP inside lapses
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # Workers poll the pending rows that are due
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', 'next_attempt_at', 'id', postgresql_where=db.text("status = 'pending'")),
+    )
+
+
+class AuthToken(db.Model):
+    """Short-lived OTP codes and password-reset tokens, stored only as keyed hashes"""
+    __tablename__ = "auth_token"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    purpose = db.Column(db.String(20), nullable=False)  # 'otp', 'password_reset'
+    token_hash = db.Column(db.String(64), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # failed guesses so far
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'purpose', name='uq_auth_token_user_purpose'),  # one live token per purpose
+        db.Index('ix_auth_token_purpose_hash', 'purpose', 'token_hash'),
+        db.Index('ix_auth_token_expires', 'expires_at'),
+    )
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket shared by all workers when RATE_LIMIT_BACKEND is postgres"""
+    __tablename__ = "rate_limit_bucket"
+
+    key = db.Column(db.String(255), primary_key=True)  # '<rule>:<ip|account>:<value>'
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)  # epoch seconds of the last refill
+    allowed = db.Column(db.Boolean, nullable=False, default=True)  # outcome of the last take
+
+
 class ChatRoom(db.Model):
     """Chat room between buyer and seller, optionally tagged with a product"""
     __tablename__ = "chat_room"
@@ -639,6 +749,15 @@ class ChatRoom(db.Model):
     # Chat metadata
     is_active = db.Column(db.Boolean, default=True)
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_message_id = db.Column(
+        db.Integer,
+        db.ForeignKey('chat_message.id', use_alter=True, name='fk_chat_room_last_message'),
+        nullable=True
+    )
+
+    # Unread messages per participant, maintained when messages are sent or read
+    buyer_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    seller_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -648,14 +767,20 @@ class ChatRoom(db.Model):
     seller = db.relationship('SellerProfile', foreign_keys=[seller_id], backref='seller_chats')
     product = db.relationship('Product', backref='chat_rooms')
     messages = db.relationship('ChatMessage', backref='chat_room', lazy=True, cascade="all, delete-orphan",
-                               order_by="ChatMessage.created_at")
+                               foreign_keys="ChatMessage.chat_room_id", order_by="ChatMessage.created_at")
+    last_message = db.relationship('ChatMessage', foreign_keys=[last_message_id], post_update=True)
 
     # Unique constraint to prevent duplicate chat rooms
-    __table_args__ = (db.UniqueConstraint('buyer_id', 'seller_id', 'product_id', name='unique_chat_room'),)
+    # Inbox listings are per participant, most recent conversation first
+    __table_args__ = (
+        db.UniqueConstraint('buyer_id', 'seller_id', 'product_id', name='unique_chat_room'),
+        db.Index('ix_chat_room_buyer_last_message', 'buyer_id', 'last_message_at', 'id'),
+        db.Index('ix_chat_room_seller_last_message', 'seller_id', 'last_message_at', 'id'),
+    )
 
     def to_dict(self):
         """Convert chat room to dictionary matching frontend interface"""
-        last_message = self.messages[-1] if self.messages else None
+        last_message = self.last_message
 
         return {
             'id': str(self.id),
@@ -666,7 +791,7 @@ class ChatRoom(db.Model):
                 'id': str(self.product.id),
                 'name': self.product.name,
                 'price': self.product.price,
-                'image': self.product.images[0].url if self.product and self.product.images else None
+                'image': self.product.images[0].url_for('thumbnail') if self.product and self.product.images else None
             } if self.product else None,
             'sellerInfo': {
                 'id': str(self.seller.id),
@@ -711,8 +836,13 @@ class ChatMessage(db.Model):
     # Relationships
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
 
-    def to_dict(self):
-        """Convert message to dictionary matching frontend interface"""
+    # Keyset pagination within a room
+    __table_args__ = (db.Index('ix_chat_message_room_created', 'chat_room_id', 'created_at', 'id'),)
+
+    def to_dict(self, sender=None):
+        """Convert message to dictionary matching frontend interface.
+        Pass a preloaded sender to avoid a lazy load per message"""
+        sender = sender or self.sender
         return {
             'id': str(self.id),
             'chatRoomId': str(self.chat_room_id),
@@ -727,9 +857,9 @@ class ChatMessage(db.Model):
                 'type': self.attachment_type
             } if self.attachment_url else None,
             'senderInfo': {
-                'id': str(self.sender.id),
-                'name': f"{self.sender.first_name} {self.sender.last_name}",
-                'role': self.sender.role.value
+                'id': str(sender.id),
+                'name': f"{sender.first_name} {sender.last_name}",
+                'role': sender.role.value
             },
             'createdAt': self.created_at.isoformat() if self.created_at else None,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
@@ -779,6 +909,9 @@ class Inquiry(db.Model):
     buyer = db.relationship('User', foreign_keys=[buyer_id], backref='sent_inquiries')
     product = db.relationship('Product', backref='inquiries')
 
+    # Supplier inbox: filter by seller and status, newest first
+    __table_args__ = (db.Index('ix_inquiry_seller_status_created', 'seller_id', 'status', 'created_at'),)
+
 
 class SupplierReview(db.Model):
     """Reviews for suppliers"""
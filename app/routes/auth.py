@@ -1,16 +1,18 @@
-from flask import Blueprint, request, jsonify, url_for, current_app
+from flask import Blueprint, request, jsonify, url_for, current_app, g
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.models import db, User, UserRole, UserType, BuyerProfile, SellerProfile
-from app.utils.security import hash_password, verify_password, generate_otp
+from app.utils.security import hash_password, verify_password
 from app.services.email_service import send_otp_email, send_password_reset
+from app.services.password_service import needs_rehash
+from app.services.token_store import check_otp, consume_reset_token, issue_otp, issue_reset_token
+from app.services.uniqueness import check_taken, find_taken
 from app.services.google_auth import verify_google_token
+from app.utils.identity import identity_required
+from app.utils.rate_limit import rate_limit
 from flask_jwt_extended import (
-    create_access_token, create_refresh_token,
-    jwt_required, get_jwt_identity, set_refresh_cookies, set_access_cookies, unset_jwt_cookies
+    create_access_token, create_refresh_token, set_refresh_cookies, set_access_cookies, unset_jwt_cookies
 )
-from datetime import datetime, timedelta
-import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -73,6 +75,7 @@ def test():
 #     send_otp_email(user.email, otp)
 #     return jsonify({"msg": "User created. OTP sent to email."}), 201
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup', per_ip='10/hour', per_account='5/hour')
 def signup():
     data = request.json
     email = data.get("email", "").strip().lower()
@@ -91,8 +94,6 @@ def signup():
         user.last_name = data.get('lastName')
         user.contact = data.get('contact')
         user.role = UserRole(data.get('role'))
-        user.otp_code = generate_otp()
-        user.otp_expiry = datetime.utcnow() + timedelta(minutes=10)
         user.set_password(data.get('password'))
         # Delete existing profile if present
         if user.role == UserRole.BUYER and user.buyer_profile:
@@ -107,9 +108,7 @@ def signup():
             email=email,
             contact=data.get('contact'),
             role=UserRole(data.get('role')),
-            is_verified=False,
-            otp_code=generate_otp(),
-            otp_expiry=datetime.utcnow() + timedelta(minutes=10)
+            is_verified=False
         )
         user.set_password(data.get('password'))
         db.session.add(user)
@@ -126,7 +125,7 @@ def signup():
             company_reg = data.get('companyReg', '').strip()
             if not company_reg:
                 return jsonify({"msg": "companyReg is required for buyers"}), 400
-            if BuyerProfile.query.filter_by(company_reg=company_reg).first():
+            if find_taken({'companyReg': company_reg}, verified_only=False)['companyReg']:
                 return jsonify({"msg": "Company registration already exists"}), 400
             buyer_profile = BuyerProfile(
                 user_id=user.id,
@@ -140,7 +139,7 @@ def signup():
             store_reg = data.get('storeReg', '').strip()
             if not store_reg:
                 return jsonify({"msg": "storeReg is required for sellers"}), 400
-            if SellerProfile.query.filter_by(store_reg=store_reg).first():
+            if find_taken({'storeReg': store_reg}, verified_only=False)['storeReg']:
                 return jsonify({"msg": "Store registration already exists"}), 400
             seller_profile = SellerProfile(
                 user_id=user.id,
@@ -150,8 +149,8 @@ def signup():
             )
             db.session.add(seller_profile)
 
+        send_otp_email(user.email, issue_otp(user.id))
         db.session.commit()
-        send_otp_email(user.email, user.otp_code)
         return jsonify({"msg": "User created/updated. OTP sent to email."}), 201
 
     except SQLAlchemyError as e:
@@ -197,39 +196,20 @@ def signup():
 
 
 @auth_bp.route('/check-unique', methods=['POST'])
+@rate_limit('check-unique', per_ip='60/minute')
 def check_unique():
     """
     Checks if the provided email, contact, companyReg, or storeReg exists in the database
     and is associated with a verified user/profile.
     """
     data = request.json
-    resp = {}
-
-    email = data.get('email', '').strip().lower()
-    contact = data.get('contact', '').strip()
-    company_reg = data.get('companyReg', '').strip()
-    store_reg = data.get('storeReg', '').strip()
-
-    # Check email (only verified)
-    if email:
-        exists = User.query.filter_by(email=email, is_verified=True).first()
-        resp['emailExists'] = bool(exists)
-
-    # Check contact (only verified)
-    if contact:
-        exists = User.query.filter_by(contact=contact, is_verified=True).first()
-        resp['contactExists'] = bool(exists)
-
-    # Check companyReg (buyer) - Only if user's account is verified
-    if company_reg:
-        profile = BuyerProfile.query.filter_by(company_reg=company_reg).first()
-        resp['companyRegExists'] = bool(profile and profile.user and profile.user.is_verified)
-
-    # Check storeReg (seller) - Only if user's account is verified
-    if store_reg:
-        profile = SellerProfile.query.filter_by(store_reg=store_reg).first()
-        resp['storeRegExists'] = bool(profile and profile.user and profile.user.is_verified)
-
+    taken = check_taken({
+        'email': data.get('email', '').strip().lower(),
+        'contact': data.get('contact', '').strip(),
+        'companyReg': data.get('companyReg', '').strip(),
+        'storeReg': data.get('storeReg', '').strip(),
+    })
+    resp = {f"{field}Exists": exists for field, exists in taken.items()}
     return jsonify(resp)
 
 
@@ -237,20 +217,25 @@ def check_unique():
 
 # 2. OTP verification
 @auth_bp.route('/verify-otp', methods=['POST'])
+@rate_limit('verify-otp', per_ip='30/hour', per_account='10/hour')
 def verify_otp():
     data = request.json
     email, otp = data['email'], data['otp_code']
     user = User.query.filter_by(email=email).first()
-    if not user or not user.otp_code or user.otp_code != otp or user.otp_expiry < datetime.utcnow():
+    if not user:
         return jsonify({"msg": "Invalid or expired OTP"}), 400
-    user.is_verified = True
-    user.otp_code = None
-    user.otp_expiry = None
+    verified = check_otp(user.id, otp)
+    if verified:
+        user.is_verified = True
+    # Commit either way so a wrong guess is counted against the code
     db.session.commit()
+    if not verified:
+        return jsonify({"msg": "Invalid or expired OTP"}), 400
     return jsonify({"msg": "User verified success"}), 201
 
 
 @auth_bp.route('/resend-otp', methods=['POST'])
+@rate_limit('resend-otp', per_ip='10/hour', per_account='3/hour')
 def resend_otp():
     data = request.json
     email = data.get('email', '').strip().lower()
@@ -260,15 +245,13 @@ def resend_otp():
     if user.is_verified:
         return jsonify({"msg": "Account already verified"}), 400
 
-    otp = generate_otp()
-    user.otp_code = otp
-    user.otp_expiry = datetime.utcnow() + timedelta(minutes=10)
+    send_otp_email(user.email, issue_otp(user.id))
     db.session.commit()
-    send_otp_email(user.email, otp)
     return jsonify({"msg": "OTP resent to your email"}), 200
 
 # 3. LOGIN
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per_ip='30/minute', per_account='10/minute')
 def login():
     data = request.json
     email, password = data['email'], data['password']
@@ -277,6 +260,10 @@ def login():
         return jsonify({"msg": "Invalid credentials"}), 401
     if not user.is_verified:
         return jsonify({"msg": "Account not verified. Please verify via OTP."}), 401
+    if needs_rehash(user.password_hash):
+        # Upgrade hashes made with an older algorithm or cost while the plaintext is at hand
+        user.set_password(password)
+        db.session.commit()
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
     resp = jsonify(access_token=access_token, refresh_token=refresh_token)
@@ -292,17 +279,16 @@ def logout():
 
 # 4. FORGOT PASSWORD
 @auth_bp.route('/forgot-password', methods=['POST'])
+@rate_limit('forgot-password', per_ip='10/hour', per_account='3/hour')
 def forgot_password():
     email = request.json.get('email')
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({"msg": "User not found"}), 404
-    reset_token = str(uuid.uuid4())
-    user.reset_token = reset_token
-    user.reset_token_expiry = datetime.utcnow() + timedelta(minutes=30)
-    db.session.commit()
+    reset_token = issue_reset_token(user.id)
     reset_link = f"{request.host_url.rstrip('/')}/reset-password?token={reset_token}"
     send_password_reset(email, reset_link)
+    db.session.commit()
     return jsonify({"msg": "Reset link sent"})
 
 # 5. RESET PASSWORD
@@ -310,12 +296,13 @@ def forgot_password():
 def reset_password():
     data = request.json
     token, new_password = data.get('token'), data.get('new_password')
-    user = User.query.filter_by(reset_token=token).first()
-    if not user or user.reset_token_expiry < datetime.utcnow():
+    user_id = consume_reset_token(token)
+    user = db.session.get(User, user_id) if user_id else None
+    if not user:
+        # An expired token is still consumed
+        db.session.commit()
         return jsonify({"msg": "Invalid or expired token"}), 400
     user.set_password(new_password)
-    user.reset_token = None
-    user.reset_token_expiry = None
     db.session.commit()
     return jsonify({"msg": "Password reset successful"})
 
@@ -323,8 +310,10 @@ def reset_password():
 @auth_bp.route('/google-signin', methods=['POST'])
 def google_signin():
     token = request.json.get('token')
-    idinfo = verify_google_token(token)
-    if not idinfo:
+    try:
+        idinfo = verify_google_token(token)
+    except ValueError as e:
+        current_app.logger.info("Google sign-in rejected: %s", e)
         return jsonify({"msg": "Google sign-in failed"}), 400
     email = idinfo['email']
     user = User.query.filter_by(email=email).first()
@@ -342,33 +331,29 @@ def google_signin():
 
 # 7. GET CURRENT USER (for UI header etc)
 @auth_bp.route('/me', methods=['GET'])
-@jwt_required()
+@identity_required()
 def me():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"msg": "Unauthorized user"}), 401
+    identity = g.identity
     profile = None
-    print("user role:", user.role)
-    if user.role == UserRole.BUYER and user.buyer_profile:
+    if identity.role == UserRole.BUYER and identity.buyer_type:
         profile = {
-            "buyer_type": user.buyer_profile.buyer_type.value,
-            "company_name": user.buyer_profile.company_name,
-            "company_reg": user.buyer_profile.company_reg,
-            "company_address": user.buyer_profile.company_address,
+            "buyer_type": identity.buyer_type.value,
+            "company_name": identity.company_name,
+            "company_reg": identity.company_reg,
+            "company_address": identity.company_address,
         }
-    elif user.role == UserRole.SELLER and user.seller_profile:
+    elif identity.role == UserRole.SELLER and identity.seller_id:
         profile = {
-            "store_name": user.seller_profile.store_name,
-            "store_reg": user.seller_profile.store_reg,
-            "store_address": user.seller_profile.store_address,
+            "store_name": identity.store_name,
+            "store_reg": identity.store_reg,
+            "store_address": identity.store_address,
         }
     return jsonify({
-        "id": user.id,
-        "email": user.email,
-        "role": user.role.value,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-        "contact": user.contact,
+        "id": identity.user_id,
+        "email": identity.email,
+        "role": identity.role.value,
+        "first_name": identity.first_name,
+        "last_name": identity.last_name,
+        "contact": identity.contact,
         "profile": profile,
     })
@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify
 from app.models import Brand, ProductType
 from app.extensions import db
+from app.utils.database import read_replica
 
 brand_bp = Blueprint("brand", __name__, url_prefix="/api/brands")
 
 
 @brand_bp.route("/list/<string:product_type_name>", methods=["GET"])
+@read_replica
 def get_brand_list(product_type_name):
     # Find the product type by name
     product_type = ProductType.query.filter_by(name=product_type_name).first()
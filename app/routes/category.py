@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify
 from app.models import Category
 from app.extensions import db
+from app.utils.database import read_replica
 
 category_bp = Blueprint("category", __name__, url_prefix="/api/categories")
 
 @category_bp.route("/", methods=["GET"])
+@read_replica
 def get_categories():
     categories = Category.query.all()
     return jsonify([
@@ -14,6 +16,7 @@ def get_categories():
 
 
 @category_bp.route("/list", methods=["GET"])
+@read_replica
 def get_categories_list():
     categories = Category.query.all()
     # Use list comprehension to serialize
@@ -0,0 +1,191 @@
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.models import Product, SellerProfile, User, UserRole
+from app.services.chat_bus import get_bus
+from app.services.chat_service import (
+    get_inbox_page, get_messages_page, get_or_create_room, get_room_for_participant,
+    mark_messages_read, post_message, serialize_inbox_row, serialize_messages
+)
+from app.utils.pagination import get_limit
+
+chat_bp = Blueprint('chat', __name__, url_prefix='/chats')
+
+
+@chat_bp.route("/", methods=["GET"])
+@jwt_required()
+def get_inbox():
+    """List the current user's conversations, most recent first, with unread counts"""
+    user = User.query.get(get_jwt_identity())
+    if not user:
+        return jsonify({"msg": "Unauthorized user"}), 401
+
+    limit = get_limit(default=20)
+    rows, next_cursor = get_inbox_page(user.id, user.role, cursor=request.args.get('cursor'), limit=limit)
+
+    return jsonify({
+        "chats": [serialize_inbox_row(row) for row in rows],
+        "pagination": {
+            "limit": limit,
+            "nextCursor": next_cursor,
+            "hasMore": next_cursor is not None
+        }
+    })
+
+
+@chat_bp.route("/", methods=["POST"])
+@jwt_required()
+def open_chat():
+    """Open (or return the existing) conversation between the current buyer and a supplier"""
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role != UserRole.BUYER:
+        return jsonify({"error": "Only buyers can start a chat"}), 403
+
+    data = request.get_json()
+    if not data or not data.get('sellerId'):
+        return jsonify({"error": "sellerId is required"}), 400
+    try:
+        seller_id = int(data['sellerId'])
+        product_id = int(data['productId']) if data.get('productId') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "sellerId and productId must be integers"}), 400
+
+    if not SellerProfile.query.get(seller_id):
+        return jsonify({"error": "Supplier not found"}), 404
+    if product_id is not None:
+        product = Product.query.get(product_id)
+        if not product or product.seller_id != seller_id:
+            return jsonify({"error": "Product not found"}), 404
+
+    room, created = get_or_create_room(user.id, seller_id, product_id)
+    if room is None:
+        return jsonify({"error": "Could not open the chat, please retry"}), 409
+    return jsonify({"id": str(room.id)}), 201 if created else 200
+
+
+@chat_bp.route("/<int:room_id>/messages", methods=["GET"])
+@jwt_required()
+def get_messages(room_id):
+    """Get a page of messages; use `before`/`after` message ids to page"""
+    room = get_room_for_participant(room_id, get_jwt_identity())
+    if not room:
+        return jsonify({"error": "Chat not found"}), 404
+
+    limit = get_limit(default=50)
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+
+    messages, has_more = get_messages_page(room.id, before=before, after=after, limit=limit)
+
+    return jsonify({
+        "messages": serialize_messages(messages),
+        "pagination": {
+            "limit": limit,
+            "hasMore": has_more,
+            "before": str(messages[0].id) if messages else None,
+            "after": str(messages[-1].id) if messages else None
+        }
+    })
+
+
+@chat_bp.route("/<int:room_id>/messages", methods=["POST"])
+@jwt_required()
+def send_message(room_id):
+    user_id = get_jwt_identity()
+    room = get_room_for_participant(room_id, user_id)
+    if not room:
+        return jsonify({"error": "Chat not found"}), 404
+
+    data = request.get_json()
+    if not data or not (data.get('content') or '').strip():
+        return jsonify({"error": "Message content is required"}), 400
+
+    message = post_message(
+        room,
+        user_id,
+        data['content'],
+        message_type=data.get('messageType', 'text'),
+        attachment=data.get('attachment')
+    )
+    payload = serialize_messages([message])[0]
+    get_bus().publish(
+        [room.buyer_id, room.seller_user_id],
+        {"type": "message", "chatId": str(room.id), "message": payload}
+    )
+    return jsonify(payload), 201
+
+
+@chat_bp.route("/<int:room_id>/read", methods=["POST"])
+@jwt_required()
+def mark_read(room_id):
+    """Mark the conversation read up to (and including) a message id"""
+    user_id = get_jwt_identity()
+    room = get_room_for_participant(room_id, user_id)
+    if not room:
+        return jsonify({"error": "Chat not found"}), 404
+
+    data = request.get_json() or {}
+    try:
+        up_to = int(data['upToMessageId'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "upToMessageId is required"}), 400
+
+    marked = mark_messages_read(room, user_id, up_to)
+    if marked:
+        recipient = room.seller_user_id if str(user_id) == str(room.buyer_id) else room.buyer_id
+        get_bus().publish([recipient], {
+            "type": "read",
+            "chatId": str(room.id),
+            "readerId": str(user_id),
+            "upToMessageId": str(up_to)
+        })
+    return jsonify({"updated": marked})
+
+
+@chat_bp.route("/<int:room_id>/typing", methods=["POST"])
+@jwt_required()
+def send_typing(room_id):
+    """Tell the other participant the current user is typing"""
+    user_id = get_jwt_identity()
+    room = get_room_for_participant(room_id, user_id)
+    if not room:
+        return jsonify({"error": "Chat not found"}), 404
+
+    recipient = room.seller_user_id if str(user_id) == str(room.buyer_id) else room.buyer_id
+    get_bus().publish([recipient], {"type": "typing", "chatId": str(room.id), "userId": str(user_id)})
+    return "", 204
+
+
+@chat_bp.route("/stream", methods=["GET"])
+@jwt_required()
+def stream_events():
+    """Server-sent event stream of the current user's chat messages, read receipts and typing events.
+
+    Holds no database connection while open. If the client falls too far behind,
+    it receives a `resync` event and should refetch over HTTP before reconnecting.
+    """
+    bus = get_bus()
+    subscription = bus.subscribe(get_jwt_identity())
+    heartbeat = current_app.config.get("CHAT_STREAM_HEARTBEAT", 15)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
@@ -0,0 +1,59 @@
+import mimetypes
+import os
+
+from flask import Blueprint, Response, abort, current_app, redirect, send_from_directory
+from werkzeug.security import safe_join
+
+from app.config import Config
+from app.services.blob_storage import LocalStorage, get_storage
+from app.services.image_storage import content_hash
+
+images_bp = Blueprint('images', __name__)
+
+# Upload names never change meaning (content hashes or uuids), so clients may cache them for good
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _cache_forever(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@images_bp.route('/images/<path:filename>', methods=['GET'])
+def uploaded_file(filename):
+    """Serve an uploaded image.
+
+    IMAGE_SERVE_MODE picks who moves the bytes:
+    - direct: Flask streams the file (sendfile via the server's wsgi.file_wrapper),
+      answering Range and If-None-Match/If-Modified-Since itself;
+    - x-sendfile: Flask only emits an X-Sendfile header for Apache/lighttpd;
+    - x-accel: Flask only emits X-Accel-Redirect to IMAGE_ACCEL_PREFIX for nginx.
+    With a remote storage backend, old /images links redirect to the public url.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        return _cache_forever(redirect(storage.public_url(filename), code=301))
+
+    upload_folder = os.path.abspath(Config.UPLOAD_FOLDER)
+    if safe_join(upload_folder, filename) is None:
+        abort(404)
+
+    mode = current_app.config.get('IMAGE_SERVE_MODE', 'direct')
+    if mode == 'x-accel':
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = current_app.config['IMAGE_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+        return _cache_forever(response)
+
+    # Content-addressed originals get their hash as a strong ETag; other files use Werkzeug's default
+    digest = content_hash(filename)
+    response = send_from_directory(
+        upload_folder,
+        filename,
+        as_attachment=False,
+        conditional=True,
+        etag=digest or True,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    return _cache_forever(response)
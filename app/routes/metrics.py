@@ -0,0 +1,30 @@
+import hmac
+import os
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request
+
+from app.extensions import db
+from app.utils.database import pool_stats
+
+metrics_bp = Blueprint("metrics", __name__, url_prefix="/metrics")
+
+
+def metrics_token_required(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get("METRICS_TOKEN")
+        if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return jsonify({"error": "Unauthorized"}), 401
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@metrics_bp.route("/db-pool", methods=["GET"])
+@metrics_token_required
+def get_db_pool_stats():
+    """Connection pool checkout waits of the worker answering this request.
+
+    Each worker has its own pools, so scrape repeatedly to sample all of them.
+    """
+    return jsonify({"pid": os.getpid(), "pools": pool_stats(db)})
@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Order, User, UserRole
+from app.services.order_service import OrderError, order_read_options, place_order, transition_order
+
+order_bp = Blueprint('order', __name__, url_prefix='/orders')
+
+
+@order_bp.route("/", methods=["POST"])
+@jwt_required()
+def create_order():
+    """Place an order for a cart of products from a single supplier"""
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role != UserRole.BUYER:
+        return jsonify({"error": "Only buyers can place orders"}), 403
+    if not user.is_verified:
+        return jsonify({"error": "Please verify your account first."}), 403
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Order data is required"}), 400
+
+    try:
+        order = place_order(user.id, data.get('items'), notes=data.get('notes'))
+    except OrderError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except SQLAlchemyError as e:
+        return jsonify({"error": "Database error occurred.", "details": str(e)}), 500
+
+    order = Order.query.options(*order_read_options()).get(order.id)
+    return jsonify(order.to_dict()), 201
+
+
+@order_bp.route("/<int:order_id>/status", methods=["PATCH"])
+@jwt_required()
+def update_order_status(order_id):
+    """Move an order through PENDING -> CONFIRMED -> READY -> COMPLETED, or cancel it"""
+    data = request.get_json()
+    if not data or 'status' not in data:
+        return jsonify({"error": "Status is required"}), 400
+
+    try:
+        from_status, to_status = transition_order(order_id, data['status'], get_jwt_identity(), note=data.get('note'))
+    except OrderError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except SQLAlchemyError as e:
+        return jsonify({"error": "Database error occurred.", "details": str(e)}), 500
+
+    return jsonify({
+        "id": str(order_id),
+        "previousStatus": from_status.value,
+        "status": to_status.value
+    })
@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify, request
 from app.models import Product, ProductType, Category
+from app.utils.database import read_replica
 
 product_bp = Blueprint("products", __name__, url_prefix="/products")
 product_type_bp = Blueprint("product_type", __name__, url_prefix="/api/product-types")
 
 @product_type_bp.route("/", methods=["GET"])
+@read_replica
 def get_product_types():
     product_types = ProductType.query.all()
     return jsonify([
@@ -14,6 +16,7 @@ def get_product_types():
 
 
 @product_type_bp.route("/list/<string:category_name>", methods=["GET"])
+@read_replica
 def get_productType_list(category_name):
     category = Category.query.filter_by(name=category_name).first()
     if not category:
@@ -24,6 +27,7 @@ def get_productType_list(category_name):
 
 
 @product_bp.route("/", methods=["GET"])
+@read_replica
 def get_products():
     try:
         page = int(request.args.get("page", 1))
@@ -32,7 +36,7 @@ def get_products():
         page, limit = 1, 12
 
     pagination = Product.query.paginate(page=page, per_page=limit, error_out=False)
-    products = [p.to_dict() for p in pagination.items]
+    products = [p.to_dict(image_size='card') for p in pagination.items]
 
     return jsonify({
         "products": products,
@@ -43,15 +47,17 @@ def get_products():
     })
 
 @product_bp.route("/<string:product_id>", methods=["GET"])
+@read_replica
 def get_product_by_id(product_id):
     product = Product.query.get_or_404(product_id)
     return jsonify(product.to_dict())
 
 @product_bp.route("/<string:product_id>/related", methods=["GET"])
+@read_replica
 def get_related_products(product_id):
     product = Product.query.get_or_404(product_id)
     related = Product.query.filter(
         Product.category_id == product.category_id,
         Product.id != product_id
     ).limit(3).all()
-    return jsonify([p.to_dict() for p in related])
+    return jsonify([p.to_dict(image_size='card') for p in related])
@@ -1,10 +1,7 @@
-import os
-import uuid
+from flask import Blueprint, current_app, g, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
 
-from flask import Blueprint, jsonify, request
-from werkzeug.utils import secure_filename
-
-from app import Config
 from app.models import (
     Product, SellerProfile, User, UserRole, Category, ProductType, Brand,
     Tag, ProductImage, Order, Inquiry, SalesData, ProductView, SupplierReview,
@@ -12,13 +9,23 @@ from app.models import (
 )
 from app.extensions import db
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, desc, and_
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, desc, and_, case, update
+from sqlalchemy.orm import joinedload, selectinload
+from app.utils.database import read_replica
+from app.utils.identity import identity_required
+from app.utils.pagination import apply_desc_cursor, encode_cursor, get_limit
+from app.services.order_service import get_orders_page
+from app.services.image_pipeline import existing_variants, submit_variants
+from app.services.blob_storage import StorageError, get_storage
+from app.services.image_storage import (
+    ImageSpool, UploadRejected, content_hash, direct_upload, key_from_url, release, store_stream, verify_upload
+)
 
 supplier_bp = Blueprint('supplier', __name__, url_prefix='/suppliers')
 
 
 @supplier_bp.route("/", methods=["GET"])
+@read_replica
 def get_all_suppliers():
     # Get pagination params (default: page=1, limit=10)
     try:
@@ -30,8 +37,11 @@ def get_all_suppliers():
     except (TypeError, ValueError):
         limit = 12
 
-    # Just get all sellers for now, paginated
-    pagination = SellerProfile.query.paginate(page=page, per_page=limit, error_out=False)
+    # Just get all sellers for now, paginated; contacts and product types load per page, not per seller
+    pagination = SellerProfile.query.options(
+        selectinload(SellerProfile.user).load_only(User.email, User.contact),
+        selectinload(SellerProfile.product_types).joinedload(ProductType.category),
+    ).paginate(page=page, per_page=limit, error_out=False)
 
     result = []
     for s in pagination.items:
@@ -82,6 +92,7 @@ def get_all_suppliers():
 
 # Get a specific supplier by ID with complete profile
 @supplier_bp.route("/<int:supplier_id>", methods=["GET"])
+@read_replica
 def get_supplier(supplier_id):
     seller = SellerProfile.query.get(supplier_id)
     if not seller:
@@ -114,23 +125,18 @@ def get_supplier(supplier_id):
 
 
 @supplier_bp.route("/inventory", methods=["GET"])
-@jwt_required()
+@identity_required()
 def get_supplier_inventory():
     """Get supplier's inventory with optional filters and pagination"""
-    supplier_id = get_jwt_identity()
-    print(f"Supplier ID from JWT: {supplier_id}")
-    seller = SellerProfile.query.filter_by(user_id=supplier_id, is_verified=True).first()
-    print(f"Seller found: {seller}")
-    if not seller:
+    if not g.identity.seller_verified:
         return jsonify({"error": "Unauthorized access"}), 403
 
     page = request.args.get("page", 1, type=int)
     limit = request.args.get("limit", 20, type=int)
 
-    query = Product.query.filter_by(seller_id=seller.id)
+    query = Product.query.filter_by(seller_id=g.identity.seller_id)
 
     total = query.count()
-    print(f"Total products for supplier {supplier_id}: {total}")
     products = query.offset((page - 1) * limit).limit(limit).all()
 
     result = []
@@ -144,7 +150,7 @@ def get_supplier_inventory():
             stock_status = "out-of-stock"
 
         result.append({
-            **product.to_dict(),
+            **product.to_dict(image_size='card'),
             "stock": stock_level,
             "minStock": 1000,
             "status": stock_status,
@@ -184,57 +190,99 @@ def upload_file(file):
     if file.filename == '':
         return None, 'No selected file'
 
-    filename = f"{uuid.uuid4()}.{secure_filename(file.filename).rsplit('.', 1)[-1]}"
-    upload_folder = Config.UPLOAD_FOLDER
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-    file_path = os.path.join(upload_folder, filename)
-    print(f"Saving file to {file_path}")
-    file.save(file_path)
-    return filename, None
+    key, created = store_stream(file.stream)
+    current_app.logger.debug("Stored upload as %s (%s)", key, "new" if created else "deduplicated")
+    return key, None
 
 
 def delete_file(filename):
-    file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-    print(f"Deleting file {file_path}")
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    """Release an upload; the blob is only removed once nothing references it"""
+    released = release([filename])
+    if released:
+        current_app.logger.debug("Deleted unreferenced file %s", filename)
+
+
+def render_missing_variants(urls):
+    """Queue variants for attached uploads that never went through upload_image (direct uploads).
+    submit_variants skips keys that already have them or are being rendered."""
+    app = current_app._get_current_object()
+    for url in urls:
+        if content_hash(url):
+            submit_variants(app, key_from_url(url))
 
 
 @supplier_bp.route("/upload-image", methods=["POST"])
-@jwt_required()
+@identity_required()
 def upload_image():
-    supplier_id = get_jwt_identity()
-    seller = SellerProfile.query.filter_by(user_id=supplier_id).first()
-    if not seller or not seller.is_verified:
+    if not g.identity.seller_verified:
         return jsonify({"error": "Unauthorized or unverified"}), 403
 
-    if 'image' not in request.files:
-        return jsonify({"error": "No image file part"}), 400
+    # Refuse declared oversize bodies before anything is read
+    if request.content_length and request.content_length > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({"error": "Image is too large"}), 413
 
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+    try:
+        if request.mimetype.startswith('image/'):
+            # Raw image body: streamed straight to storage, never buffered by the form parser
+            filename, _ = store_stream(request.stream)
+        else:
+            # Parse the form ourselves so the file part is sniffed as it arrives, not after it is spooled
+            _, _, files = parse_form_data(
+                request.environ,
+                stream_factory=ImageSpool,
+                max_content_length=current_app.config['MAX_CONTENT_LENGTH']
+            )
+            if 'image' not in files:
+                return jsonify({"error": "No image file part"}), 400
 
-    # Optionally: validate file type and size here
+            file = files['image']
+            if file.filename == '':
+                return jsonify({"error": "No selected file"}), 400
 
-    filename, error = upload_file(file)
-    if error:
-        return jsonify({"error": error}), 400
+            filename, error = upload_file(file)
+            if error:
+                return jsonify({"error": error}), 400
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status_code
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Image is too large"}), 413
 
-    url = f"https://api-swiftsupply/images/{filename}"
+    # Resized variants are rendered off the request thread
+    submit_variants(current_app._get_current_object(), filename)
+
+    url = get_storage().public_url(filename)
     return jsonify({"url": url}), 201
 
 
+@supplier_bp.route("/upload-url", methods=["POST"])
+@identity_required()
+def create_upload_url():
+    """Presigned upload so the image goes straight to object storage instead of through Flask.
+
+    The client sends the file's sha256, contentType and size, PUTs the bytes to the
+    returned url with the returned headers, then attaches `url` to a product.
+    """
+    if not g.identity.seller_verified:
+        return jsonify({"error": "Unauthorized or unverified"}), 403
+
+    data = request.get_json() or {}
+    try:
+        key, upload = direct_upload(data.get('sha256'), data.get('contentType'), data.get('size'))
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status_code
+    except StorageError as e:
+        return jsonify({"error": str(e)}), 501
+
+    return jsonify({
+        "url": get_storage().public_url(key),
+        "upload": upload,  # None when the same bytes are already stored
+    }), 201
+
+
 @supplier_bp.route("/product", methods=["POST"])
-@jwt_required()
+@identity_required(seller=True, verified=True)
 def create_supplier_product():
-    supplier_id = get_jwt_identity()
-    seller = SellerProfile.query.filter_by(user_id=supplier_id).first()
-    if not seller:
-        return jsonify({"error": "Unauthorized access"}), 403
-    if not seller.is_verified:
-        return jsonify({"error": "Please verify your account first."}), 403
+    seller_id = g.identity.seller_id
 
     data = request.get_json()
     if not data:
@@ -243,6 +291,11 @@ def create_supplier_product():
     images = data.get('images', [])
     if len(images) > 5:
         return jsonify({"error": "Maximum 5 images are allowed."}), 400
+    try:
+        for url in images:
+            verify_upload(url)
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status_code
 
     required_fields = ['name', 'description', 'price', 'stock']
     for field in required_fields:
@@ -284,7 +337,7 @@ def create_supplier_product():
         original_price=float(data.get('originalPrice', 0)) if data.get('originalPrice') else None,
         stock=int(data['stock']),
         min_order_qty=int(data.get('minOrderQty', 1)),
-        seller_id=seller.id,
+        seller_id=seller_id,
         category_id=category.id if category else None,
         product_type_id=product_type.id if product_type else None,
         brand_id=brand.id if brand else None,
@@ -300,7 +353,9 @@ def create_supplier_product():
         image = ProductImage(
             product_id=product.id,
             url=url,
-            is_primary=(i == 0)
+            is_primary=(i == 0),
+            content_hash=content_hash(url),
+            variants=existing_variants(url)
         )
         db.session.add(image)
 
@@ -313,9 +368,16 @@ def create_supplier_product():
                 db.session.flush()
             product.tags.append(tag)
 
-    seller.total_products = db.session.query(Product).filter_by(seller_id=supplier_id).count() + 1
+    db.session.execute(
+        update(SellerProfile).where(SellerProfile.id == seller_id).values(
+            total_products=db.session.query(func.count(Product.id)).filter(
+                Product.seller_id == seller_id
+            ).scalar_subquery()
+        ).execution_options(synchronize_session=False)
+    )
 
     db.session.commit()
+    render_missing_variants(images)
     result = []
 
     stock_level = product.stock or 0
@@ -344,16 +406,9 @@ def create_supplier_product():
 
 
 @supplier_bp.route("/products/<int:product_id>", methods=["PUT"])
-@jwt_required()
+@identity_required(seller=True, verified=True)
 def update_supplier_product(product_id):
-    supplier_id = get_jwt_identity()
-    seller = SellerProfile.query.filter_by(user_id=supplier_id).first()
-    if not seller:
-        return jsonify({"error": "Unauthorized access"}), 403
-    if not seller.is_verified:
-        return jsonify({"error": "Please verify your account first."}), 403
-
-    product = Product.query.filter_by(id=product_id, seller_id=seller.id).first()
+    product = Product.query.filter_by(id=product_id, seller_id=g.identity.seller_id).first()
     if not product:
         return jsonify({"error": "Product not found"}), 404
 
@@ -364,6 +419,13 @@ def update_supplier_product(product_id):
     images = data.get('images', [])
     if len(images) > 5:
         return jsonify({"error": "Maximum 5 images are allowed."}), 400
+    attached = {img.url for img in product.images}
+    try:
+        for url in images:
+            if url not in attached:
+                verify_upload(url)
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status_code
 
     print(images)
 
@@ -433,11 +495,11 @@ def update_supplier_product(product_id):
     existing_urls = set(img.url for img in old_images)
     new_urls = set(images)
 
-    # Delete removed images and files
+    # Delete removed image rows; their files are released after commit
+    removed_keys = []
     for img in old_images:
         if img.url not in new_urls:
-            filename = img.url.split('/')[-1]
-            delete_file(filename)
+            removed_keys.append(key_from_url(img.url))
             db.session.delete(img)
 
     db.session.flush()
@@ -448,7 +510,9 @@ def update_supplier_product(product_id):
             new_img = ProductImage(
                 product_id=product.id,
                 url=url,
-                is_primary=(i == 0)
+                is_primary=(i == 0),
+                content_hash=content_hash(url),
+                variants=existing_variants(url)
             )
             db.session.add(new_img)
         else:
@@ -475,6 +539,9 @@ def update_supplier_product(product_id):
 
     product.updated_at = datetime.utcnow()
     db.session.commit()
+    for key in removed_keys:
+        delete_file(key)
+    render_missing_variants(new_urls - existing_urls)
     print(product.to_dict())
     result = []
 
@@ -545,6 +612,7 @@ def get_supplier_dashboard(supplier_id):
 
 
 @supplier_bp.route("/<int:supplier_id>/sales-data", methods=["GET"])
+@read_replica
 def get_supplier_sales_data(supplier_id):
     # Get last 30 days of sales data
     thirty_days_ago = date.today() - timedelta(days=30)
@@ -566,6 +634,7 @@ def get_supplier_sales_data(supplier_id):
 
 
 @supplier_bp.route("/<int:supplier_id>/product-engagement", methods=["GET"])
+@read_replica
 def get_product_engagement(supplier_id):
     # Get top 10 products by engagement (views + inquiries + orders)
     products = db.session.query(Product).filter_by(seller_id=supplier_id).order_by(
@@ -586,36 +655,86 @@ def get_product_engagement(supplier_id):
 
 @supplier_bp.route("/<int:supplier_id>/recent-orders", methods=["GET"])
 def get_recent_orders(supplier_id):
-    limit = request.args.get('limit', 10, type=int)
+    limit = get_limit(default=10)
 
-    orders = db.session.query(Order).filter_by(seller_id=supplier_id).order_by(
-        desc(Order.created_at)
-    ).limit(limit).all()
+    try:
+        orders, _ = get_orders_page(seller_id=supplier_id, status=request.args.get('status'), limit=limit)
+    except ValueError:
+        return jsonify({"error": "Invalid status"}), 400
 
-    result = []
-    for order in orders:
-        result.append(order.to_dict())
+    return jsonify([order.to_dict() for order in orders])
 
-    return jsonify(result)
+
+@supplier_bp.route("/<int:supplier_id>/orders", methods=["GET"])
+@identity_required(seller=True)
+def get_order_history(supplier_id):
+    """Get supplier's order history with status filter and cursor pagination"""
+    if g.identity.seller_id != supplier_id:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    limit = get_limit(default=20)
+
+    try:
+        orders, next_cursor = get_orders_page(
+            seller_id=supplier_id,
+            status=request.args.get('status'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid status"}), 400
+
+    return jsonify({
+        "orders": [order.to_dict() for order in orders],
+        "pagination": {
+            "limit": limit,
+            "nextCursor": next_cursor,
+            "hasMore": next_cursor is not None
+        }
+    })
 
 
 @supplier_bp.route("/<int:supplier_id>/inquiries", methods=["GET"])
+@identity_required(seller=True)
 def get_supplier_inquiries(supplier_id):
-    status = request.args.get('status')
-    limit = request.args.get('limit', 20, type=int)
+    if g.identity.seller_id != supplier_id:
+        return jsonify({"error": "Unauthorized access"}), 403
 
-    query = db.session.query(Inquiry).filter_by(seller_id=supplier_id)
+    status = request.args.get('status')
+    limit = get_limit(default=20)
+    cursor = request.args.get('cursor')
+
+    # Unread badge count rides along as a scalar subquery so the page and summary share one round trip
+    unread_count = db.session.query(func.count(Inquiry.id)).filter(
+        Inquiry.seller_id == supplier_id,
+        Inquiry.is_read == False
+    ).scalar_subquery()
+
+    query = db.session.query(
+        Inquiry,
+        User.first_name,
+        User.last_name,
+        User.email,
+        Product.name.label('product_name'),
+        unread_count.label('unread_count')
+    ).outerjoin(User, User.id == Inquiry.buyer_id).outerjoin(
+        Product, Product.id == Inquiry.product_id
+    ).filter(Inquiry.seller_id == supplier_id)
 
     if status:
-        query = query.filter_by(status=InquiryStatus(status.upper()))
+        try:
+            query = query.filter(Inquiry.status == InquiryStatus(status.upper()))
+        except ValueError:
+            return jsonify({"error": "Invalid status"}), 400
 
-    inquiries = query.order_by(desc(Inquiry.created_at)).limit(limit).all()
+    query = apply_desc_cursor(query, Inquiry.created_at, Inquiry.id, cursor)
+    rows = query.limit(limit + 1).all()
 
-    result = []
-    for inquiry in inquiries:
-        buyer = User.query.get(inquiry.buyer_id)
-        product = Product.query.get(inquiry.product_id) if inquiry.product_id else None
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
+    result = []
+    for inquiry, first_name, last_name, email, product_name, _ in rows:
         result.append({
             'id': str(inquiry.id),
             'subject': inquiry.subject,
@@ -623,14 +742,66 @@ def get_supplier_inquiries(supplier_id):
             'status': inquiry.status.value if inquiry.status else 'pending',
             'isRead': inquiry.is_read,
             'response': inquiry.response,
-            'buyerName': f"{buyer.first_name} {buyer.last_name}" if buyer else 'Unknown',
-            'buyerEmail': buyer.email if buyer else None,
-            'productName': product.name if product else None,
+            'buyerName': f"{first_name} {last_name}" if email else 'Unknown',
+            'buyerEmail': email,
+            'productName': product_name,
             'createdAt': inquiry.created_at.isoformat() if inquiry.created_at else None,
             'respondedAt': inquiry.responded_at.isoformat() if inquiry.responded_at else None
         })
 
-    return jsonify(result)
+    if rows:
+        unread = rows[0].unread_count
+    else:
+        unread = db.session.query(unread_count).scalar()
+
+    last = rows[-1][0] if rows else None
+    return jsonify({
+        "inquiries": result,
+        "summary": {
+            "unreadCount": unread or 0
+        },
+        "pagination": {
+            "limit": limit,
+            "nextCursor": encode_cursor(last.created_at, last.id) if has_more else None,
+            "hasMore": has_more
+        }
+    })
+
+
+@supplier_bp.route("/<int:supplier_id>/inquiries/read", methods=["POST"])
+@identity_required()
+def mark_inquiries_read(supplier_id):
+    """Mark the given inquiry ids (or all with {"all": true}) as read in one statement"""
+    if g.identity.seller_id != supplier_id:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    data = request.get_json() or {}
+    conditions = [Inquiry.seller_id == supplier_id, Inquiry.is_read == False]
+    if not data.get('all'):
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({"error": "Inquiry ids are required"}), 400
+        try:
+            ids = [int(inquiry_id) for inquiry_id in ids]
+        except (TypeError, ValueError):
+            return jsonify({"error": "Inquiry ids must be integers"}), 400
+        conditions.append(Inquiry.id.in_(ids))
+
+    marked = db.session.execute(
+        update(Inquiry).where(*conditions).values(is_read=True).execution_options(synchronize_session=False)
+    ).rowcount
+
+    if marked:
+        remaining = func.coalesce(SellerProfile.unread_messages, 0) - marked
+        db.session.execute(
+            update(SellerProfile)
+            .where(SellerProfile.id == supplier_id)
+            .values(unread_messages=case((remaining < 0, 0), else_=remaining))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    return jsonify({"updated": marked})
 
 
 @supplier_bp.route("/<int:supplier_id>/low-stock-products", methods=["GET"])
@@ -677,6 +848,15 @@ def contact_supplier(supplier_id):
     )
 
     db.session.add(inquiry)
+    db.session.execute(
+        update(SellerProfile)
+        .where(SellerProfile.id == supplier_id)
+        .values(
+            total_inquiries=func.coalesce(SellerProfile.total_inquiries, 0) + 1,
+            unread_messages=func.coalesce(SellerProfile.unread_messages, 0) + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
 
     return jsonify({"message": "Inquiry sent successfully", "inquiryId": str(inquiry.id)}), 201
@@ -1059,10 +1239,10 @@ def update_stock(supplier_id):
 
     updated_products = []
 
-    for update in data['updates']:
-        product_id = update.get('productId')
-        new_stock = update.get('stock')
-        reason = update.get('reason', 'Manual update')
+    for stock_update in data['updates']:
+        product_id = stock_update.get('productId')
+        new_stock = stock_update.get('stock')
+        reason = stock_update.get('reason', 'Manual update')
 
         if not product_id or new_stock is None:
             continue
@@ -0,0 +1,338 @@
+import base64
+import mimetypes
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import timezone
+
+from app.config import Config
+
+
+# Keys are content hashes, so an object never changes once stored
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class StorageError(Exception):
+    """Storage operation the configured backend cannot perform"""
+
+
+def _content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def _not_found(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+class BlobStorage:
+    """Where uploaded files live. Keys are '/'-separated paths such as 'ab/cd/<sha256>.jpg'."""
+
+    def __init__(self, public_base_url):
+        self.public_base_url = public_base_url.rstrip('/')
+
+    def public_url(self, key):
+        return f"{self.public_base_url}/{key}"
+
+    def key_for_url(self, url):
+        """Storage key for a url served from this backend, None if it lives elsewhere"""
+        prefix = self.public_base_url + '/'
+        return url[len(prefix):] if url.startswith(prefix) else None
+
+    def put_file(self, key, path, content_type=None):
+        """Store a finished local file under key, consuming it.
+
+        Returns False if key already existed; the existing object is touched
+        instead, so age-based cleanup treats it as freshly uploaded.
+        """
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def touch(self, key):
+        """Reset an object's modification time to now. False if it does not exist."""
+        raise NotImplementedError
+
+    def modified_at(self, key):
+        """Modification time of an object in epoch seconds, None if it does not exist"""
+        raise NotImplementedError
+
+    def head(self, key):
+        """{'size': bytes, 'sha256': hex or None} of an object, None if it does not exist.
+        sha256 is the checksum the backend stored and verified on upload, if it keeps one."""
+        raise NotImplementedError
+
+    def read_head(self, key, length):
+        """First length bytes of an object"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def iter_objects(self):
+        """Yield (key, size, mtime_epoch) for every stored object"""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_copy(self, key):
+        """Context manager yielding a local filesystem path holding the object's bytes"""
+        raise NotImplementedError
+
+    def presigned_upload(self, key, content_type, size, sha256_hex, expires_in=900):
+        raise StorageError("Direct uploads are not supported by this storage backend")
+
+
+class LocalStorage(BlobStorage):
+    """Files under Config.UPLOAD_FOLDER, served by the /images route"""
+
+    def __init__(self, root, public_base_url):
+        super().__init__(public_base_url)
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def staging_dir(self):
+        # Same filesystem as the final location, so put_file is an atomic rename
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def put_file(self, key, path, content_type=None):
+        if self.touch(key):
+            os.remove(path)
+            return False
+        final_path = self.path(key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(path, final_path)
+        return True
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def touch(self, key):
+        try:
+            os.utime(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def modified_at(self, key):
+        try:
+            return os.stat(self.path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def head(self, key):
+        # Only store_stream writes here, hashing as it goes; no checksum is kept
+        try:
+            return {'size': os.stat(self.path(key)).st_size, 'sha256': None}
+        except FileNotFoundError:
+            return None
+
+    def read_head(self, key, length):
+        with open(self.path(key), 'rb') as f:
+            return f.read(length)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_objects(self):
+        if not os.path.isdir(self.root):
+            return
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        key = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                        yield key, stat.st_size, stat.st_mtime
+
+    @contextmanager
+    def local_copy(self, key):
+        yield self.path(key)
+
+
+class S3Storage(BlobStorage):
+    """S3 or any S3-compatible store (MinIO, Ceph, a local moto server) via boto3.
+
+    One client per process is shared by all threads; its connection pool is sized
+    by STORAGE_S3_MAX_POOL. Large files go up as concurrent multipart uploads.
+    """
+
+    def __init__(self, bucket, public_base_url, endpoint_url=None, region=None, max_pool=20,
+                 multipart_threshold=8 * 1024 * 1024):
+        super().__init__(public_base_url)
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise StorageError("The S3 storage backend requires boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.client = boto3.session.Session().client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=BotoConfig(
+                signature_version='s3v4',
+                max_pool_connections=max_pool,
+                retries={'max_attempts': 5, 'mode': 'adaptive'},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=4,
+        )
+
+    def staging_dir(self):
+        return None  # system temp dir
+
+    def put_file(self, key, path, content_type=None):
+        try:
+            if self.touch(key):
+                return False
+            extra = {
+                'ContentType': content_type or _content_type(key),
+                'CacheControl': IMMUTABLE,
+            }
+            self.client.upload_file(path, self.bucket, key, ExtraArgs=extra, Config=self.transfer_config)
+            return True
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _head(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key, ChecksumMode='ENABLED')
+        except ClientError as e:
+            if _not_found(e):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def touch(self, key):
+        """Copy the object onto itself, which is how S3 gives it a new LastModified"""
+        from botocore.exceptions import ClientError
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={'Bucket': self.bucket, 'Key': key},
+                MetadataDirective='REPLACE',  # required for an in-place copy
+                ContentType=_content_type(key),
+                CacheControl=IMMUTABLE,
+                ChecksumAlgorithm='SHA256',  # keep the checksum direct uploads are verified against
+            )
+            return True
+        except ClientError as e:
+            if _not_found(e):
+                return False
+            raise
+
+    def modified_at(self, key):
+        head = self._head(key)
+        return head['LastModified'].timestamp() if head else None
+
+    def head(self, key):
+        head = self._head(key)
+        if head is None:
+            return None
+        checksum = head.get('ChecksumSHA256')
+        # Multipart objects carry a checksum of part checksums ('...-N'), not of the bytes
+        if checksum and '-' not in checksum:
+            checksum = base64.b64decode(checksum).hex()
+        else:
+            checksum = None
+        return {'size': head['ContentLength'], 'sha256': checksum}
+
+    def read_head(self, key, length):
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{length - 1}")
+        return response['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_objects(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket):
+            for obj in page.get('Contents', []):
+                modified = obj['LastModified'].replace(tzinfo=obj['LastModified'].tzinfo or timezone.utc)
+                yield obj['Key'], obj['Size'], modified.timestamp()
+
+    @contextmanager
+    def local_copy(self, key):
+        import tempfile
+        directory = tempfile.mkdtemp(prefix='blob-')
+        path = os.path.join(directory, key.rsplit('/', 1)[-1])
+        try:
+            self.client.download_file(self.bucket, key, path)
+            yield path
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def presigned_upload(self, key, content_type, size, sha256_hex, expires_in=900):
+        """Presigned PUT the client uses to send bytes straight to the bucket.
+
+        Content type, length and SHA-256 checksum are part of the signature, so the
+        store rejects any body other than the one the key was derived from.
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode()
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': key,
+                'ContentType': content_type,
+                'ContentLength': size,
+                'ChecksumSHA256': checksum,
+                'CacheControl': IMMUTABLE,
+            },
+            ExpiresIn=expires_in,
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {
+                'Content-Type': content_type,
+                'x-amz-checksum-sha256': checksum,
+                'Cache-Control': IMMUTABLE,
+            },
+        }
+
+
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """This process's storage backend, built from STORAGE_BACKEND on first use"""
+    global _storage, _storage_pid
+    with _storage_lock:
+        # HTTP connection pools must not be shared across fork
+        if _storage is None or _storage_pid != os.getpid():
+            if Config.STORAGE_BACKEND == 's3':
+                _storage = S3Storage(
+                    bucket=Config.STORAGE_S3_BUCKET,
+                    public_base_url=Config.PUBLIC_IMAGE_BASE_URL,
+                    endpoint_url=Config.STORAGE_S3_ENDPOINT_URL,
+                    region=Config.STORAGE_S3_REGION,
+                    max_pool=Config.STORAGE_S3_MAX_POOL,
+                )
+            else:
+                _storage = LocalStorage(Config.UPLOAD_FOLDER, Config.PUBLIC_IMAGE_BASE_URL)
+            _storage_pid = os.getpid()
+        return _storage
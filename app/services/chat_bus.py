@@ -0,0 +1,163 @@
+import json
+import logging
+import queue
+import select
+import threading
+from collections import defaultdict
+
+from flask import current_app
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "chat_events"
+NOTIFY_PAYLOAD_LIMIT = 7900  # Postgres rejects NOTIFY payloads of 8000 bytes or more
+
+
+class Subscription:
+    """One connected client's bounded event queue.
+
+    Publishers never block on a slow client: when the queue is full the
+    subscription is marked overflowed and the stream tells the client to resync
+    over HTTP instead of buffering without limit.
+    """
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = str(user_id)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBus:
+    """In-process fan-out, enough for a single worker process"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, user_ids, event):
+        self._deliver([str(u) for u in user_ids], event)
+
+    def _deliver(self, user_ids, event):
+        with self._lock:
+            targets = [s for u in user_ids for s in self._subscribers.get(u, ())]
+        for subscription in targets:
+            subscription.push(event)
+
+
+class PostgresBus(LocalBus):
+    """Fan-out across worker processes and hosts through Postgres LISTEN/NOTIFY.
+
+    Every process keeps one listening connection, started with its first
+    subscriber, and delivers notifications to its own local subscribers.
+    """
+
+    def __init__(self, engine, queue_size=100):
+        super().__init__(queue_size)
+        self.engine = engine
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_ids, event):
+        payload = json.dumps({"users": [str(u) for u in user_ids], "event": event})
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # Too large to inline; clients fetch the full message over HTTP
+            payload = json.dumps({"users": [str(u) for u in user_ids], "event": _slim(event)})
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, payload))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="chat-bus-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            raw = None
+            try:
+                raw = self.engine.raw_connection()
+                conn = raw.driver_connection  # unavailable once detached
+                raw.detach()  # never hand a LISTENing connection back to the pool
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        message = json.loads(notify.payload)
+                        self._deliver(message["users"], message["event"])
+            except Exception:
+                logger.exception("Chat bus listener failed, reconnecting")
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+                threading.Event().wait(1)
+
+
+def _slim(event):
+    slim = {k: v for k, v in event.items() if k != "message"}
+    if "message" in event:
+        slim["messageId"] = event["message"].get("id")
+    return slim
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    """Return this process's bus, built from CHAT_BUS_BACKEND on first use"""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                queue_size = current_app.config.get("CHAT_SUBSCRIBER_QUEUE_SIZE", 100)
+                if current_app.config.get("CHAT_BUS_BACKEND") == "postgres":
+                    _bus = PostgresBus(db.engine, queue_size)
+                else:
+                    _bus = LocalBus(queue_size)
+    return _bus
@@ -0,0 +1,280 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, literal, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, load_only
+
+from app.extensions import db
+from app.models import ChatMessage, ChatRoom, Product, ProductImage, SellerProfile, User, UserRole
+from app.utils.pagination import apply_desc_cursor, encode_cursor
+
+
+def get_room_for_participant(room_id, user_id):
+    """Return the room's participant ids if user_id is its buyer or seller, else None"""
+    room = db.session.query(
+        ChatRoom.id, ChatRoom.buyer_id, ChatRoom.seller_id, SellerProfile.user_id.label('seller_user_id')
+    ).join(SellerProfile, SellerProfile.id == ChatRoom.seller_id).filter(ChatRoom.id == room_id).first()
+
+    if not room or str(user_id) not in (str(room.buyer_id), str(room.seller_user_id)):
+        return None
+    return room
+
+
+def serialize_messages(messages):
+    """Serialize messages, loading all their senders in one query"""
+    sender_ids = {m.sender_id for m in messages}
+    senders = {}
+    if sender_ids:
+        senders = {
+            u.id: u for u in User.query.options(
+                load_only(User.first_name, User.last_name, User.role)
+            ).filter(User.id.in_(sender_ids))
+        }
+    return [m.to_dict(sender=senders.get(m.sender_id)) for m in messages]
+
+
+def _position_of(room_id, message_id):
+    """(created_at, id) of a message in this room, as a SQL row value"""
+    created_at = select(ChatMessage.created_at).where(
+        ChatMessage.id == message_id,
+        ChatMessage.chat_room_id == room_id
+    ).scalar_subquery()
+    return tuple_(created_at, literal(message_id))
+
+
+def get_messages_page(room_id, before=None, after=None, limit=50):
+    """Return (messages, has_more) in chronological order.
+
+    Without a cursor this is the newest page; `before` pages back through older
+    messages and `after` fetches anything newer than the given message id.
+    """
+    query = ChatMessage.query.filter(ChatMessage.chat_room_id == room_id)
+    position = tuple_(ChatMessage.created_at, ChatMessage.id)
+
+    if after:
+        messages = query.filter(position > _position_of(room_id, after)).order_by(
+            ChatMessage.created_at, ChatMessage.id
+        ).limit(limit + 1).all()
+        return messages[:limit], len(messages) > limit
+
+    if before:
+        query = query.filter(position < _position_of(room_id, before))
+    messages = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+    return list(reversed(messages[:limit])), len(messages) > limit
+
+
+def post_message(room, sender_id, content, message_type='text', attachment=None):
+    """Append a message, move the room's last-message pointer to it and bump
+    the recipient's unread counter in the same statement"""
+    room_id = room.id
+    attachment = attachment or {}
+    message = ChatMessage(
+        chat_room_id=room_id,
+        sender_id=int(sender_id),
+        content=content,
+        message_type=message_type,
+        attachment_url=attachment.get('url'),
+        attachment_name=attachment.get('name'),
+        attachment_type=attachment.get('type'),
+        created_at=datetime.utcnow(),
+    )
+    db.session.add(message)
+    db.session.flush()
+
+    sent_by_buyer = str(sender_id) == str(room.buyer_id)
+    if sent_by_buyer:
+        unread = {'seller_unread_count': ChatRoom.seller_unread_count + 1}
+    else:
+        unread = {'buyer_unread_count': ChatRoom.buyer_unread_count + 1}
+
+    db.session.execute(
+        update(ChatRoom)
+        .where(ChatRoom.id == room_id)
+        .values(last_message_id=message.id, last_message_at=message.created_at, **unread)
+        .execution_options(synchronize_session=False)
+    )
+    if sent_by_buyer:
+        db.session.execute(
+            update(SellerProfile)
+            .where(SellerProfile.id == room.seller_id)
+            .values(unread_messages=func.coalesce(SellerProfile.unread_messages, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return message
+
+
+def _minus(column, amount):
+    """column - amount, floored at zero"""
+    remaining = func.coalesce(column, 0) - amount
+    return case((remaining < 0, 0), else_=remaining)
+
+
+def mark_messages_read(room, reader_id, up_to_message_id):
+    """Mark every message the reader received in this room up to a message id as read.
+
+    One ranged UPDATE flips the messages; the reader's room counter (and the
+    seller dashboard counter) drop by the number of rows it touched, in the
+    same transaction. Returns that number.
+    """
+    try:
+        result = db.session.execute(
+            update(ChatMessage)
+            .where(
+                ChatMessage.chat_room_id == room.id,
+                ChatMessage.id <= up_to_message_id,
+                ChatMessage.sender_id != int(reader_id),
+                ChatMessage.is_read == False
+            )
+            .values(is_read=True, read_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        marked = result.rowcount
+        if marked:
+            if str(reader_id) == str(room.buyer_id):
+                counter = {'buyer_unread_count': _minus(ChatRoom.buyer_unread_count, marked)}
+            else:
+                counter = {'seller_unread_count': _minus(ChatRoom.seller_unread_count, marked)}
+                db.session.execute(
+                    update(SellerProfile)
+                    .where(SellerProfile.id == room.seller_id)
+                    .values(unread_messages=_minus(SellerProfile.unread_messages, marked))
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.execute(
+                update(ChatRoom)
+                .where(ChatRoom.id == room.id)
+                .values(**counter)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return marked
+
+
+def get_or_create_room(buyer_id, seller_id, product_id=None):
+    """Find the buyer's conversation with a seller (optionally about a product), opening it if needed.
+
+    Returns (None, False) if the room could not be created and none exists,
+    e.g. the seller or product was deleted meanwhile.
+    """
+    room = ChatRoom.query.filter_by(buyer_id=buyer_id, seller_id=seller_id, product_id=product_id).first()
+    if room:
+        return room, False
+
+    room = ChatRoom(buyer_id=buyer_id, seller_id=seller_id, product_id=product_id)
+    db.session.add(room)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Opened concurrently by another request
+        db.session.rollback()
+        room = ChatRoom.query.filter_by(buyer_id=buyer_id, seller_id=seller_id, product_id=product_id).first()
+        return room, False
+    return room, True
+
+
+def get_inbox_page(user_id, role, cursor=None, limit=20):
+    """Return (rows, next_cursor) for a participant's conversations, most recent first.
+
+    Each row carries the room, its last message, product thumbnail, both parties'
+    display info and the caller's unread count, all from a single query: the last
+    message is a direct join on ChatRoom.last_message_id and unread counts are
+    maintained columns, so nothing scales with the number of messages.
+    """
+    last_message = aliased(ChatMessage)
+    buyer = aliased(User)
+
+    def first_image(column):
+        return select(column).where(
+            ProductImage.product_id == ChatRoom.product_id
+        ).order_by(ProductImage.is_primary.desc(), ProductImage.id).limit(1).correlate(ChatRoom).scalar_subquery()
+
+    if role == UserRole.SELLER:
+        seller_id = select(SellerProfile.id).where(SellerProfile.user_id == user_id).scalar_subquery()
+        owner_filter = ChatRoom.seller_id == seller_id
+        unread = ChatRoom.seller_unread_count
+    else:
+        owner_filter = ChatRoom.buyer_id == user_id
+        unread = ChatRoom.buyer_unread_count
+
+    query = db.session.query(
+        ChatRoom.id,
+        ChatRoom.buyer_id,
+        ChatRoom.seller_id,
+        ChatRoom.product_id,
+        ChatRoom.is_active,
+        ChatRoom.last_message_at,
+        ChatRoom.created_at,
+        unread.label('unread_count'),
+        last_message.id.label('message_id'),
+        last_message.sender_id.label('message_sender_id'),
+        last_message.content.label('message_content'),
+        last_message.message_type.label('message_type'),
+        last_message.is_read.label('message_is_read'),
+        last_message.created_at.label('message_created_at'),
+        Product.name.label('product_name'),
+        Product.price.label('product_price'),
+        first_image(ProductImage.url).label('product_image'),
+        first_image(ProductImage.variants).label('product_image_variants'),
+        SellerProfile.store_name.label('seller_name'),
+        SellerProfile.logo_url.label('seller_logo'),
+        buyer.first_name.label('buyer_first_name'),
+        buyer.last_name.label('buyer_last_name'),
+    ).join(
+        SellerProfile, SellerProfile.id == ChatRoom.seller_id
+    ).join(
+        buyer, buyer.id == ChatRoom.buyer_id
+    ).outerjoin(
+        last_message, last_message.id == ChatRoom.last_message_id
+    ).outerjoin(
+        Product, Product.id == ChatRoom.product_id
+    ).filter(owner_filter)
+
+    query = apply_desc_cursor(query, ChatRoom.last_message_at, ChatRoom.id, cursor)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].last_message_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def serialize_inbox_row(row):
+    return {
+        'id': str(row.id),
+        'buyerId': str(row.buyer_id),
+        'sellerId': str(row.seller_id),
+        'productId': str(row.product_id) if row.product_id else None,
+        'productInfo': {
+            'id': str(row.product_id),
+            'name': row.product_name,
+            'price': row.product_price,
+            'image': ProductImage.pick_url(row.product_image, row.product_image_variants, 'thumbnail')
+        } if row.product_id else None,
+        'sellerInfo': {
+            'id': str(row.seller_id),
+            'name': row.seller_name,
+            'avatar': row.seller_logo
+        },
+        'buyerInfo': {
+            'id': str(row.buyer_id),
+            'name': f"{row.buyer_first_name} {row.buyer_last_name}",
+            'avatar': None
+        },
+        'lastMessage': {
+            'id': str(row.message_id),
+            'senderId': str(row.message_sender_id),
+            'content': row.message_content,
+            'messageType': row.message_type,
+            'isRead': row.message_is_read,
+            'createdAt': row.message_created_at.isoformat() if row.message_created_at else None
+        } if row.message_id else None,
+        'lastMessageAt': row.last_message_at.isoformat() if row.last_message_at else None,
+        'unreadCount': row.unread_count or 0,
+        'isActive': row.is_active,
+        'createdAt': row.created_at.isoformat() if row.created_at else None
+    }
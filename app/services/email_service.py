@@ -1,13 +1,185 @@
-from flask_mail import Message
-from app.extensions import mail
+import logging
+import random
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
 from flask import current_app
+from flask_mail import Message
+
+from app.config import Config
+from app.extensions import db, mail
+from app.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# A message is claimed for this long; if its worker dies it becomes due again afterwards
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue_email(recipient, subject, body, html=None, expires_in=None):
+    """Queue an email for the email worker.
+
+    The row joins the caller's transaction, so the email goes out only if the
+    change that triggered it is committed, and the request never waits on SMTP.
+    Messages carrying a secret pass its lifetime as expires_in (seconds): once
+    it has passed the message is dropped unsent and its body cleared.
+    """
+    email = EmailOutbox(
+        recipient=recipient, subject=subject, body=body, html=html,
+        expires_at=datetime.utcnow() + timedelta(seconds=expires_in) if expires_in else None,
+    )
+    db.session.add(email)
+    return email
+
 
 def send_otp_email(recipient, otp):
-    msg = Message("SwiftSupply OTP Verification", recipients=[recipient])
-    msg.body = f"Your OTP code is: {otp}"
-    mail.send(msg)
+    return enqueue_email(recipient, "SwiftSupply OTP Verification", f"Your OTP code is: {otp}",
+                         expires_in=Config.OTP_TTL)
+
 
 def send_password_reset(recipient, reset_link):
-    msg = Message("SwiftSupply Password Reset", recipients=[recipient])
-    msg.body = f"Click to reset your password: {reset_link}"
-    mail.send(msg)
+    return enqueue_email(recipient, "SwiftSupply Password Reset", f"Click to reset your password: {reset_link}",
+                         expires_in=Config.RESET_TOKEN_TTL)
+
+
+def _scrub(row, status):
+    """Finish a message, dropping its content: it may hold an OTP or reset link"""
+    row.status = status
+    row.body = ''
+    row.html = None
+
+
+def retry_delay(attempts):
+    """Exponential backoff with full jitter: up to base * 2^(attempts-1) seconds, capped"""
+    ceiling = min(Config.EMAIL_RETRY_MAX, Config.EMAIL_RETRY_BASE * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def _claim_batch(batch_size):
+    """Lease due messages to this worker. Returns plain dicts, so sending needs no session."""
+    now = datetime.utcnow()
+    rows = EmailOutbox.query.filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    claimed = []
+    for row in rows:
+        if row.expires_at is not None and row.expires_at <= now:
+            _scrub(row, 'expired')
+            continue
+        row.attempts += 1
+        row.next_attempt_at = now + CLAIM_TIMEOUT
+        claimed.append({'id': row.id, 'recipient': row.recipient, 'subject': row.subject,
+                        'body': row.body, 'html': row.html, 'attempts': row.attempts})
+    db.session.commit()
+    return claimed
+
+
+def _send_over_one_connection(app, emails):
+    """Send a share of the batch over a single SMTP connection. Returns {id: error or None}."""
+    results = {}
+    with app.app_context():
+        pending = list(emails)
+        while pending:
+            try:
+                with mail.connect() as connection:
+                    while pending:
+                        email = pending[0]
+                        message = Message(email['subject'], recipients=[email['recipient']],
+                                          body=email['body'], html=email['html'])
+                        try:
+                            connection.send(message)
+                            results[email['id']] = None
+                        except smtplib.SMTPRecipientsRefused as e:
+                            results[email['id']] = f"Recipient refused: {e.recipients}"
+                        except (smtplib.SMTPResponseException, ValueError, AssertionError) as e:
+                            results[email['id']] = repr(e)
+                        pending.pop(0)
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection-level failure: the message in hand is charged, the rest retry on a new connection
+                if pending:
+                    results[pending.pop(0)['id']] = repr(e)
+                if isinstance(e, (ConnectionRefusedError, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)):
+                    for email in pending:
+                        results[email['id']] = repr(e)
+                    pending = []
+    return results
+
+
+def process_email_outbox(batch_size=100, concurrency=None):
+    """Deliver one batch of due emails. Returns the number of messages attempted.
+
+    The batch is split across at most `concurrency` threads, each reusing one SMTP
+    connection for its whole share. Failed messages are rescheduled with
+    exponential backoff until EMAIL_MAX_ATTEMPTS, then marked failed.
+    """
+    concurrency = concurrency or Config.EMAIL_WORKER_CONCURRENCY
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return 0
+
+    app = current_app._get_current_object()
+    shares = [emails[i::concurrency] for i in range(min(concurrency, len(emails)))]
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+        for share_results in pool.map(lambda share: _send_over_one_connection(app, share), shares):
+            results.update(share_results)
+
+    now = datetime.utcnow()
+    attempts = {email['id']: email['attempts'] for email in emails}
+    for row in EmailOutbox.query.filter(EmailOutbox.id.in_(list(results))).all():
+        error = results[row.id]
+        if error is None:
+            _scrub(row, 'sent')
+            row.sent_at = now
+            row.last_error = None
+        elif attempts[row.id] >= Config.EMAIL_MAX_ATTEMPTS:
+            _scrub(row, 'failed')
+            row.last_error = error
+            logger.error("Giving up on email %s to %s: %s", row.id, row.recipient, error)
+        else:
+            row.next_attempt_at = now + retry_delay(attempts[row.id])
+            row.last_error = error
+            logger.warning("Email %s to %s failed, retrying at %s: %s", row.id, row.recipient, row.next_attempt_at, error)
+    db.session.commit()
+    return len(emails)
+
+
+def sweep_outbox(retention_days=7):
+    """Expire lapsed pending messages and delete finished ones older than retention_days.
+
+    Returns (expired, deleted). Expired messages lose their body at once;
+    finished rows are kept for a while only as a delivery log.
+    """
+    now = datetime.utcnow()
+    expired = EmailOutbox.query.filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.expires_at <= now
+    ).update({'status': 'expired', 'body': '', 'html': None}, synchronize_session=False)
+    deleted = EmailOutbox.query.filter(
+        EmailOutbox.status != 'pending',
+        EmailOutbox.created_at < now - timedelta(days=retention_days)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return expired, deleted
+
+
+def run_email_worker(batch_size=100, concurrency=None, idle_interval=2.0, once=False):
+    """Drain the outbox continuously, sleeping while nothing is due"""
+    while True:
+        try:
+            attempted = process_email_outbox(batch_size, concurrency)
+        except Exception:
+            logger.exception("Email batch failed, retrying")
+            db.session.rollback()
+            attempted = 0
+            time.sleep(idle_interval)
+        if attempted:
+            logger.info("Attempted %d emails", attempted)
+        elif once:
+            return
+        else:
+            time.sleep(idle_interval)
@@ -1,27 +1,154 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import logging
+import re
+import threading
+import time
+
+import requests
+from google.auth import jwt
+from requests.adapters import HTTPAdapter
+
 from app.config import Config
 
-GOOGLE_CLIENT_ID = Config.GOOGLE_CLIENT_ID
+logger = logging.getLogger(__name__)
 
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
 
-# def verify_google_token(token):
-# try:
-#     idinfo = id_token.verify_oauth2_token(token, requests.Request(), Config.GOOGLE_CLIENT_ID)
-#     return idinfo
-# except Exception:
-#     return None
 
-def verify_google_token(token):
-    try:
-        print(token)
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), GOOGLE_CLIENT_ID, clock_skew_in_seconds=300)
-        print("id info", idinfo)
-        # idinfo contains keys like 'sub', 'email', 'name', 'picture', 'email_verified'
-        if idinfo['aud'] != GOOGLE_CLIENT_ID:
-            raise ValueError("Could not verify audience.")
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens locally against cached signing certs.
+
+    Certs are fetched over one pooled HTTP session and kept for as long as
+    Google's Cache-Control max-age allows. Shortly before they expire they are
+    refreshed on a background thread while requests keep using the cached set,
+    so sign-ins only wait on Google for the very first fetch or an unknown key id.
+    Unknown key ids refetch at most once per unknown_key_interval seconds; tokens
+    naming one in between are rejected, so forged key ids cannot hammer Google.
+    """
+
+    def __init__(self, client_id, certs_url, default_max_age=3600, refresh_ahead=300,
+                 clock_skew=300, timeout=5, unknown_key_interval=60):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self.default_max_age = default_max_age
+        self.refresh_ahead = refresh_ahead
+        self.clock_skew = clock_skew
+        self.timeout = timeout
+        self.unknown_key_interval = unknown_key_interval
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=2))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=2))
+
+        self._certs = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._unknown_key_fetch_at = float('-inf')
+
+    def _max_age(self, response):
+        match = MAX_AGE_PATTERN.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        age = response.headers.get('Age', '')
+        return max(0, max_age - int(age)) if age.isdigit() else max_age
+
+    def refresh(self):
+        """Fetch the current signing certs, replacing the cached set"""
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.monotonic() + self._max_age(response)
+        return certs
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing Google signing certs failed; keeping the cached set")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='google-certs-refresh', daemon=True).start()
+
+    def _claim_unknown_key_fetch(self):
+        """True for at most one caller per unknown_key_interval"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._unknown_key_fetch_at < self.unknown_key_interval:
+                return False
+            self._unknown_key_fetch_at = now
+            return True
+
+    def certs(self, key_id=None):
+        """Cached certs, fetched synchronously only when none are usable or key_id is unknown.
+
+        Raises ValueError for an unknown key_id while unknown-key refetches are throttled.
+        """
+        remaining = self._expires_at - time.monotonic()
+        unknown_key = bool(self._certs and remaining > 0 and key_id and key_id not in self._certs)
+        if unknown_key and not self._claim_unknown_key_fetch():
+            raise ValueError(f"Unknown signing key {key_id!r}")
+        if not self._certs or remaining <= 0 or unknown_key:
+            try:
+                return self.refresh()
+            except Exception:
+                # Google unreachable: a stale set still verifies tokens signed with a known key
+                if self._certs and (not key_id or key_id in self._certs):
+                    logger.exception("Refreshing Google signing certs failed; using the stale set")
+                    with self._lock:
+                        # Retry in a minute rather than on every sign-in while Google is down
+                        self._expires_at = time.monotonic() + 60
+                    return self._certs
+                raise
+        if remaining < self.refresh_ahead:
+            self._refresh_in_background()
+        return self._certs
+
+    def verify(self, token):
+        """Claims of a valid Google ID token for this app. Raises ValueError otherwise."""
+        if not token:
+            raise ValueError("Missing token")
+        try:
+            key_id = jwt.decode_header(token).get('kid')
+        except Exception:
+            raise ValueError("Malformed token")
+        try:
+            certs = self.certs(key_id)
+        except requests.RequestException as e:
+            raise ValueError(f"Could not fetch Google signing certs: {e}")
+
+        idinfo = jwt.decode(token, certs=certs, audience=self.client_id, clock_skew_in_seconds=self.clock_skew)
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError("Wrong issuer.")
         if not idinfo.get('email_verified', False):
             raise ValueError("Email not verified by Google.")
         return idinfo
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = GoogleTokenVerifier(Config.GOOGLE_CLIENT_ID, Config.GOOGLE_CERTS_URL)
+        return _verifier
+
+
+def verify_google_token(token):
+    """Verified claims ('sub', 'email', 'name', 'picture', ...) of a Google ID token"""
+    try:
+        return get_verifier().verify(token)
     except ValueError as e:
         raise ValueError(f"Invalid token: {e}")
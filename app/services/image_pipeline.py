@@ -0,0 +1,148 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import Config
+from app.services.blob_storage import get_storage
+from app.services.image_storage import content_hash, key_from_url
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it originals are served as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each variant
+VARIANT_SIZES = {
+    'thumbnail': 200,
+    'card': 480,
+    'detail': 1200,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def variant_filename(filename, size, fmt):
+    stem = filename.rsplit('.', 1)[0]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{stem}_{size}.{extension}"
+
+
+def variant_url(url, size, fmt):
+    base, filename = url.rsplit('/', 1)
+    return f"{base}/{variant_filename(filename, size, fmt)}"
+
+
+def variant_urls(url):
+    """{size: {format: url}} for every variant of an uploaded image url"""
+    return {size: {fmt: variant_url(url, size, fmt) for fmt in VARIANT_FORMATS} for size in VARIANT_SIZES}
+
+
+def has_variants(key):
+    """True once every variant of a stored image has been written (the last one is written last)"""
+    last = variant_filename(key, list(VARIANT_SIZES)[-1], list(VARIANT_FORMATS)[-1])
+    return get_storage().exists(last)
+
+
+def existing_variants(url):
+    """Variant urls for an image whose variants have already been written, else {}"""
+    if not has_variants(key_from_url(url)):
+        return {}
+    return variant_urls(url)
+
+
+def render_variants(key):
+    """Write every size/format variant of one stored image. Runs inside the worker pool.
+
+    Works from a local copy of the original (the file itself for local storage)
+    and hands each finished variant to the storage backend, so a variant is
+    either complete or absent.
+    """
+    storage = get_storage()
+    with storage.local_copy(key) as source, Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+        for size, edge in VARIANT_SIZES.items():
+            resized = original.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                image = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                fd, tmp_path = tempfile.mkstemp(dir=storage.staging_dir(), prefix='.upload-')
+                try:
+                    with os.fdopen(fd, 'wb') as tmp:
+                        image.save(tmp, pil_format, **options)
+                    storage.put_file(variant_filename(key, size, fmt), tmp_path, f"image/{fmt}")
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+    return key
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Per process, like the password hashing pool, and started the same way (forkserver)
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=Config.IMAGE_PIPELINE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit_variants(app, key):
+    """Queue variant generation for a stored upload without blocking the request.
+
+    When rendering finishes, ProductImage rows already pointing at the file get
+    their variants recorded; rows created later pick them up at creation time.
+    """
+    if Image is None or key in _in_flight or has_variants(key):
+        return None
+
+    executor = _get_executor()
+    with _executor_lock:
+        if key in _in_flight:
+            return None
+        _in_flight.add(key)
+    future = executor.submit(render_variants, key)
+
+    def on_done(done):
+        with _executor_lock:
+            _in_flight.discard(key)
+        if done.exception():
+            logger.error("Image variants failed for %s: %s", key, done.exception())
+            return
+        with app.app_context():
+            _record_variants(key)
+
+    future.add_done_callback(on_done)
+    return future
+
+
+def _record_variants(key):
+    from app.extensions import db
+    from app.models import ProductImage
+
+    digest = content_hash(key)
+    if digest:
+        images = ProductImage.query.filter_by(content_hash=digest).all()
+    else:
+        images = ProductImage.query.filter(ProductImage.url.like(f"%/{key}")).all()
+    for image in images:
+        image.variants = variant_urls(image.url)
+    if images:
+        db.session.commit()
+    db.session.remove()
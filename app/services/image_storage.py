@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from sqlalchemy import or_
+
+from app.config import Config
+from app.models import ProductImage, SellerProfile
+from app.services.blob_storage import get_storage
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 12  # enough leading bytes for sniff_image_type to tell every supported format
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+IMAGE_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+
+class UploadRejected(Exception):
+    """Upload refused while streaming, carries the HTTP status to respond with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def sniff_image_type(head):
+    """Extension for the image format identified by its leading bytes, None if not a supported image"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class ImageSpool(tempfile.SpooledTemporaryFile):
+    """Spool for a multipart file part that refuses non-images on their leading bytes.
+
+    Used as the form parser's stream factory: the parser writes the part into it
+    as the body arrives, so UploadRejected (415) aborts parsing before the rest of
+    the upload is read or spooled to disk. store_stream still checks the result.
+    """
+
+    def __init__(self, total_content_length=None, content_type=None, filename=None, content_length=None):
+        super().__init__(max_size=500 * 1024, mode='rb+')
+        self._head = b''
+
+    def write(self, data):
+        if self._head is not None:
+            self._head += bytes(data[:SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SNIFF_BYTES:
+                if not sniff_image_type(self._head):
+                    raise UploadRejected("Only JPEG, PNG, GIF and WebP images are allowed", 415)
+                self._head = None
+        return super().write(data)
+
+
+def blob_key(digest, extension):
+    """Sharded storage key, e.g. 'ab/cd/abcd...ef.jpg', so no directory grows unbounded"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+def key_from_url(url):
+    """Storage key for a public image url"""
+    key = get_storage().key_for_url(url)
+    if key:
+        return key
+    if '/images/' in url:
+        return url.split('/images/', 1)[1]
+    return url.rsplit('/', 1)[-1]
+
+
+def content_hash(key_or_url):
+    """SHA-256 of a content-addressed upload, None for legacy uuid-named files"""
+    stem = key_or_url.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return stem if HASH_PATTERN.match(stem) else None
+
+
+def store_stream(stream, max_bytes=None):
+    """Write an image upload to content-addressed storage, hashing it as it streams to disk.
+
+    The format is sniffed from the first chunk and the size is enforced while
+    reading, so non-images and oversized bodies are rejected (UploadRejected)
+    before they are read in full. Bytes go to a temp file that is then handed to
+    the storage backend (an atomic rename locally, a multipart put for S3).
+    Returns (key, created); created is False when identical bytes were already
+    stored, in which case the new copy is discarded and the stored one touched.
+    """
+    storage = get_storage()
+    max_bytes = max_bytes or Config.MAX_IMAGE_UPLOAD_BYTES
+
+    head = stream.read(CHUNK_SIZE)
+    extension = sniff_image_type(head)
+    if not extension:
+        raise UploadRejected("Only JPEG, PNG, GIF and WebP images are allowed", 415)
+
+    digest = hashlib.sha256()
+    written = 0
+    fd, tmp_path = tempfile.mkstemp(dir=storage.staging_dir(), prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            chunk = head
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadRejected(f"Image exceeds the maximum upload size of {max_bytes} bytes", 413)
+                digest.update(chunk)
+                tmp.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+
+        key = blob_key(digest.hexdigest(), extension)
+        return key, storage.put_file(key, tmp_path, IMAGE_CONTENT_TYPES[extension])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def direct_upload(sha256_hex, content_type, size):
+    """Presigned upload for a client that sends the image straight to the storage backend.
+
+    The key is derived from the declared hash and type, and the backend only
+    accepts a body matching both, so the result is content-addressed exactly like
+    store_stream. Returns (key, upload) where upload is None if the bytes are
+    already stored; like a deduplicated store_stream, that touches the object.
+    """
+    digest = (sha256_hex or '').lower()
+    if not HASH_PATTERN.match(digest):
+        raise UploadRejected("sha256 must be the hex SHA-256 of the file")
+    extension = next((ext for ext, mime in IMAGE_CONTENT_TYPES.items() if mime == content_type), None)
+    if not extension:
+        raise UploadRejected("Only JPEG, PNG, GIF and WebP images are allowed", 415)
+    if not isinstance(size, int) or size <= 0:
+        raise UploadRejected("size must be the file size in bytes")
+    if size > Config.MAX_IMAGE_UPLOAD_BYTES:
+        raise UploadRejected(f"Image exceeds the maximum upload size of {Config.MAX_IMAGE_UPLOAD_BYTES} bytes", 413)
+
+    storage = get_storage()
+    key = blob_key(digest, extension)
+    if storage.touch(key):
+        return key, None
+    return key, storage.presigned_upload(key, content_type, size, digest, Config.DIRECT_UPLOAD_EXPIRES)
+
+
+def verify_upload(url):
+    """Check an uploaded image before a row references it; raises UploadRejected.
+
+    Direct uploads reach the bucket without passing store_stream, and the store
+    only checked them against what the client declared. So the object must
+    exist within the size limit, carry the checksum its key was derived from,
+    and start with the magic bytes of its extension. Urls that are not
+    content-addressed uploads on this storage are left alone.
+    """
+    storage = get_storage()
+    key = storage.key_for_url(url) if isinstance(url, str) else None
+    digest = content_hash(key) if key else None
+    if not digest:
+        return
+
+    head = storage.head(key)
+    if head is None:
+        raise UploadRejected(f"Image {url} has not been uploaded")
+    if not 0 < head['size'] <= Config.MAX_IMAGE_UPLOAD_BYTES:
+        raise UploadRejected(f"Image {url} exceeds the maximum upload size of {Config.MAX_IMAGE_UPLOAD_BYTES} bytes", 413)
+    if head['sha256'] is not None and head['sha256'] != digest:
+        raise UploadRejected(f"Image {url} does not match its checksum")
+    if sniff_image_type(storage.read_head(key, 16)) != key.rsplit('.', 1)[-1]:
+        raise UploadRejected(f"Image {url} is not a {key.rsplit('.', 1)[-1].upper()} image", 415)
+
+
+def count_references(key):
+    """Rows still pointing at a blob: product images by hash, seller logos/covers by url"""
+    digest = content_hash(key)
+    refs = 0
+    if digest:
+        refs += ProductImage.query.filter_by(content_hash=digest).count()
+    refs += SellerProfile.query.filter(
+        or_(SellerProfile.logo_url.like(f"%/{key}"), SellerProfile.cover_image_url.like(f"%/{key}"))
+    ).count()
+    return refs
+
+
+def delete_blob(key):
+    """Remove a blob and its resized variants from storage"""
+    from app.services.image_pipeline import VARIANT_FORMATS, VARIANT_SIZES, variant_filename
+
+    storage = get_storage()
+    storage.delete(key)
+    for size in VARIANT_SIZES:
+        for fmt in VARIANT_FORMATS:
+            storage.delete(variant_filename(key, size, fmt))
+
+
+def release(keys, grace_seconds=None):
+    """Delete the blobs among keys that no row references any more.
+    Call after the referencing rows have been deleted and committed.
+
+    A blob written or deduplicated within grace_seconds (UPLOAD_ATTACH_GRACE)
+    may be about to be attached by a concurrent upload, so it is left for the
+    upload GC instead.
+    """
+    storage = get_storage()
+    grace_seconds = Config.UPLOAD_ATTACH_GRACE if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    released = []
+    for key in set(keys):
+        if count_references(key) == 0:
+            modified = storage.modified_at(key)
+            if modified is not None and modified > cutoff:
+                continue
+            delete_blob(key)
+            released.append(key)
+    return released
@@ -0,0 +1,143 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, func, update
+
+from app.extensions import db
+from app.models import (
+    Activity, ActivityType, BuyerEngagement, Order, OrderEvent, OrderStatus, SalesData, SellerProfile
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _activity_for(event):
+    number = (event.payload or {}).get('orderNumber') or f"#{event.order_id}"
+    if event.event_type == 'placed':
+        title = f"New order {number}"
+    else:
+        title = f"Order {number} {event.to_status.value.lower()}"
+    return Activity(
+        seller_id=event.seller_id,
+        activity_type=ActivityType.ORDER,
+        title=title,
+        description=(event.payload or {}).get('note'),
+        related_entity_id=event.order_id,
+        related_entity_name=number,
+        related_entity_type='order',
+        created_at=event.created_at,
+    )
+
+
+def process_order_events(batch_size=500):
+    """Apply one batch of unprocessed order events to the dashboard aggregates.
+
+    Events are claimed with SKIP LOCKED so several consumers can run side by side.
+    Counter changes are folded per seller/day first and written with one statement
+    per key, and the batch is marked processed in the same transaction, so each
+    event is applied exactly once. Returns the number of events processed.
+    """
+    try:
+        events = OrderEvent.query.filter(OrderEvent.processed_at.is_(None)).order_by(
+            OrderEvent.id
+        ).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not events:
+            db.session.rollback()
+            return 0
+
+        pending_delta = defaultdict(int)
+        sales = defaultdict(lambda: [0.0, 0])  # (seller_id, date) -> [revenue, orders]
+        placed = defaultdict(int)              # (seller_id, date) -> orders placed
+        finished_sellers = set()
+
+        for event in events:
+            day = (event.created_at or datetime.utcnow()).date()
+            if event.event_type == 'placed':
+                placed[(event.seller_id, day)] += 1
+            elif event.event_type == 'status_changed':
+                if event.from_status == OrderStatus.PENDING:
+                    pending_delta[event.seller_id] -= 1
+                if event.to_status == OrderStatus.COMPLETED:
+                    sales[(event.seller_id, day)][0] += (event.payload or {}).get('totalAmount') or 0
+                    sales[(event.seller_id, day)][1] += 1
+                if event.to_status in (OrderStatus.COMPLETED, OrderStatus.CANCELLED):
+                    finished_sellers.add(event.seller_id)
+
+            db.session.add(_activity_for(event))
+
+        for seller_id, delta in pending_delta.items():
+            pending = func.coalesce(SellerProfile.pending_orders, 0) + delta
+            db.session.execute(
+                update(SellerProfile)
+                .where(SellerProfile.id == seller_id)
+                .values(pending_orders=case((pending < 0, 0), else_=pending))
+                .execution_options(synchronize_session=False)
+            )
+
+        if finished_sellers:
+            _refresh_success_rates(finished_sellers)
+
+        for (seller_id, day), (revenue, count) in sales.items():
+            row = SalesData.query.filter_by(seller_id=seller_id, date=day).with_for_update().first()
+            if row:
+                row.revenue = (row.revenue or 0) + revenue
+                row.order_count = (row.order_count or 0) + count
+            else:
+                db.session.add(SalesData(seller_id=seller_id, date=day, revenue=revenue, order_count=count))
+
+        for (seller_id, day), count in placed.items():
+            row = BuyerEngagement.query.filter_by(seller_id=seller_id, stage='orders', date=day).with_for_update().first()
+            if row:
+                row.count = (row.count or 0) + count
+            else:
+                db.session.add(BuyerEngagement(seller_id=seller_id, stage='orders', date=day, count=count))
+
+        db.session.execute(
+            update(OrderEvent)
+            .where(OrderEvent.id.in_([e.id for e in events]))
+            .values(processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(events)
+
+
+def _refresh_success_rates(seller_ids):
+    """Recompute success_rate (completed / finished orders, in percent) for the given sellers"""
+    completed = func.sum(case((Order.status == OrderStatus.COMPLETED, 1), else_=0))
+    finished = func.sum(case((Order.status.in_([OrderStatus.COMPLETED, OrderStatus.CANCELLED]), 1), else_=0))
+    rows = db.session.query(Order.seller_id, completed, finished).filter(
+        Order.seller_id.in_(seller_ids)
+    ).group_by(Order.seller_id).all()
+
+    for seller_id, done, total in rows:
+        rate = round((done or 0) * 100.0 / total, 2) if total else 0.0
+        db.session.execute(
+            update(SellerProfile)
+            .where(SellerProfile.id == seller_id)
+            .values(success_rate=rate)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def run_order_event_consumer(batch_size=500, idle_interval=1.0, once=False):
+    """Drain order events continuously, sleeping while the log is empty"""
+    while True:
+        try:
+            processed = process_order_events(batch_size)
+        except Exception:
+            logger.exception("Order event batch failed, retrying")
+            processed = 0
+            time.sleep(idle_interval)
+        if processed:
+            logger.info("Processed %d order events", processed)
+        elif once:
+            return
+        else:
+            time.sleep(idle_interval)
@@ -0,0 +1,229 @@
+import atexit
+import logging
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+
+from sqlalchemy import delete, select, update
+
+from app.config import Config
+from app.extensions import db
+from app.models import OrderWorkerLease
+
+logger = logging.getLogger(__name__)
+
+# 41 bits of milliseconds since EPOCH_MS, 10 bits of worker id, 12 bits of sequence
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Crockford base32: no I, L, O or U, so numbers survive being read over the phone
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ENCODED_LENGTH = 13  # ceil(63 / 5)
+
+
+def encode_base32(value):
+    chars = []
+    for _ in range(ENCODED_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode_base32(encoded):
+    value = 0
+    for char in encoded:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+class WorkerLease:
+    """Exclusive, expiring claim on one worker id in the order_worker_lease table.
+
+    The holder renews well before expiry and stops issuing numbers a grace
+    period before the lease could lapse, so another process can only reclaim
+    the id once this one can no longer use it (hosts' clocks must agree to
+    within the grace period). A dead process's id frees up after ttl seconds.
+    """
+
+    def __init__(self, engine, ttl, grace=None):
+        self.engine = engine
+        self.ttl = ttl
+        self.grace = grace if grace is not None else ttl / 10
+        self.pid = os.getpid()
+        self.holder = f"{socket.gethostname()}:{self.pid}:{secrets.token_hex(4)}"
+        self.worker_id = None
+        self._renewed_at = 0.0
+
+    def _insert(self):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise RuntimeError(f"Order-number worker leases are not supported on {self.engine.dialect.name}")
+        return insert(OrderWorkerLease)
+
+    def acquire(self):
+        """Claim a free or expired worker id; raises RuntimeError if all are held"""
+        lease = OrderWorkerLease
+        now = time.time()
+        with self.engine.connect() as conn:
+            held = {row.worker_id for row in conn.execute(select(lease.worker_id).where(lease.expires_at >= now))}
+        candidates = [worker_id for worker_id in range(MAX_WORKER_ID + 1) if worker_id not in held]
+        random.shuffle(candidates)
+
+        for worker_id in candidates:
+            stmt = self._insert().values(worker_id=worker_id, holder=self.holder, expires_at=time.time() + self.ttl)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[lease.worker_id],
+                set_={'holder': stmt.excluded.holder, 'expires_at': stmt.excluded.expires_at},
+                where=lease.expires_at < time.time(),
+            ).returning(lease.worker_id)
+            with self.engine.begin() as conn:
+                claimed = conn.execute(stmt).first()
+            if claimed:
+                self.worker_id = worker_id
+                self._renewed_at = time.monotonic()
+                return worker_id
+        raise RuntimeError(f"All {MAX_WORKER_ID + 1} order-number worker ids are leased")
+
+    def renew(self):
+        """Extend the lease; False if another process has reclaimed the id"""
+        with self.engine.begin() as conn:
+            renewed = conn.execute(
+                update(OrderWorkerLease)
+                .where(OrderWorkerLease.worker_id == self.worker_id, OrderWorkerLease.holder == self.holder)
+                .values(expires_at=time.time() + self.ttl)
+            ).rowcount == 1
+        if renewed:
+            self._renewed_at = time.monotonic()
+        return renewed
+
+    def needs_renewal(self):
+        return time.monotonic() - self._renewed_at >= self.ttl / 3
+
+    def usable(self):
+        return time.monotonic() - self._renewed_at < self.ttl - self.grace
+
+    def release(self):
+        """Give the id back early; a no-op in forked children, which never held it"""
+        if self.worker_id is None or os.getpid() != self.pid:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(OrderWorkerLease).where(
+                    OrderWorkerLease.worker_id == self.worker_id, OrderWorkerLease.holder == self.holder
+                ))
+        except Exception:
+            logger.exception("Releasing order-number worker id %s failed; it expires on its own", self.worker_id)
+        self.worker_id = None
+
+
+class OrderNumberGenerator:
+    """Snowflake-style generator producing unique, time-sortable order numbers.
+
+    Numbers are built from the clock, a worker id and an in-memory sequence.
+    The worker id is pinned with worker_id or leased per process from the
+    order_worker_lease table, so issuing a number only touches the database
+    to take or renew the lease. If the clock steps backwards or the sequence
+    for a millisecond is exhausted, the generator keeps counting on its own
+    logical clock instead of blocking or repeating.
+    """
+
+    def __init__(self, worker_id=None, prefix="ORD", lease_ttl=None):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        self.prefix = prefix
+        self.lease_ttl = lease_ttl
+        self._pinned_id = worker_id
+        self._lease = None
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    @property
+    def worker_id(self):
+        with self._lock:
+            return self._current_worker_id()
+
+    def _current_worker_id(self):
+        if self._pinned_id is not None:
+            return self._pinned_id
+
+        lease = self._lease
+        if lease is None:
+            lease = WorkerLease(db.engine, self.lease_ttl or Config.ORDER_WORKER_LEASE_TTL)
+            lease.acquire()
+            atexit.register(lease.release)
+            self._lease = lease
+        elif lease.needs_renewal():
+            try:
+                renewed = lease.renew()
+            except Exception:
+                if not lease.usable():
+                    raise RuntimeError("Order-number worker lease expired and could not be renewed")
+                logger.exception("Renewing order-number worker id %s failed, retrying", lease.worker_id)
+                renewed = True
+            if not renewed:
+                logger.warning("Order-number worker id %s was reclaimed, leasing another", lease.worker_id)
+                lease.acquire()
+        return lease.worker_id
+
+    def next_id(self):
+        with self._lock:
+            worker_id = self._current_worker_id()
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                self._last_ms += 1
+                self._sequence = 0
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self):
+        encoded = encode_base32(self.next_id())
+        return f"{self.prefix}-{encoded[:6]}-{encoded[6:]}"
+
+    def release(self):
+        if self._lease is not None:
+            self._lease.release()
+            self._lease = None
+
+    def reset_after_fork(self):
+        """Forked children must not reuse the parent's worker id or sequence state"""
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+        self._lease = None
+
+
+def pinned_worker_id():
+    """ORDER_WORKER_ID as an int, None to lease one; anything else fails at startup"""
+    if Config.ORDER_WORKER_ID is None:
+        return None
+    try:
+        worker_id = int(Config.ORDER_WORKER_ID)
+    except ValueError:
+        raise ValueError(f"ORDER_WORKER_ID must be an integer, got {Config.ORDER_WORKER_ID!r}")
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ValueError(f"ORDER_WORKER_ID must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+    return worker_id
+
+
+order_numbers = OrderNumberGenerator(worker_id=pinned_worker_id())
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=order_numbers.reset_after_fork)
+
+
+def generate_order_number():
+    return order_numbers.next()
@@ -0,0 +1,299 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.extensions import db
+from app.models import (
+    InventoryLog, Order, OrderEvent, OrderItem, OrderStatus, Product, SellerProfile, User
+)
+from app.services.order_number import generate_order_number
+from app.utils.pagination import apply_desc_cursor, encode_cursor
+
+
+# Allowed status moves; COMPLETED and CANCELLED are terminal
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.CONFIRMED, OrderStatus.CANCELLED},
+    OrderStatus.CONFIRMED: {OrderStatus.READY, OrderStatus.CANCELLED},
+    OrderStatus.READY: {OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+# Buyers may only withdraw an order the supplier has not yet accepted
+BUYER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.CANCELLED},
+}
+
+
+class OrderError(Exception):
+    """Order request that cannot be fulfilled, carries the HTTP status to respond with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def order_read_options():
+    """Loader options that serialize a page of orders in two queries:
+    orders joined with buyer names, then all items with product names"""
+    return (
+        joinedload(Order.buyer).load_only(User.first_name, User.last_name),
+        selectinload(Order.order_items).joinedload(OrderItem.product).load_only(Product.name),
+    )
+
+
+def get_orders_page(seller_id=None, buyer_id=None, status=None, cursor=None, limit=20):
+    """Return (orders, next_cursor) for a newest-first page of orders"""
+    query = db.session.query(Order).options(*order_read_options())
+
+    if seller_id is not None:
+        query = query.filter(Order.seller_id == seller_id)
+    if buyer_id is not None:
+        query = query.filter(Order.buyer_id == buyer_id)
+    if status:
+        query = query.filter(Order.status == OrderStatus(status.upper()))
+
+    query = apply_desc_cursor(query, Order.created_at, Order.id, cursor)
+    orders = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+
+    return orders, next_cursor
+
+
+def _normalize_cart(items):
+    """Merge the cart into {product_id: (quantity, expected_unit_price)}"""
+    if not isinstance(items, list) or not items:
+        raise OrderError("At least one item is required")
+
+    cart = {}
+    for item in items:
+        try:
+            product_id = int(item['productId'])
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise OrderError("Each item needs a numeric productId and quantity")
+        if quantity <= 0:
+            raise OrderError("Quantity must be positive")
+
+        expected_price = item.get('unitPrice')
+        if expected_price is not None:
+            try:
+                expected_price = float(expected_price)
+            except (TypeError, ValueError):
+                raise OrderError("unitPrice must be a number")
+        previous_qty, previous_price = cart.get(product_id, (0, None))
+        cart[product_id] = (previous_qty + quantity, expected_price if expected_price is not None else previous_price)
+    return cart
+
+
+def place_order(buyer_id, items, notes=None):
+    """Validate a cart, reserve stock for every line and create the order in one transaction.
+
+    Product rows are locked in id order so concurrent orders touching the same
+    products queue up instead of deadlocking; stock and all counters are adjusted
+    with single-statement SQL increments.
+    """
+    cart = _normalize_cart(items)
+    product_ids = sorted(cart)
+    # May take or renew the worker-id lease on its own connection; do it before locking rows
+    order_number = generate_order_number()
+
+    try:
+        products = db.session.query(
+            Product.id, Product.name, Product.price, Product.stock,
+            Product.min_order_qty, Product.seller_id, Product.is_active
+        ).filter(Product.id.in_(product_ids)).order_by(Product.id).with_for_update().all()
+
+        if len(products) != len(product_ids):
+            missing = set(product_ids) - {p.id for p in products}
+            raise OrderError(f"Products not found: {sorted(missing)}", 404)
+
+        seller_ids = {p.seller_id for p in products}
+        if len(seller_ids) != 1:
+            raise OrderError("All items in an order must come from the same supplier")
+        seller_id = seller_ids.pop()
+
+        for p in products:
+            quantity, expected_price = cart[p.id]
+            if not p.is_active:
+                raise OrderError(f"Product '{p.name}' is no longer available", 409)
+            if quantity < (p.min_order_qty or 1):
+                raise OrderError(f"Minimum order quantity for '{p.name}' is {p.min_order_qty}")
+            if expected_price is not None and expected_price != p.price:
+                raise OrderError(f"Price of '{p.name}' has changed", 409)
+            if (p.stock or 0) < quantity:
+                raise OrderError(f"Insufficient stock for '{p.name}'", 409)
+
+        # Reserve stock for all lines in one guarded statement
+        qty_by_id = {pid: qty for pid, (qty, _) in cart.items()}
+        line_qty = case(qty_by_id, value=Product.id)
+        reserved = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(product_ids), Product.stock >= line_qty)
+            .values(
+                stock=Product.stock - line_qty,
+                in_stock=(Product.stock - line_qty) > 0,
+                order_count=func.coalesce(Product.order_count, 0) + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if reserved.rowcount != len(product_ids):
+            raise OrderError("Insufficient stock for one or more items", 409)
+
+        order = Order(
+            order_number=order_number,
+            buyer_id=buyer_id,
+            seller_id=seller_id,
+            status=OrderStatus.PENDING,
+            total_amount=round(sum(p.price * qty_by_id[p.id] for p in products), 2),
+            notes=notes,
+        )
+        db.session.add(order)
+        db.session.flush()
+
+        db.session.add_all([
+            OrderItem(
+                order_id=order.id,
+                product_id=p.id,
+                quantity=qty_by_id[p.id],
+                unit_price=p.price,
+                total_price=round(p.price * qty_by_id[p.id], 2),
+            )
+            for p in products
+        ])
+        db.session.add_all([
+            InventoryLog(product_id=p.id, change=-qty_by_id[p.id], reason=f"Order {order.order_number}")
+            for p in products
+        ])
+
+        db.session.execute(
+            update(SellerProfile)
+            .where(SellerProfile.id == seller_id)
+            .values(
+                total_orders=func.coalesce(SellerProfile.total_orders, 0) + 1,
+                pending_orders=func.coalesce(SellerProfile.pending_orders, 0) + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        db.session.add(OrderEvent(
+            order_id=order.id,
+            seller_id=seller_id,
+            actor_id=buyer_id,
+            event_type='placed',
+            to_status=OrderStatus.PENDING,
+            payload={
+                'orderNumber': order.order_number,
+                'totalAmount': order.total_amount,
+                'itemCount': len(products),
+            },
+        ))
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return order
+
+
+def _release_stock(order_id, order_number):
+    """Return a cancelled order's reserved quantities to stock, the reverse of place_order"""
+    qty_by_id = dict(
+        db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .filter(OrderItem.order_id == order_id)
+        .group_by(OrderItem.product_id)
+    )
+    if not qty_by_id:
+        return
+    product_ids = sorted(qty_by_id)
+
+    # Same lock order as place_order, so a cancel and an order cannot deadlock
+    db.session.query(Product.id).filter(Product.id.in_(product_ids)).order_by(Product.id).with_for_update().all()
+
+    line_qty = case(qty_by_id, value=Product.id)
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids))
+        .values(
+            stock=func.coalesce(Product.stock, 0) + line_qty,
+            in_stock=(func.coalesce(Product.stock, 0) + line_qty) > 0,
+            order_count=case((Product.order_count > 0, Product.order_count - 1), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.add_all([
+        InventoryLog(product_id=product_id, change=qty, reason=f"Order {order_number} cancelled")
+        for product_id, qty in qty_by_id.items()
+    ])
+
+
+def transition_order(order_id, to_status, actor_id, note=None):
+    """Move an order to a new status and append the matching order event.
+
+    The status update is conditional on the status that was validated, so two
+    concurrent transitions cannot both succeed. Cancelling puts the reserved
+    stock back and undoes the products' order counts in the same transaction.
+    Dashboard aggregates are left to the order event consumer
+    (services/order_events.py).
+    """
+    try:
+        to_status = OrderStatus(str(to_status).upper())
+    except ValueError:
+        raise OrderError("Invalid status")
+
+    try:
+        row = db.session.query(
+            Order.id, Order.order_number, Order.status, Order.total_amount,
+            Order.buyer_id, Order.seller_id, SellerProfile.user_id.label('seller_user_id')
+        ).join(SellerProfile, SellerProfile.id == Order.seller_id).filter(Order.id == order_id).first()
+        if not row:
+            raise OrderError("Order not found", 404)
+
+        if str(row.seller_user_id) == str(actor_id):
+            allowed = ORDER_TRANSITIONS
+        elif str(row.buyer_id) == str(actor_id):
+            allowed = BUYER_TRANSITIONS
+        else:
+            raise OrderError("Order not found", 404)
+
+        if to_status not in allowed.get(row.status, set()):
+            raise OrderError(f"Cannot move order from {row.status.value} to {to_status.value}", 409)
+
+        changed = db.session.execute(
+            update(Order)
+            .where(Order.id == row.id, Order.status == row.status)
+            .values(status=to_status, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if changed.rowcount != 1:
+            raise OrderError("Order was updated concurrently, please retry", 409)
+
+        if to_status == OrderStatus.CANCELLED:
+            _release_stock(row.id, row.order_number)
+
+        db.session.add(OrderEvent(
+            order_id=row.id,
+            seller_id=row.seller_id,
+            actor_id=int(actor_id),
+            event_type='status_changed',
+            from_status=row.status,
+            to_status=to_status,
+            payload={
+                'orderNumber': row.order_number,
+                'totalAmount': row.total_amount,
+                'note': note,
+            },
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return row.status, to_status
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.config import Config
+
+try:
+    import bcrypt
+except ImportError:  # only needed when PASSWORD_HASH_ALGORITHM is "bcrypt" or bcrypt hashes exist
+    bcrypt = None
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def current_method():
+    """(algorithm, cost) new hashes are created with, from config"""
+    algorithm = Config.PASSWORD_HASH_ALGORITHM
+    if algorithm == 'pbkdf2':
+        return algorithm, Config.PASSWORD_PBKDF2_ITERATIONS
+    if algorithm == 'scrypt':
+        return algorithm, Config.PASSWORD_SCRYPT_N
+    if algorithm == 'bcrypt':
+        return algorithm, Config.PASSWORD_BCRYPT_ROUNDS
+    raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+
+
+def method_of(password_hash):
+    """(algorithm, cost) a stored hash was created with, None if unrecognised"""
+    if not password_hash:
+        return None
+    if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        return 'bcrypt', int(password_hash[4:6])
+    method = password_hash.split('$', 1)[0].split(':')
+    try:
+        if method[0] == 'pbkdf2':
+            return 'pbkdf2', int(method[2])
+        if method[0] == 'scrypt':
+            return 'scrypt', int(method[1])
+    except (IndexError, ValueError):
+        pass
+    return None
+
+
+def _hash(password, algorithm, cost):
+    if algorithm == 'bcrypt':
+        if bcrypt is None:
+            raise RuntimeError("bcrypt password hashing requires the bcrypt package")
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=cost)).decode()
+    if algorithm == 'pbkdf2':
+        return generate_password_hash(password, method=f"pbkdf2:sha256:{cost}")
+    return generate_password_hash(password, method=f"scrypt:{cost}:8:1")
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        if bcrypt is None:
+            raise RuntimeError("bcrypt password hashing requires the bcrypt package")
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+    return check_password_hash(password_hash, password)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A pool inherited across fork is unusable, so each process builds its own.
+        # Its workers come from the forkserver, not a fork of this threaded process,
+        # which could copy a lock another thread was holding.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=Config.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(fn, *args):
+    """Run a CPU-bound hash in the pool, so the request thread waits without holding the GIL"""
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    return _get_executor().submit(fn, *args).result()
+
+
+def hash_password(password):
+    algorithm, cost = current_method()
+    return _run(_hash, password, algorithm, cost)
+
+
+def verify_password(password_hash, password):
+    if not password_hash or password is None:
+        return False
+    return _run(_verify, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with another algorithm or a different cost than configured"""
+    return method_of(password_hash) != current_method()
@@ -0,0 +1,181 @@
+import hashlib
+import hmac
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+from app.config import Config
+from app.extensions import db
+from app.models import AuthToken
+from app.utils.security import generate_otp
+
+OTP = 'otp'
+PASSWORD_RESET = 'password_reset'
+
+
+def hash_token(purpose, token, user_id=None):
+    """Keyed hash of a token. OTP codes are short, so their hash also binds the user."""
+    key = (Config.SECRET_KEY or '').encode()
+    message = f"{purpose}:{user_id if user_id is not None else ''}:{token}".encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def generate_reset_token():
+    return secrets.token_urlsafe(32)
+
+
+class DatabaseTokenStore:
+    """Tokens in the auth_token table.
+
+    Writes join the caller's transaction, so an OTP and the email carrying it
+    commit together; callers commit. The user row is never touched.
+    """
+
+    def issue(self, user_id, purpose, token, ttl):
+        """Store token as the user's only live token for purpose"""
+        AuthToken.query.filter_by(user_id=user_id, purpose=purpose).delete(synchronize_session=False)
+        db.session.add(AuthToken(
+            user_id=user_id,
+            purpose=purpose,
+            token_hash=hash_token(purpose, token, user_id if purpose == OTP else None),
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+        ))
+        return token
+
+    def check_code(self, user_id, purpose, code, max_attempts):
+        """Consume a user's code if it matches; every guess counts an attempt, burning the code at max_attempts.
+
+        The attempt is claimed with a conditional UPDATE before the code is
+        compared, so concurrent guesses queue on the row lock and no more than
+        max_attempts of them are ever compared.
+        """
+        claimed = db.session.execute(
+            update(AuthToken)
+            .where(
+                AuthToken.user_id == user_id,
+                AuthToken.purpose == purpose,
+                AuthToken.attempts < max_attempts,
+                AuthToken.expires_at >= datetime.utcnow(),
+            )
+            .values(attempts=AuthToken.attempts + 1)
+            .returning(AuthToken.id, AuthToken.token_hash, AuthToken.attempts)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if not claimed:
+            return False
+
+        matched = hmac.compare_digest(claimed.token_hash, hash_token(purpose, code, user_id))
+        if matched or claimed.attempts >= max_attempts:
+            deleted = db.session.execute(
+                delete(AuthToken).where(AuthToken.id == claimed.id).execution_options(synchronize_session=False)
+            ).rowcount
+            return matched and deleted == 1
+        return False
+
+    def consume(self, purpose, token):
+        """User id owning an unexpired bearer token, consuming it; None if unknown or expired.
+
+        A single DELETE ... RETURNING both claims and consumes the row, so of
+        concurrent requests presenting the same token only one gets it back.
+        """
+        row = db.session.execute(
+            delete(AuthToken)
+            .where(AuthToken.purpose == purpose, AuthToken.token_hash == hash_token(purpose, token))
+            .returning(AuthToken.user_id, AuthToken.expires_at)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if not row:
+            return None
+        return row.user_id if row.expires_at >= datetime.utcnow() else None
+
+    def sweep(self):
+        """Delete expired tokens, returns how many"""
+        deleted = AuthToken.query.filter(AuthToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+class MemoryTokenStore:
+    """Same interface in process memory, for tests and single-process development"""
+
+    def __init__(self):
+        self._tokens = {}   # (user_id, purpose) -> [token_hash, expires_at, attempts]
+        self._by_hash = {}  # (purpose, token_hash) -> user_id
+        self._lock = threading.Lock()
+
+    def _drop(self, user_id, purpose):
+        entry = self._tokens.pop((user_id, purpose), None)
+        if entry:
+            self._by_hash.pop((purpose, entry[0]), None)
+
+    def issue(self, user_id, purpose, token, ttl):
+        token_hash = hash_token(purpose, token, user_id if purpose == OTP else None)
+        with self._lock:
+            self._drop(user_id, purpose)
+            self._tokens[(user_id, purpose)] = [token_hash, datetime.utcnow() + timedelta(seconds=ttl), 0]
+            self._by_hash[(purpose, token_hash)] = user_id
+        return token
+
+    def check_code(self, user_id, purpose, code, max_attempts):
+        with self._lock:
+            entry = self._tokens.get((user_id, purpose))
+            if not entry or entry[1] < datetime.utcnow():
+                return False
+            if hmac.compare_digest(entry[0], hash_token(purpose, code, user_id)):
+                self._drop(user_id, purpose)
+                return True
+            entry[2] += 1
+            if entry[2] >= max_attempts:
+                self._drop(user_id, purpose)
+            return False
+
+    def consume(self, purpose, token):
+        with self._lock:
+            user_id = self._by_hash.get((purpose, hash_token(purpose, token)))
+            if user_id is None:
+                return None
+            expires_at = self._tokens[(user_id, purpose)][1]
+            self._drop(user_id, purpose)
+            return user_id if expires_at >= datetime.utcnow() else None
+
+    def sweep(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [key for key, entry in self._tokens.items() if entry[1] < now]
+            for user_id, purpose in expired:
+                self._drop(user_id, purpose)
+        return len(expired)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_token_store():
+    """This process's token store, built from TOKEN_STORE_BACKEND on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryTokenStore() if Config.TOKEN_STORE_BACKEND == 'memory' else DatabaseTokenStore()
+    return _store
+
+
+def issue_otp(user_id):
+    return get_token_store().issue(user_id, OTP, generate_otp(), Config.OTP_TTL)
+
+
+def check_otp(user_id, code):
+    return get_token_store().check_code(user_id, OTP, str(code or ''), Config.OTP_MAX_ATTEMPTS)
+
+
+def issue_reset_token(user_id):
+    return get_token_store().issue(user_id, PASSWORD_RESET, generate_reset_token(), Config.RESET_TOKEN_TTL)
+
+
+def consume_reset_token(token):
+    if not token:
+        return None
+    return get_token_store().consume(PASSWORD_RESET, token)
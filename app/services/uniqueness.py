@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, exists, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.extensions import db
+from app.models import BuyerProfile, SellerProfile, User
+
+logger = logging.getLogger(__name__)
+
+# field -> (model, column); each column is backed by a unique constraint or an index
+UNIQUE_FIELDS = {
+    'email': (User, User.email),
+    'contact': (User, User.contact),
+    'companyReg': (BuyerProfile, BuyerProfile.company_reg),
+    'storeReg': (SellerProfile, SellerProfile.store_reg),
+}
+
+
+def _probe(field, value, verified_only):
+    model, column = UNIQUE_FIELDS[field]
+    condition = exists().where(column == value)
+    if verified_only:
+        if model is User:
+            condition = exists().where(column == value, User.is_verified == True)
+        else:
+            condition = exists().where(column == value, model.user_id == User.id, User.is_verified == True)
+    return select(literal(field).label('field')).where(condition)
+
+
+def find_taken(values, verified_only=True):
+    """{field: bool} for each non-empty value in values ({'email': ..., 'storeReg': ...}).
+
+    All fields are answered by one UNION ALL of indexed EXISTS probes, a single
+    round trip. verified_only counts only values owned by verified accounts,
+    which is what signup forms validate against.
+    """
+    probes = {field: value for field, value in values.items() if field in UNIQUE_FIELDS and value}
+    if not probes:
+        return {}
+
+    query = union_all(*[_probe(field, value, verified_only) for field, value in probes.items()])
+    taken = {row.field for row in db.session.execute(query)}
+    return {field: field in taken for field in probes}
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter: no false negatives, false positives at about the configured rate"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1000)
+        self.size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UniquenessFilter:
+    """Per-worker Bloom filter over every value of the unique fields.
+
+    A miss proves the value is not taken by anyone in this worker's view, so
+    as-you-type validation can skip the database. Values committed by this
+    process are added immediately; others arrive with the periodic rebuild,
+    so the fast path is for advisory checks only, never for signup itself.
+
+    Rebuilds scan the tables on a background thread while checks keep using
+    the previous filter; until the first build finishes every value is a
+    maybe, answered by the database.
+    """
+
+    def __init__(self, rebuild_interval, error_rate=0.01, chunk_size=5000):
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self._bloom = None
+        self._built_at = float('-inf')
+        self._lock = threading.Lock()
+        self._rebuild = None    # thread scanning the tables
+        self._pending = None    # values added while it runs, replayed into its filter
+
+    def _build(self):
+        total = sum(db.session.query(model).count() for model in {model for model, _ in UNIQUE_FIELDS.values()})
+        bloom = BloomFilter(capacity=total * 2, error_rate=self.error_rate)
+        for field, (model, column) in UNIQUE_FIELDS.items():
+            last_id = 0
+            while True:
+                rows = db.session.query(model.id, column).filter(
+                    model.id > last_id, column.isnot(None)
+                ).order_by(model.id).limit(self.chunk_size).all()
+                if not rows:
+                    break
+                for _, value in rows:
+                    bloom.add(f"{field}:{value}")
+                last_id = rows[-1][0]
+        return bloom
+
+    def _run_rebuild(self, app):
+        bloom = None
+        try:
+            with app.app_context():
+                bloom = self._build()
+        except Exception:
+            logger.exception("Rebuilding the uniqueness filter failed; keeping the previous one")
+        finally:
+            with self._lock:
+                if bloom is not None:
+                    for item in self._pending:
+                        bloom.add(item)
+                    self._bloom = bloom
+                self._built_at = time.monotonic()  # a failed build retries after the interval too
+                self._pending = None
+                self._rebuild = None
+
+    def _current(self):
+        """The filter to check against, None before the first build; starts a rebuild when stale"""
+        bloom = self._bloom
+        if time.monotonic() - self._built_at > self.rebuild_interval:
+            with self._lock:
+                if time.monotonic() - self._built_at > self.rebuild_interval and self._rebuild is None:
+                    self._pending = []
+                    self._rebuild = threading.Thread(
+                        target=self._run_rebuild, args=(current_app._get_current_object(),),
+                        name='uniqueness-filter-rebuild', daemon=True,
+                    )
+                    self._rebuild.start()
+        return bloom
+
+    def add(self, field, value):
+        if not value:
+            return
+        item = f"{field}:{value}"
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(item)
+            if self._bloom is not None:
+                self._bloom.add(item)
+
+    def might_contain(self, field, value):
+        bloom = self._current()
+        return bloom is None or f"{field}:{value}" in bloom
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_filter():
+    """This worker's uniqueness Bloom filter, None unless UNIQUENESS_BLOOM_ENABLED"""
+    global _filter
+    if not Config.UNIQUENESS_BLOOM_ENABLED:
+        return None
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = UniquenessFilter(Config.UNIQUENESS_BLOOM_REBUILD)
+    return _filter
+
+
+def check_taken(values):
+    """find_taken for form validation, answering definite negatives from the Bloom filter"""
+    values = {field: value for field, value in values.items() if field in UNIQUE_FIELDS and value}
+    bloom = get_filter()
+    if bloom is None:
+        return find_taken(values)
+
+    result = {field: False for field in values}
+    maybe = {field: value for field, value in values.items() if bloom.might_contain(field, value)}
+    if maybe:
+        result.update(find_taken(maybe))
+    return result
+
+
+# Values are added at flush, before commit: a rolled-back value only costs a false positive
+@event.listens_for(Session, 'after_flush')
+def _remember_new_values(session, flush_context):
+    if _filter is None:
+        return
+    for obj in list(session.new) + list(session.dirty):
+        for field, (model, column) in UNIQUE_FIELDS.items():
+            if type(obj) is model:
+                _filter.add(field, getattr(obj, column.key))
@@ -0,0 +1,98 @@
+import logging
+import time
+
+from app.extensions import db
+from app.models import Brand, ChatMessage, ProductImage, SellerProfile
+from app.services.blob_storage import get_storage
+from app.services.image_pipeline import VARIANT_SIZES
+from app.services.image_storage import count_references, key_from_url
+
+logger = logging.getLogger(__name__)
+
+# Every column that may hold the url of an uploaded file
+URL_COLUMNS = [
+    (ProductImage, ProductImage.url),
+    (SellerProfile, SellerProfile.logo_url),
+    (SellerProfile, SellerProfile.cover_image_url),
+    (Brand, Brand.logo_url),
+    (ChatMessage, ChatMessage.attachment_url),
+]
+
+TEMP_PREFIX = '.upload-'
+
+
+def _stem(key):
+    """Key without extension or variant suffix, shared by an original and its variants"""
+    stem = key.rsplit('.', 1)[0]
+    for size in VARIANT_SIZES:
+        if stem.endswith(f"_{size}"):
+            return stem[:-len(size) - 1]
+    return stem
+
+
+def referenced_stems(chunk_size=5000):
+    """Stems of every upload some row points at.
+
+    Each column is read in short keyset-paginated SELECTs (no FOR UPDATE), so the
+    scan never holds locks or a long-running cursor on the product tables.
+    """
+    stems = set()
+    for model, column in URL_COLUMNS:
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, column).filter(
+                model.id > last_id,
+                column.isnot(None)
+            ).order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            stems.update(_stem(key_from_url(url)) for _, url in rows if url)
+            last_id = rows[-1][0]
+        db.session.rollback()
+    return stems
+
+
+def collect_garbage(grace_seconds=24 * 3600, dry_run=False, chunk_size=5000):
+    """Delete uploads nothing references that are older than the grace period.
+
+    The grace period covers files uploaded but not yet attached to a product.
+    Candidates are re-checked against the database right before deletion, so a
+    file referenced after the initial scan is kept, and against their current
+    modification time, so a file an upload deduplicated onto since the listing
+    (which touches it) is kept too. Works on whichever storage backend is
+    configured, listing objects as a stream. Returns a summary dict.
+    """
+    storage = get_storage()
+    report = {'scanned': 0, 'deleted': 0, 'bytesReclaimed': 0, 'dryRun': dry_run}
+
+    stems = referenced_stems(chunk_size)
+    cutoff = time.time() - grace_seconds
+    checked = {}
+
+    for key, size, mtime in storage.iter_objects():
+        report['scanned'] += 1
+        if mtime > cutoff:
+            continue
+
+        name = key.rsplit('/', 1)[-1]
+        if not name.startswith(TEMP_PREFIX) and not name.endswith('.tmp'):
+            stem = _stem(key)
+            if stem in stems:
+                continue
+            # Re-check the original once per stem; it covers all of its variants
+            if stem not in checked:
+                checked[stem] = count_references(f"{stem}.{key.rsplit('.', 1)[-1]}") > 0
+            if checked[stem]:
+                continue
+
+        if not dry_run:
+            modified = storage.modified_at(key)
+            if modified is None or modified > cutoff:
+                continue
+            storage.delete(key)
+        report['deleted'] += 1
+        report['bytesReclaimed'] += size
+
+    db.session.rollback()
+    logger.info("Upload GC: %s", report)
+    return report
@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+QUERY_CANCELED = '57014'  # postgres SQLSTATE for statement_timeout
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout took to get a connection.
+
+    That is the time spent waiting for a free connection, plus opening a new
+    one when the pool is below its size or may overflow. A steadily rising
+    wait means the pool, not the database, is the bottleneck.
+    """
+
+    # Checkouts slower than each bound are counted, a coarse histogram of waits
+    WAIT_BOUNDS = {'over10ms': 0.01, 'over100ms': 0.1, 'over1s': 1.0}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = {'checkouts': 0, 'timeouts': 0, 'totalWait': 0.0, 'maxWait': 0.0}
+        self._stats.update(dict.fromkeys(self.WAIT_BOUNDS, 0))
+        self._stats_lock = threading.Lock()
+        self._in_checkout = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; time only the outermost call
+        if getattr(self._in_checkout, 'active', False):
+            return super()._do_get()
+
+        self._in_checkout.active = True
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self._in_checkout.active = False
+            self._record(time.perf_counter() - start, timed_out)
+
+    def _record(self, wait, timed_out):
+        with self._stats_lock:
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['totalWait'] += wait
+            stats['maxWait'] = max(stats['maxWait'], wait)
+            for name, bound in self.WAIT_BOUNDS.items():
+                if wait >= bound:
+                    stats[name] += 1
+            if timed_out:
+                stats['timeouts'] += 1
+
+    def stats(self):
+        """Checkout counters since this pool was created, plus its current occupancy"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avgWait'] = stats['totalWait'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        stats.update(size=self.size(), checkedOut=self.checkedout(), overflow=self.overflow(), idle=self.checkedin())
+        return stats
+
+
+def engine_options(url, config):
+    """Engine options for url from the DB_* settings; the primary and the replica get the same"""
+    url = url or ""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}  # Flask-SQLAlchemy pins in-memory sqlite to a single static connection
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if url.startswith("postgres"):
+        connect_args = {"application_name": config["DB_APPLICATION_NAME"]}
+        if config["DB_STATEMENT_TIMEOUT"]:
+            connect_args["options"] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_stats(db):
+    """TimedQueuePool stats of every engine in this process, keyed by bind ('primary' for the default)"""
+    return {
+        key or 'primary': engine.pool.stats()
+        for key, engine in db.engines.items()
+        if isinstance(engine.pool, TimedQueuePool)
+    }
+
+
+class RoutingSession(Session):
+    """db.session that sends a @read_replica view's SELECTs to the replica bind.
+
+    Flushes, DML and raw SQL always go to the primary, as does everything else
+    when no replica is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and has_app_context()
+            and g.get('db_replica')
+            and REPLICA in self._db.engines
+        ):
+            return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+_replica_down_until = 0.0
+
+
+def read_replica(fn):
+    """Serve a read-only view from the replica, falling back to the primary.
+
+    Only for views that tolerate replication lag and never write. If the
+    replica fails with a connection error, the view is rerun on the primary
+    and the replica is skipped for REPLICA_RETRY_AFTER seconds.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        global _replica_down_until
+        from app.extensions import db
+
+        if REPLICA not in db.engines or time.monotonic() < _replica_down_until:
+            return fn(*args, **kwargs)
+
+        g.db_replica = True
+        try:
+            return fn(*args, **kwargs)
+        except exc.OperationalError as e:
+            if getattr(e.orig, 'pgcode', None) == QUERY_CANCELED:
+                raise  # a slow query, not an unavailable replica
+            logger.warning("Read replica failed, using the primary: %s", e)
+            _replica_down_until = time.monotonic() + current_app.config.get("REPLICA_RETRY_AFTER", 30)
+            db.session.rollback()
+            g.db_replica = False
+            return fn(*args, **kwargs)
+        finally:
+            g.pop('db_replica', None)
+    return wrapper
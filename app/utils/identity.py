@@ -0,0 +1,144 @@
+import threading
+from collections import namedtuple
+from functools import wraps
+
+from cachetools import TTLCache
+from flask import g, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.extensions import db
+from app.models import BuyerProfile, SellerProfile, User
+
+# What authenticated routes need to know about the caller, as a plain immutable snapshot
+Identity = namedtuple('Identity', [
+    'user_id', 'email', 'role', 'first_name', 'last_name', 'contact', 'is_verified',
+    'seller_id', 'seller_verified', 'store_name', 'store_reg', 'store_address',
+    'buyer_type', 'company_name', 'company_reg', 'company_address',
+])
+
+# Columns copied into the snapshot; changing any of them invalidates it
+SNAPSHOT_COLUMNS = {
+    User: ('email', 'role', 'first_name', 'last_name', 'contact', 'is_verified'),
+    SellerProfile: ('user_id', 'is_verified', 'store_name', 'store_reg', 'store_address'),
+    BuyerProfile: ('user_id', 'buyer_type', 'company_name', 'company_reg', 'company_address'),
+}
+
+_cache = TTLCache(maxsize=Config.IDENTITY_CACHE_SIZE, ttl=Config.IDENTITY_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+
+def _load(user_id):
+    """User plus either profile in one joined query"""
+    row = db.session.query(User, SellerProfile, BuyerProfile).outerjoin(
+        SellerProfile, SellerProfile.user_id == User.id
+    ).outerjoin(
+        BuyerProfile, BuyerProfile.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if not row:
+        return None
+
+    user, seller, buyer = row
+    return Identity(
+        user_id=user.id,
+        email=user.email,
+        role=user.role,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        contact=user.contact,
+        is_verified=bool(user.is_verified),
+        seller_id=seller.id if seller else None,
+        seller_verified=bool(seller and seller.is_verified),
+        store_name=seller.store_name if seller else None,
+        store_reg=seller.store_reg if seller else None,
+        store_address=seller.store_address if seller else None,
+        buyer_type=buyer.buyer_type if buyer else None,
+        company_name=buyer.company_name if buyer else None,
+        company_reg=buyer.company_reg if buyer else None,
+        company_address=buyer.company_address if buyer else None,
+    )
+
+
+def load_identity(user_id):
+    """Identity snapshot for a user id, served from the per-worker TTL cache when fresh"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    with _cache_lock:
+        identity = _cache.get(user_id)
+    if identity is None:
+        identity = _load(user_id)
+        if identity is not None:
+            with _cache_lock:
+                _cache[user_id] = identity
+    return identity
+
+
+def invalidate_identity(*user_ids):
+    with _cache_lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+
+def identity_required(seller=False, verified=False):
+    """jwt_required that also resolves the caller into g.identity.
+
+    seller=True answers 403 unless the caller has a seller profile, and
+    verified=True additionally requires that profile to be verified.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            identity = g.identity = load_identity(get_jwt_identity())
+            if identity is None:
+                return jsonify({"error": "Unauthorized user"}), 401
+            if seller and identity.seller_id is None:
+                return jsonify({"error": "Unauthorized access"}), 403
+            if verified and not identity.seller_verified:
+                return jsonify({"error": "Please verify your account first."}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Drop cached snapshots whenever a commit in this process changes a snapshotted column.
+# Other workers catch up within IDENTITY_CACHE_TTL.
+
+def _user_id_of(obj):
+    return obj.id if isinstance(obj, User) else obj.user_id
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_identity_changes(session, flush_context):
+    changed = session.info.setdefault('identity_changes', set())
+    for obj in session.new:
+        if type(obj) in (SellerProfile, BuyerProfile):
+            changed.add(obj.user_id)
+    for obj in session.deleted:
+        if type(obj) in SNAPSHOT_COLUMNS:
+            changed.add(_user_id_of(obj))
+    for obj in session.dirty:
+        columns = SNAPSHOT_COLUMNS.get(type(obj))
+        if columns:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in columns):
+                changed.add(_user_id_of(obj))
+                if type(obj) is not User:
+                    # A profile moved between users: the previous owner changes too
+                    changed.update(v for v in state.attrs.user_id.history.deleted if v is not None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_identities(session):
+    changed = session.info.pop('identity_changes', None)
+    if changed:
+        invalidate_identity(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_identity_changes(session):
+    session.info.pop('identity_changes', None)
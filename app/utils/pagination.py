@@ -0,0 +1,37 @@
+import base64
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) keyset position as an opaque URL-safe string"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, returns None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def apply_desc_cursor(query, created_col, id_col, cursor):
+    """Restrict a newest-first query to rows strictly after the given cursor position"""
+    position = decode_cursor(cursor)
+    if position:
+        query = query.filter(tuple_(created_col, id_col) < position)
+    return query.order_by(created_col.desc(), id_col.desc())
+
+
+def get_limit(default=20, maximum=100):
+    """Read the `limit` query arg, clamped to a sane page size"""
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit, maximum))
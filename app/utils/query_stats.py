@@ -0,0 +1,144 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Expanded IN lists and multi-row VALUES vary in length; collapse them so they share a shape
+PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """A statement with bound-parameter lists collapsed, so repeats of one query compare equal"""
+    return PLACEHOLDER_LIST.sub("(?)", WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Queries seen during one request or assert_max_queries block"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.statements = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+        self.statements.append(statement)
+
+    def repeated(self, threshold):
+        """Shapes run at least threshold times, most frequent first; the usual sign of an N+1"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_local = threading.local()  # assert_max_queries collectors active on this thread
+
+
+def _collectors():
+    collectors = list(getattr(_local, "collectors", ()))
+    if has_request_context() and "sql_stats" in g:
+        collectors.append(g.sql_stats)
+    return collectors
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    for stats in _collectors():
+        stats.record(statement, duration)
+
+
+def _start_request():
+    g.sql_stats = QueryStats()
+
+
+def _report_request(response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+
+    config = current_app.config
+    repeated = stats.repeated(config["SQL_N_PLUS_ONE_THRESHOLD"])
+    db_ms = stats.duration * 1000
+
+    server_timing = config["SQL_STATS_SERVER_TIMING"]
+    if server_timing is None:
+        server_timing = current_app.debug or current_app.testing
+    if server_timing:
+        description = f"{stats.count} {'query' if stats.count == 1 else 'queries'}"
+        if repeated:
+            description += f", {len(repeated)} repeated"
+        response.headers.add("Server-Timing", f'db;dur={db_ms:.1f};desc="{description}"')
+
+    flagged = bool(repeated) or stats.count >= config["SQL_STATS_LOG_MIN_QUERIES"]
+    if flagged or logger.isEnabledFor(logging.DEBUG):
+        record = {
+            "method": request.method,
+            "endpoint": request.endpoint,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": stats.count,
+            "dbMs": round(db_ms, 1),
+            "repeated": [{"count": n, "statement": shape[:500]} for shape, n in repeated[:5]],
+        }
+        logger.log(logging.WARNING if flagged else logging.DEBUG, "sql %s", json.dumps(record), extra={"sql": record})
+    return response
+
+
+def register_query_stats(app):
+    """Count, time and shape-check every request's SQL.
+
+    Requests running SQL_N_PLUS_ONE_THRESHOLD or more queries of one shape,
+    or SQL_STATS_LOG_MIN_QUERIES queries in total, are logged as one JSON
+    warning on this module's logger; DEBUG logs every request. The totals
+    also go out in a Server-Timing header when SQL_STATS_SERVER_TIMING is set,
+    or, left unset, when the app runs in debug or TESTING mode.
+    """
+    if not app.config.get("SQL_STATS_ENABLED", True):
+        return
+    app.before_request(_start_request)
+    app.after_request(_report_request)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail with the offending statements if the block runs more than limit queries.
+
+    Counts queries on this thread, including test-client requests:
+
+        with assert_max_queries(3):
+            client.get("/suppliers/")
+    """
+    stats = QueryStats()
+    collectors = getattr(_local, "collectors", None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+    if stats.count > limit:
+        repeats = "".join(f"\n  {n}x {shape}" for shape, n in stats.repeated(2))
+        raise AssertionError(
+            f"{stats.count} queries, expected at most {limit}."
+            + (f" Repeated:{repeats}" if repeats else "")
+            + "".join(f"\n{i}. {statement}" for i, statement in enumerate(stats.statements, 1))
+        )
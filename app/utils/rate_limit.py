@@ -0,0 +1,145 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from app.extensions import db
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """'5/minute' -> (capacity, tokens refilled per second)"""
+    count, period = limit.split('/', 1)
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip().rstrip('s')]
+
+
+class MemoryBackend:
+    """Token buckets for this worker only, two floats per key, least recently used keys evicted"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """Spend cost tokens. Returns (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+
+class PostgresBackend:
+    """Token buckets shared by every worker, one atomic UPSERT per check.
+
+    Runs on its own connection, so a throttled request's rollback never undoes
+    the spent token and the limiter never joins the request's transaction.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def take(self, key, capacity, rate, cost=1):
+        from sqlalchemy import case, func
+        from sqlalchemy.dialects.postgresql import insert
+
+        from app.models import RateLimitBucket as bucket
+
+        now = time.time()
+        stmt = insert(bucket).values(key=key, tokens=capacity - cost, updated_at=now, allowed=True)
+        # Every SET expression sees the row as it was before this statement
+        refilled = func.least(capacity, bucket.tokens + (now - bucket.updated_at) * rate)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[bucket.key],
+            set_={
+                'tokens': case((refilled >= cost, refilled - cost), else_=refilled),
+                'updated_at': now,
+                'allowed': refilled >= cost,
+            },
+        ).returning(bucket.tokens, bucket.allowed)
+        with self.engine.begin() as connection:
+            tokens, allowed = connection.execute(stmt).one()
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def sweep(self, idle_seconds=86400):
+        """Delete buckets untouched for idle_seconds; a missing bucket is simply full"""
+        from app.models import RateLimitBucket
+
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                RateLimitBucket.__table__.delete().where(RateLimitBucket.updated_at < time.time() - idle_seconds)
+            )
+        return result.rowcount
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return this process's limiter backend, built from RATE_LIMIT_BACKEND on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if current_app.config.get("RATE_LIMIT_BACKEND") == "postgres":
+                    _backend = PostgresBackend(db.engine)
+                else:
+                    _backend = MemoryBackend(current_app.config.get("RATE_LIMIT_MAX_KEYS", 100000))
+    return _backend
+
+
+def _account_of(field):
+    data = request.get_json(silent=True) or {}
+    value = data.get(field)
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+def rate_limit(name, per_ip=None, per_account=None, account_field='email'):
+    """Throttle a view with token buckets keyed by client IP and, optionally, account.
+
+    Limits are strings like '10/minute'. per_account keys on the request JSON's
+    account_field, so one address cannot be hammered from many IPs. Rejected
+    requests get 429 with a Retry-After header. Client IPs come from
+    request.remote_addr, so behind a proxy the app must run with ProxyFix.
+    """
+    ip_limit = parse_limit(per_ip) if per_ip else None
+    account_limit = parse_limit(per_account) if per_account else None
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("RATE_LIMIT_ENABLED", True):
+                return fn(*args, **kwargs)
+
+            checks = []
+            if ip_limit:
+                checks.append((f"{name}:ip:{request.remote_addr}", ip_limit))
+            if account_limit:
+                account = _account_of(account_field)
+                if account:
+                    checks.append((f"{name}:account:{account}", account_limit))
+
+            backend = get_backend()
+            for key, (capacity, rate) in checks:
+                allowed, retry_after = backend.take(key, capacity, rate)
+                if not allowed:
+                    response = jsonify({"msg": "Too many requests. Please try again later."})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
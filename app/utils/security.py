@@ -1,11 +1,6 @@
-from werkzeug.security import generate_password_hash, check_password_hash
-import random, string
+import secrets, string
 
-def hash_password(password):
-    return generate_password_hash(password)
-
-def verify_password(hash, password):
-    return check_password_hash(hash, password)
+from app.services.password_service import hash_password, verify_password
 
 def generate_otp():
-    return ''.join(random.choices(string.digits, k=6))
+    return ''.join(secrets.choice(string.digits) for _ in range(6))
@@ -0,0 +1,182 @@
+"""Hold thousands of idle /chats/stream connections open and time event delivery across them.
+
+Start the stream instance (see gunicorn.conf.py) with CHAT_BUS_BACKEND=postgres,
+then run this from another host or shell sharing its SECRET_KEY and DATABASE_URL:
+
+    GUNICORN_WORKER_CLASS=gevent GUNICORN_BIND=127.0.0.1:8001 WEB_CONCURRENCY=2 \\
+        CHAT_BUS_BACKEND=postgres gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/sse_idle_connections.py --url http://127.0.0.1:8001 \\
+        --connections 10000 --server-pid <gunicorn master pid>
+
+Each connection streams as its own synthetic user (ids from --first-user-id;
+the stream never loads the user). Once all are open they idle for --hold
+seconds, so heartbeats and the workers' idle cost show up, then --rounds
+events are broadcast to every connection through the Postgres bus. Reports
+connections opened and dropped, publish-to-receive latency percentiles and,
+with --server-pid, the resident memory of the master and its workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+NOTIFY_BATCH = 400  # user ids per notification, under the Postgres payload limit
+
+
+class Stream:
+    def __init__(self, user_id, token):
+        self.user_id = user_id
+        self.token = token
+        self.open = False
+        self.dropped = False
+        self.pings = 0
+        self.latencies = []
+
+    async def run(self, host, port, ready):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write((
+                f"GET /chats/stream HTTP/1.0\r\nHost: {host}\r\n"
+                f"Cookie: SWF_ACC={self.token}\r\nAccept: text/event-stream\r\n\r\n"
+            ).encode())
+            status = await reader.readline()
+            if b" 200 " not in status:
+                raise ConnectionError(status.decode(errors="replace").strip())
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+        except Exception as e:
+            self.dropped = True
+            ready.set_exception(e)
+            return
+        self.open = True
+        ready.set_result(None)
+
+        event = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b": ping"):
+                    self.pings += 1
+                elif line.startswith(b"event:"):
+                    event = line[6:].strip().decode()
+                elif line.startswith(b"data:") and event == "benchmark":
+                    self.latencies.append(time.time() - json.loads(line[5:])["sentAt"])
+        finally:
+            self.dropped = True
+            writer.close()
+
+
+def mint_tokens(user_ids):
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        return [create_access_token(identity=str(user_id)) for user_id in user_ids]
+
+
+def broadcast(engine, user_ids, round_no):
+    sent_at = time.time()
+    with engine.begin() as conn:
+        for start in range(0, len(user_ids), NOTIFY_BATCH):
+            payload = json.dumps({
+                "users": [str(u) for u in user_ids[start:start + NOTIFY_BATCH]],
+                "event": {"type": "benchmark", "round": round_no, "sentAt": sent_at},
+            })
+            conn.exec_driver_sql("SELECT pg_notify('chat_events', %s)", (payload,))
+    return time.time() - sent_at
+
+
+def resident_memory(pid):
+    """RSS in MiB of pid and its direct children (gunicorn's master and workers)"""
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    total = 0
+    for p in pids:
+        with open(f"/proc/{p}/status") as f:
+            total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return len(pids) - 1, total / 1024
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float("nan")
+
+
+async def main(args):
+    from sqlalchemy import create_engine
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    user_ids = list(range(args.first_user_id, args.first_user_id + args.connections))
+    streams = [Stream(u, t) for u, t in zip(user_ids, mint_tokens(user_ids))]
+    engine = create_engine(os.environ["DATABASE_URL"])
+
+    started = time.perf_counter()
+    tasks, failures = [], 0
+    for start in range(0, len(streams), args.ramp):
+        batch = []
+        for stream in streams[start:start + args.ramp]:
+            ready = asyncio.get_running_loop().create_future()
+            tasks.append(asyncio.create_task(stream.run(host, port, ready)))
+            batch.append(ready)
+        for result in await asyncio.gather(*batch, return_exceptions=True):
+            if isinstance(result, Exception):
+                failures += 1
+                if failures <= 3:
+                    print(f"connect failed: {result!r}")
+    opened = sum(s.open for s in streams)
+    print(f"opened {opened}/{len(streams)} streams in {time.perf_counter() - started:.1f}s")
+
+    await asyncio.sleep(args.hold)
+    if args.server_pid:
+        workers, rss = resident_memory(args.server_pid)
+        print(f"server: {workers} workers, {rss:.0f} MiB resident ({rss * 1024 / max(opened, 1):.1f} KiB per stream)")
+
+    live = [s.user_id for s in streams if s.open and not s.dropped]
+    for round_no in range(args.rounds):
+        took = await asyncio.to_thread(broadcast, engine, live, round_no)
+        print(f"round {round_no}: published to {len(live)} streams in {took * 1000:.0f}ms")
+        await asyncio.sleep(args.settle)
+
+    latencies = [lat for s in streams for lat in s.latencies]
+    expected = len(live) * args.rounds
+    print(f"delivered {len(latencies)}/{expected} events, dropped streams {sum(s.dropped for s in streams)}, "
+          f"heartbeats {sum(s.pings for s in streams)}")
+    print("latency ms: " + ", ".join(
+        f"p{pct} {percentile(latencies, pct) * 1000:.0f}" for pct in (50, 90, 99, 100)
+    ))
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--ramp", type=int, default=500, help="connections opened concurrently")
+    parser.add_argument("--hold", type=float, default=40, help="seconds to idle before publishing")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--settle", type=float, default=5, help="seconds to wait after each round")
+    parser.add_argument("--first-user-id", type=int, default=10_000_000)
+    parser.add_argument("--server-pid", type=int)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < args.connections + 100:
+        sys.exit(f"ulimit -n allows {hard} open files, need more than {args.connections}")
+    asyncio.run(main(args))
@@ -0,0 +1,175 @@
+"""Drive the API endpoints gunicorn.conf.py compares worker models on, at rising concurrency.
+
+Seed a disposable database once, then start gunicorn with the worker model
+under test against it and point this at the server:
+
+    DATABASE_URL=postgresql://... python benchmarks/worker_models.py --seed
+    RATE_LIMIT_ENABLED=False GUNICORN_WORKER_CLASS=gthread WEB_CONCURRENCY=2 \\
+        gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/worker_models.py --url http://127.0.0.1:8000 --concurrency 1 8 32 128
+
+Rate limiting must be off on the server, or /auth/login answers 429 within
+seconds. Each endpoint is hit by --concurrency clients at once for --duration
+seconds, over keep-alive connections where the server allows them. Reports
+requests per second, p50 and p99 latency and non-2xx responses per step.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SELLER_EMAIL = "bench-seller@example.com"
+BUYER_EMAIL = "bench-buyer@example.com"
+PASSWORD = "benchmark-password"
+
+
+def seed(products):
+    """Sellers with `products` products between them, plus the accounts the authenticated endpoints use"""
+    from app import create_app
+    from app.extensions import db
+    from app.models import BuyerProfile, Product, SellerProfile, User, UserRole, UserType
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if User.query.filter_by(email=SELLER_EMAIL).first():
+            return
+        sellers = []
+        for i in range(10):
+            email = SELLER_EMAIL if i == 0 else f"bench-seller{i}@example.com"
+            user = User(first_name="Bench", last_name=f"Seller {i}", email=email, role=UserRole.SELLER, is_verified=True)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+            db.session.flush()
+            seller = SellerProfile(user_id=user.id, store_name=f"Bench Store {i}", store_reg=f"BENCH-{i}",
+                                   is_verified=True)
+            db.session.add(seller)
+            sellers.append(seller)
+        db.session.flush()
+        for i in range(products):
+            db.session.add(Product(name=f"Bench product {i}", price=10 + i % 90, stock=500 + i,
+                                   min_order_qty=1, seller_id=sellers[i % len(sellers)].id, order_count=0))
+        buyer = User(first_name="Bench", last_name="Buyer", email=BUYER_EMAIL, role=UserRole.BUYER, is_verified=True)
+        buyer.set_password(PASSWORD)
+        db.session.add(buyer)
+        db.session.flush()
+        db.session.add(BuyerProfile(user_id=buyer.id, buyer_type=UserType.RETAILER, company_reg="BENCH-B"))
+        db.session.commit()
+
+
+def seller_cookie():
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from app.models import User
+
+    app = create_app()
+    with app.app_context():
+        user = User.query.filter_by(email=SELLER_EMAIL).one()
+        return f"SWF_ACC={create_access_token(identity=str(user.id))}"
+
+
+def endpoints(cookie):
+    login = json.dumps({"email": BUYER_EMAIL, "password": PASSWORD})
+    return {
+        "GET /products/": ("GET", "/products/", {}, b""),
+        "GET /suppliers/inventory": ("GET", "/suppliers/inventory", {"Cookie": cookie}, b""),
+        "POST /auth/login": ("POST", "/auth/login", {"Content-Type": "application/json"}, login.encode()),
+    }
+
+
+class Client:
+    """One HTTP/1.1 connection, reopened whenever the server closes it (sync workers always do)"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def run_step(host, port, request, concurrency, duration):
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        client = Client(host, port)
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                status = await client.request(*request)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                client.close()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 300:
+                errors += 1
+        client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(latencies) / (time.perf_counter() - started), sorted(latencies), errors
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float("nan")
+
+
+async def main(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    cookie = seller_cookie()
+    for name, request in endpoints(cookie).items():
+        if args.endpoint and not any(e in name for e in args.endpoint):
+            continue
+        for concurrency in args.concurrency:
+            rate, latencies, errors = await run_step(host, port, request, concurrency, args.duration)
+            print(f"{name:<26} c={concurrency:<4} {rate:7.1f} req/s  "
+                  f"p50 {percentile(latencies, 50) * 1000:7.1f}ms  p99 {percentile(latencies, 99) * 1000:7.1f}ms  "
+                  f"errors {errors}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint and concurrency")
+    parser.add_argument("--endpoint", nargs="*", help="only endpoints whose name contains one of these")
+    parser.add_argument("--seed", action="store_true", help="create tables and benchmark data, then exit")
+    parser.add_argument("--products", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.products)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,107 @@
+"""Shared fixtures.
+
+Tests run against sqlite in a temporary file unless TEST_DATABASE_URL points
+at a disposable Postgres database; tests needing row locks skip on sqlite.
+Every table is emptied after each test.
+"""
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="swiftsupply-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-with-at-least-32-bytes")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+os.environ.setdefault("UPLOAD_FOLDER", f"{_db_dir}/images")
+os.environ.setdefault("TOKEN_STORE_BACKEND", "database")
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.extensions import db as _db
+from app.models import BuyerProfile, Product, SellerProfile, User, UserRole, UserType
+from app.services.order_number import order_numbers
+from app.utils import identity
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, RATE_LIMIT_ENABLED=False)
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def db(app):
+    yield _db
+    _db.session.remove()
+    order_numbers.release()  # its lease row is about to be deleted
+    identity._cache.clear()  # ids are reused once the tables are emptied
+    with _db.engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            tables = ", ".join(f'"{table.name}"' for table in _db.metadata.sorted_tables)
+            conn.exec_driver_sql(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+        else:
+            for table in reversed(_db.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def postgres_only(db):
+    if db.engine.dialect.name != "postgresql":
+        pytest.skip("needs row locks; set TEST_DATABASE_URL to a Postgres database")
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user):
+    client.set_cookie("SWF_ACC", create_access_token(identity=str(user.id)))
+    return client
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(email, role=UserRole.BUYER, verified=True, password="password"):
+        user = User(first_name=email.split("@")[0], last_name="Test", email=email, role=role, is_verified=verified)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.flush()
+        if role == UserRole.BUYER:
+            db.session.add(BuyerProfile(user_id=user.id, buyer_type=UserType.RETAILER, company_reg=f"C-{user.id}"))
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def make_seller(db, make_user):
+    def make_seller(email, verified=True):
+        user = make_user(email, role=UserRole.SELLER)
+        seller = SellerProfile(
+            user_id=user.id, store_name=f"Store {user.id}", store_reg=f"R-{user.id}", is_verified=verified,
+            total_orders=0, pending_orders=0, unread_messages=0, total_inquiries=0,
+        )
+        db.session.add(seller)
+        db.session.commit()
+        return seller
+    return make_seller
+
+
+@pytest.fixture
+def make_product(db):
+    def make_product(seller, name="Product", price=10.0, stock=100, min_order_qty=1):
+        product = Product(name=name, price=price, stock=stock, min_order_qty=min_order_qty,
+                          seller_id=seller.id, order_count=0)
+        db.session.add(product)
+        db.session.commit()
+        return product
+    return make_product
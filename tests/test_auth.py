@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models import AuthToken
+from app.services import token_store
+from app.services.token_store import OTP, PASSWORD_RESET, DatabaseTokenStore, hash_token
+
+
+@pytest.fixture
+def otp_user(db, make_user):
+    user = make_user("buyer@example.com", verified=False)
+    DatabaseTokenStore().issue(user.id, OTP, "123456", 600)
+    db.session.commit()
+    return user
+
+
+def test_otp_is_burned_after_max_attempts(db, otp_user):
+    store = DatabaseTokenStore()
+    for _ in range(3):
+        assert not store.check_code(otp_user.id, OTP, "000000", max_attempts=3)
+        db.session.commit()
+
+    assert not store.check_code(otp_user.id, OTP, "123456", max_attempts=3)
+    assert AuthToken.query.count() == 0
+
+
+def test_correct_otp_is_consumed_once(db, otp_user):
+    store = DatabaseTokenStore()
+
+    assert store.check_code(otp_user.id, OTP, "123456", max_attempts=3)
+    db.session.commit()
+    assert not store.check_code(otp_user.id, OTP, "123456", max_attempts=3)
+
+
+def test_concurrent_guesses_cannot_exceed_max_attempts(app, db, otp_user, postgres_only, monkeypatch):
+    user_id = otp_user.id
+    compared = []
+    monkeypatch.setattr(token_store, "hash_token", lambda *args: compared.append(args) or hash_token(*args))
+
+    def guess(code):
+        with app.app_context():
+            try:
+                return DatabaseTokenStore().check_code(user_id, OTP, code, max_attempts=5)
+            finally:
+                db.session.commit()
+                db.session.remove()
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(guess, [f"{n:06d}" for n in range(39)] + ["123456"]))
+
+    assert not any(results)
+    assert len(compared) == 5
+    assert AuthToken.query.count() == 0
+
+
+def test_reset_token_is_consumed_once(db, make_user):
+    user = make_user("buyer@example.com")
+    store = DatabaseTokenStore()
+    store.issue(user.id, PASSWORD_RESET, "reset-token", 600)
+    db.session.commit()
+
+    assert store.consume(PASSWORD_RESET, "reset-token") == user.id
+    db.session.commit()
+    assert store.consume(PASSWORD_RESET, "reset-token") is None
+    assert store.consume(PASSWORD_RESET, "never-issued") is None
+
+
+def test_expired_reset_token_is_consumed_but_rejected(db, make_user):
+    user = make_user("buyer@example.com")
+    store = DatabaseTokenStore()
+    store.issue(user.id, PASSWORD_RESET, "reset-token", -1)
+    db.session.commit()
+
+    assert store.consume(PASSWORD_RESET, "reset-token") is None
+    db.session.commit()
+    assert AuthToken.query.count() == 0
+
+
+def test_concurrent_resets_with_one_token_succeed_once(app, db, make_user, postgres_only):
+    user = make_user("buyer@example.com")
+    user_id = user.id
+    DatabaseTokenStore().issue(user_id, PASSWORD_RESET, "reset-token", 600)
+    db.session.commit()
+    barrier = threading.Barrier(8)
+
+    def reset(_):
+        with app.app_context():
+            try:
+                barrier.wait()
+                return DatabaseTokenStore().consume(PASSWORD_RESET, "reset-token")
+            finally:
+                db.session.commit()
+                db.session.remove()
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(reset, range(8)))
+
+    assert results.count(user_id) == 1
+    assert results.count(None) == 7
+
+
+def test_verify_otp_is_rate_limited(app, client, otp_user):
+    app.config["RATE_LIMIT_ENABLED"] = True
+    try:
+        statuses = [
+            client.post("/auth/verify-otp", json={"email": otp_user.email, "otp_code": "000000"}).status_code
+            for _ in range(11)
+        ]
+    finally:
+        app.config["RATE_LIMIT_ENABLED"] = False
+
+    assert statuses[:10] == [400] * 10
+    assert statuses[10] == 429
+
+
+@pytest.mark.slow
+def test_login_throughput(app, make_user, monkeypatch):
+    """Benchmark: concurrent logins against production-cost scrypt hashes in the forkserver pool.
+
+    Reports logins per second; the floor only catches a pool that serializes or stalls.
+    """
+    from app.config import Config
+    from app.services import password_service
+
+    monkeypatch.setattr(Config, "PASSWORD_SCRYPT_N", 32768)
+    monkeypatch.setattr(Config, "PASSWORD_HASH_WORKERS", 2)
+    monkeypatch.setattr(password_service, "_executor", None)
+    emails = [make_user(f"user{i}@example.com", password="correct horse").email for i in range(8)]
+    clients = [app.test_client() for _ in emails]
+    stop_at = time.monotonic() + 5
+    statuses = []
+
+    def login_loop(client, email):
+        while time.monotonic() < stop_at:
+            response = client.post("/auth/login", json={"email": email, "password": "correct horse"})
+            statuses.append(response.status_code)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(len(emails)) as pool:
+        list(pool.map(login_loop, clients, emails))
+    elapsed = time.monotonic() - started
+    password_service._executor.shutdown()
+
+    assert set(statuses) == {200}
+    rate = len(statuses) / elapsed
+    print(f"{len(statuses)} logins in {elapsed:.1f}s with 2 hashing processes: {rate:.1f} logins/s")
+    assert rate >= 2
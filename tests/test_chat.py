@@ -0,0 +1,233 @@
+import pytest
+
+from app.models import ChatRoom, ProductImage, SellerProfile, User
+from app.services.chat_service import get_messages_page, get_room_for_participant, post_message
+from tests.conftest import login
+
+
+def open_chat(client, **data):
+    return client.post("/chats/", json=data)
+
+
+@pytest.fixture
+def room(client, db, make_user, make_seller):
+    """An open conversation as get_room_for_participant returns it, with the buyer and seller users"""
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+    room_id = int(open_chat(login(client, buyer), sellerId=seller.id).get_json()["id"])
+    room = get_room_for_participant(room_id, buyer.id)
+    return room, buyer, db.session.get(User, seller.user_id)
+
+
+def post(room, sender, count, start=0):
+    return [post_message(room, sender.id, f"Message {start + n}").id for n in range(count)]
+
+
+def test_open_chat_about_a_product(client, make_user, make_seller, make_product):
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+    product = make_product(seller)
+
+    first = open_chat(login(client, buyer), sellerId=str(seller.id), productId=product.id)
+    again = open_chat(client, sellerId=seller.id, productId=str(product.id))
+
+    assert first.status_code == 201
+    assert again.status_code == 200
+    assert again.get_json() == first.get_json()
+
+
+def test_open_chat_rejects_another_sellers_product(client, make_user, make_seller, make_product):
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+    other = make_product(make_seller("other@example.com"))
+
+    response = open_chat(login(client, buyer), sellerId=seller.id, productId=other.id)
+
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Product not found"}
+
+
+def test_open_chat_rejects_a_missing_product(client, make_user, make_seller):
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+
+    assert open_chat(login(client, buyer), sellerId=seller.id, productId=999999).status_code == 404
+
+
+@pytest.mark.parametrize("data", [{"sellerId": "abc"}, {"sellerId": [1]}, {"sellerId": 1, "productId": "x"}])
+def test_open_chat_rejects_non_numeric_ids(client, make_user, data):
+    buyer = make_user("buyer@example.com")
+
+    assert open_chat(login(client, buyer), **data).status_code == 400
+
+
+@pytest.mark.parametrize("variants, image", [
+    ({"thumbnail": {"jpeg": "https://cdn/a_thumbnail.jpg"}, "card": {"jpeg": "https://cdn/a_card.jpg"}},
+     "https://cdn/a_thumbnail.jpg"),
+    ({}, "https://cdn/a.png"),  # variants not rendered yet
+])
+def test_inbox_shows_the_product_thumbnail(client, db, make_user, make_seller, make_product, variants, image):
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+    product = make_product(seller)
+    db.session.add_all([
+        ProductImage(product_id=product.id, url="https://cdn/other.png"),
+        ProductImage(product_id=product.id, url="https://cdn/a.png", is_primary=True, variants=variants),
+    ])
+    db.session.commit()
+    open_chat(login(client, buyer), sellerId=seller.id, productId=product.id)
+
+    chats = login(client, db.session.get(User, seller.user_id)).get("/chats/").get_json()["chats"]
+
+    assert chats[0]["productInfo"]["image"] == image
+
+
+def test_messages_page_is_the_newest_page_in_order(room):
+    room, buyer, _ = room
+    ids = post(room, buyer, 7)
+
+    messages, has_more = get_messages_page(room.id, limit=3)
+
+    assert [m.id for m in messages] == ids[-3:]
+    assert has_more
+
+
+def test_messages_page_before_walks_back_to_the_first_message(room):
+    room, buyer, _ = room
+    ids = post(room, buyer, 7)
+
+    middle, more_before_middle = get_messages_page(room.id, before=ids[4], limit=3)
+    first, more_before_first = get_messages_page(room.id, before=ids[1], limit=3)
+
+    assert ([m.id for m in middle], more_before_middle) == (ids[1:4], True)
+    assert ([m.id for m in first], more_before_first) == (ids[:1], False)
+
+
+def test_messages_page_after_fetches_only_newer_messages(room):
+    room, buyer, _ = room
+    ids = post(room, buyer, 7)
+
+    newer, more = get_messages_page(room.id, after=ids[2], limit=3)
+    latest, more_after_latest = get_messages_page(room.id, after=ids[3], limit=3)
+    none, _ = get_messages_page(room.id, after=ids[-1])
+
+    assert ([m.id for m in newer], more) == (ids[3:6], True)
+    assert ([m.id for m in latest], more_after_latest) == (ids[4:], False)
+    assert none == []
+
+
+def test_messages_endpoint_pages_and_clamps_the_limit(client, room):
+    room, buyer, _ = room
+    ids = post(room, buyer, 120)
+    login(client, buyer)
+
+    page = client.get(f"/chats/{room.id}/messages?limit=500").get_json()
+    older = client.get(f"/chats/{room.id}/messages?limit=30&before={page['pagination']['before']}").get_json()
+
+    assert [int(m["id"]) for m in page["messages"]] == ids[20:]
+    assert page["pagination"]["hasMore"]
+    assert [int(m["id"]) for m in older["messages"]] == ids[:20]
+    assert not older["pagination"]["hasMore"]
+
+
+def test_messages_endpoint_hides_other_peoples_rooms(client, room, make_user):
+    room, _, _ = room
+    login(client, make_user("stranger@example.com"))
+
+    assert client.get(f"/chats/{room.id}/messages").status_code == 404
+
+
+def test_post_message_counts_unread_for_the_recipient_only(db, room):
+    room, buyer, seller_user = room
+    post(room, buyer, 3)
+    last = post(room, seller_user, 2)[-1]
+
+    db.session.expire_all()
+    chat = db.session.get(ChatRoom, room.id)
+    assert (chat.seller_unread_count, chat.buyer_unread_count) == (3, 2)
+    assert chat.last_message_id == last
+    assert db.session.get(SellerProfile, room.seller_id).unread_messages == 3
+
+
+def test_inbox_shows_last_message_and_callers_unread_count(client, room):
+    room, buyer, seller_user = room
+    post(room, buyer, 2)
+    last = post(room, seller_user, 1)[0]
+
+    buyer_chat = login(client, buyer).get("/chats/").get_json()["chats"][0]
+    seller_chat = login(client, seller_user).get("/chats/").get_json()["chats"][0]
+
+    assert buyer_chat["lastMessage"]["id"] == seller_chat["lastMessage"]["id"] == str(last)
+    assert (buyer_chat["unreadCount"], seller_chat["unreadCount"]) == (1, 2)
+
+
+def test_inbox_pages_by_most_recent_message(client, db, make_user, make_seller):
+    seller = make_seller("seller@example.com")
+    seller_user = db.session.get(User, seller.user_id)
+    rooms = []
+    for i in range(5):
+        buyer = make_user(f"buyer{i}@example.com")
+        room_id = int(open_chat(login(client, buyer), sellerId=seller.id).get_json()["id"])
+        rooms.append((get_room_for_participant(room_id, buyer.id), buyer))
+    for room, buyer in [rooms[3], rooms[0], rooms[4], rooms[1], rooms[2]]:
+        post(room, buyer, 1)
+    login(client, seller_user)
+
+    first = client.get("/chats/?limit=2").get_json()
+    second = client.get(f"/chats/?limit=2&cursor={first['pagination']['nextCursor']}").get_json()
+    last = client.get(f"/chats/?limit=2&cursor={second['pagination']['nextCursor']}").get_json()
+
+    order = [int(c["id"]) for page in (first, second, last) for c in page["chats"]]
+    assert order == [rooms[i][0].id for i in (2, 1, 4, 0, 3)]
+    assert last["pagination"] == {"limit": 2, "nextCursor": None, "hasMore": False}
+
+
+def test_mark_read_up_to_a_message_lowers_the_readers_counters(client, db, room):
+    room, buyer, seller_user = room
+    ids = post(room, buyer, 4)
+    post(room, seller_user, 1)
+    login(client, seller_user)
+
+    response = client.post(f"/chats/{room.id}/read", json={"upToMessageId": str(ids[1])})
+
+    assert response.get_json() == {"updated": 2}
+    db.session.expire_all()
+    chat = db.session.get(ChatRoom, room.id)
+    assert (chat.seller_unread_count, chat.buyer_unread_count) == (2, 1)
+    assert db.session.get(SellerProfile, room.seller_id).unread_messages == 2
+    read = [m["isRead"] for m in client.get(f"/chats/{room.id}/messages").get_json()["messages"]]
+    assert read == [True, True, False, False, False]
+
+
+def test_mark_read_skips_own_and_already_read_messages(client, db, room):
+    room, buyer, seller_user = room
+    post(room, buyer, 2)
+    own = post(room, seller_user, 1)[0]
+    login(client, seller_user)
+
+    assert client.post(f"/chats/{room.id}/read", json={"upToMessageId": own}).get_json() == {"updated": 2}
+    assert client.post(f"/chats/{room.id}/read", json={"upToMessageId": own}).get_json() == {"updated": 0}
+
+    db.session.expire_all()
+    chat = db.session.get(ChatRoom, room.id)
+    assert (chat.seller_unread_count, chat.buyer_unread_count) == (0, 1)
+    assert db.session.get(SellerProfile, room.seller_id).unread_messages == 0
+
+
+def test_buyer_reading_leaves_the_seller_dashboard_counter(client, db, room):
+    room, buyer, seller_user = room
+    post(room, buyer, 1)
+    last = post(room, seller_user, 2)[-1]
+    login(client, buyer)
+
+    assert client.post(f"/chats/{room.id}/read", json={"upToMessageId": last}).get_json() == {"updated": 2}
+
+    db.session.expire_all()
+    assert db.session.get(ChatRoom, room.id).buyer_unread_count == 0
+    assert db.session.get(SellerProfile, room.seller_id).unread_messages == 1
+
+
+def test_mark_read_requires_a_message_id(client, room):
+    room, buyer, _ = room
+
+    assert login(client, buyer).post(f"/chats/{room.id}/read", json={"upToMessageId": "x"}).status_code == 400
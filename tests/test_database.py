@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app.models import Product
+from app.utils import database
+from app.utils.database import REPLICA
+
+
+@pytest.fixture
+def use_replica(db, monkeypatch):
+    """Register an engine as the replica bind; use_replica(url) returns it"""
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    engines = db.engines
+
+    def use_replica(url):
+        engine = create_engine(url)
+        engines[REPLICA] = engine
+        return engine
+
+    yield use_replica
+    replica = engines.pop(REPLICA, None)
+    if replica is not None:
+        replica.dispose()
+
+
+def product_names(client):
+    response = client.get("/products/")
+    assert response.status_code == 200
+    return [p["name"] for p in response.get_json()["products"]]
+
+
+def test_read_replica_view_reads_from_the_replica(client, db, use_replica, tmp_path, make_seller, make_product):
+    make_product(make_seller("seller@example.com"), name="On the primary")
+    replica = use_replica(f"sqlite:///{tmp_path}/replica.db")
+    db.metadata.create_all(replica)
+    with replica.begin() as conn:
+        conn.execute(Product.__table__.insert().values(name="Only on the replica", price=1.0, seller_id=1))
+
+    assert product_names(client) == ["Only on the replica"]
+
+
+def test_failing_replica_falls_back_to_the_primary(client, db, use_replica, tmp_path, make_seller, make_product):
+    make_product(make_seller("seller@example.com"), name="On the primary")
+    use_replica(f"sqlite:///{tmp_path}/missing/replica.db")  # the directory does not exist, so connecting fails
+
+    assert product_names(client) == ["On the primary"]
+    assert database._replica_down_until > 0
+    assert product_names(client) == ["On the primary"]  # replica skipped while it is marked down
+
+
+def test_views_without_read_replica_never_use_it(client, db, use_replica, tmp_path, make_seller):
+    seller = make_seller("seller@example.com")
+    use_replica(f"sqlite:///{tmp_path}/missing/replica.db")
+
+    response = client.get(f"/suppliers/{seller.id}/low-stock-products")
+
+    assert response.status_code == 200
+    assert database._replica_down_until == 0.0
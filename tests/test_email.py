@@ -0,0 +1,226 @@
+import socket
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import Config
+from app.models import EmailOutbox
+from app.services.email_service import enqueue_email, process_email_outbox, send_otp_email, send_password_reset
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server on localhost to accept mail and count connections.
+
+    With drop_at=n it hangs up, once, instead of answering the MAIL FROM of the
+    n-th message, as a server restarting or a proxy timing out would.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_at=None):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.drop_at = drop_at
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server
+        with sink.lock:
+            sink.connections += 1
+            connection = sink.connections
+        self.reply("220 sink ready")
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                with sink.lock:
+                    if sink.drop_at == len(sink.messages) + 1:
+                        sink.drop_at = None
+                        return
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = b"".join(iter(self.rfile.readline, b".\r\n"))
+                with sink.lock:
+                    sink.messages.append({"connection": connection, "to": recipients, "data": body.decode()})
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def outbox(app, monkeypatch):
+    state = app.extensions["mail"]
+    monkeypatch.setattr(state, "suppress", True)
+    monkeypatch.setattr(state, "default_sender", "noreply@example.com")
+    with state.record_messages() as sent:
+        yield sent
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    """Point Flask-Mail at a local SMTPSink; smtp(drop_at=n) restarts it to hang up on the n-th message"""
+    state = app.extensions["mail"]
+    monkeypatch.setattr(state, "suppress", False)
+    monkeypatch.setattr(state, "default_sender", "noreply@example.com")
+    monkeypatch.setattr(state, "use_tls", False)
+    monkeypatch.setattr(state, "username", None)
+    servers = []
+
+    def start(drop_at=None):
+        server = SMTPSink(drop_at)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(state, "server", "127.0.0.1")
+        monkeypatch.setattr(state, "port", server.server_address[1])
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def refused_smtp(app, smtp, monkeypatch):
+    """Point Flask-Mail at a localhost port nothing listens on, so connecting is refused"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    monkeypatch.setattr(app.extensions["mail"], "server", "127.0.0.1")
+    monkeypatch.setattr(app.extensions["mail"], "port", port)
+
+
+def queue(db, count):
+    for i in range(count):
+        enqueue_email(f"buyer{i}@example.com", f"Order {i}", f"Body {i}")
+    db.session.commit()
+
+
+def test_sent_email_keeps_no_secret(app, db, outbox):
+    send_otp_email("buyer@example.com", "123456")
+    db.session.commit()
+
+    assert process_email_outbox(concurrency=1) == 1
+    assert "123456" in outbox[0].body
+
+    email = EmailOutbox.query.one()
+    assert (email.status, email.body, email.html) == ("sent", "", None)
+
+
+def test_lapsed_email_is_never_sent(app, db, outbox):
+    send_password_reset("buyer@example.com", "https://example.com/reset/secret")
+    db.session.commit()
+    email = EmailOutbox.query.one()
+    assert email.expires_at is not None
+    email.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert process_email_outbox(concurrency=1) == 0
+    assert outbox == []
+
+    db.session.expire_all()
+    email = EmailOutbox.query.one()
+    assert (email.status, email.body, email.attempts) == ("expired", "", 0)
+
+
+def test_sweep_emails_command(app, db):
+    old = datetime.utcnow() - timedelta(days=8)
+    db.session.add_all([
+        EmailOutbox(recipient="a@example.com", subject="s", body="", status="sent", created_at=old),
+        EmailOutbox(recipient="b@example.com", subject="s", body="", status="sent"),
+        EmailOutbox(recipient="c@example.com", subject="s", body="OTP 1", expires_at=old),
+        EmailOutbox(recipient="d@example.com", subject="s", body="OTP 2", created_at=old),
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["sweep-emails"])
+
+    assert "Expired 1 unsent emails, deleted 1 old emails" in result.output
+    db.session.expire_all()
+    remaining = {e.recipient: (e.status, e.body) for e in EmailOutbox.query}
+    assert remaining == {
+        "b@example.com": ("sent", ""),
+        "c@example.com": ("expired", ""),
+        "d@example.com": ("pending", "OTP 2"),
+    }
+
+
+def test_batch_shares_one_smtp_connection(app, db, smtp):
+    sink = smtp()
+    queue(db, 3)
+
+    assert process_email_outbox(concurrency=1) == 3
+
+    assert sink.connections == 1
+    assert sorted(m["to"][0] for m in sink.messages) == [f"buyer{i}@example.com" for i in range(3)]
+    assert {e.status for e in EmailOutbox.query} == {"sent"}
+
+
+def test_dropped_connection_retries_only_the_message_in_hand(app, db, smtp, monkeypatch):
+    sink = smtp(drop_at=2)
+    queue(db, 3)
+    monkeypatch.setattr(Config, "EMAIL_RETRY_BASE", 30)
+    started = datetime.utcnow()
+
+    process_email_outbox(concurrency=1)
+
+    assert sink.connections == 2
+    assert len(sink.messages) == 2
+    db.session.expire_all()
+    retried = EmailOutbox.query.filter_by(status="pending").one()
+    assert retried.recipient == "buyer1@example.com"
+    assert retried.attempts == 1 and "SMTPServerDisconnected" in retried.last_error
+    # retry_delay(1) is jittered over [base / 2, base]
+    assert started + timedelta(seconds=15) <= retried.next_attempt_at <= datetime.utcnow() + timedelta(seconds=30)
+
+
+def test_refused_connection_backs_off_exponentially(app, db, refused_smtp, monkeypatch):
+    monkeypatch.setattr(Config, "EMAIL_RETRY_BASE", 30)
+    queue(db, 2)
+    for email in EmailOutbox.query:
+        email.attempts = 2
+    db.session.commit()
+    started = datetime.utcnow()
+
+    assert process_email_outbox(concurrency=1) == 2
+
+    db.session.expire_all()
+    for email in EmailOutbox.query:
+        assert (email.status, email.attempts) == ("pending", 3)
+        assert "ConnectionRefusedError" in email.last_error
+        # third attempt: up to 30 * 2^2 seconds, no less than half of that
+        assert started + timedelta(seconds=60) <= email.next_attempt_at <= datetime.utcnow() + timedelta(seconds=120)
+
+
+def test_email_fails_after_max_attempts(app, db, refused_smtp):
+    send_otp_email("buyer@example.com", "123456")
+    db.session.commit()
+    email = EmailOutbox.query.one()
+    email.attempts = Config.EMAIL_MAX_ATTEMPTS - 1
+    db.session.commit()
+
+    process_email_outbox(concurrency=1)
+
+    db.session.expire_all()
+    email = EmailOutbox.query.one()
+    assert (email.status, email.attempts, email.body) == ("failed", Config.EMAIL_MAX_ATTEMPTS, "")
+    assert "ConnectionRefusedError" in email.last_error
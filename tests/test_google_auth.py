@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from app.services import google_auth
+from app.services.google_auth import GoogleTokenVerifier
+
+CLIENT_ID = "client-id.apps.googleusercontent.com"
+
+
+def make_key(key_id):
+    """A (signer, PEM certificate) pair like one of Google's rotating signing keys"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.now(timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()).serial_number(
+        x509.random_serial_number()
+    ).not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1)).sign(key, hashes.SHA256())
+
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def sign(signer, issued_at=None, **claims):
+    issued_at = int(issued_at or time.time())
+    payload = {
+        "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234", "email": "buyer@example.com",
+        "email_verified": True, "iat": issued_at, "exp": issued_at + 3600, **claims,
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+class CertServer(ThreadingHTTPServer):
+    """Serves a certs document the way https://www.googleapis.com/oauth2/v1/certs does"""
+    daemon_threads = True
+
+    def __init__(self, certs, headers):
+        super().__init__(("127.0.0.1", 0), CertHandler)
+        self.certs = certs
+        self.headers = headers
+        self.requests = []
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/oauth2/v1/certs"
+
+
+class CertHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def do_GET(self):
+        body = json.dumps(self.server.certs).encode()
+        self.server.requests.append(self.client_address)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self.server.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return make_key("key-1")
+
+
+@pytest.fixture
+def google(signing_key):
+    """A stand-in Google: one signing key and a local server publishing its cert"""
+    signer, cert = signing_key
+    server = CertServer({"key-1": cert}, {"Cache-Control": "public, max-age=20000, must-revalidate"})
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.signer = signer
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def live_verifier(google):
+    verifier = GoogleTokenVerifier(CLIENT_ID, google.url)
+    yield verifier
+    verifier.session.close()
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    verifier = GoogleTokenVerifier("client-id", "https://certs.invalid", unknown_key_interval=60)
+    fetches = []
+
+    def refresh():
+        fetches.append(1)
+        verifier._certs = {"known": "cert"}
+        verifier._expires_at = float("inf")
+        return verifier._certs
+
+    monkeypatch.setattr(verifier, "refresh", refresh)
+    verifier.fetches = fetches
+    return verifier
+
+
+def test_known_key_uses_cached_certs(verifier):
+    verifier.certs("known")
+    verifier.certs("known")
+
+    assert len(verifier.fetches) == 1
+
+
+def test_unknown_key_refetches_at_most_once_per_interval(verifier, monkeypatch):
+    verifier.certs("known")
+
+    assert verifier.certs("rotated") == {"known": "cert"}  # refetched, verification then rejects it
+    for _ in range(100):
+        with pytest.raises(ValueError, match="Unknown signing key"):
+            verifier.certs("forged")
+    assert len(verifier.fetches) == 2
+
+    monkeypatch.setattr(verifier, "_unknown_key_fetch_at", verifier._unknown_key_fetch_at - 61)
+    verifier.certs("rotated")
+    assert len(verifier.fetches) == 3
+
+
+def test_valid_token_is_verified_against_served_certs(google, live_verifier):
+    claims = live_verifier.verify(sign(google.signer))
+    live_verifier.verify(sign(google.signer, sub="5678"))
+
+    assert (claims["sub"], claims["email"]) == ("1234", "buyer@example.com")
+    assert len(google.requests) == 1
+
+
+def test_expired_token_is_rejected(google, live_verifier):
+    token = sign(google.signer, issued_at=time.time() - 2 * 3600)
+
+    with pytest.raises(ValueError, match="expired"):
+        live_verifier.verify(token)
+
+
+def test_token_signed_with_another_key_is_rejected(google, live_verifier):
+    forger, _ = make_key("key-1")
+
+    with pytest.raises(ValueError, match="signature"):
+        live_verifier.verify(sign(forger))
+
+
+def test_token_for_another_client_is_rejected(google, live_verifier):
+    with pytest.raises(ValueError, match="audience"):
+        live_verifier.verify(sign(google.signer, aud="someone-else"))
+
+
+@pytest.mark.parametrize("headers, lifetime", [
+    ({"Cache-Control": "public, max-age=20000, must-revalidate"}, 20000),
+    ({"Cache-Control": "public, max-age=20000", "Age": "19000"}, 1000),
+    ({"Cache-Control": "public, max-age=100", "Age": "500"}, 0),
+    ({}, 3600),
+])
+def test_certs_are_cached_for_their_remaining_max_age(google, live_verifier, headers, lifetime):
+    google.headers = headers
+
+    live_verifier.refresh()
+
+    assert live_verifier._expires_at - time.monotonic() == pytest.approx(lifetime, abs=5)
+
+
+def test_refetches_reuse_one_pooled_connection(google, live_verifier):
+    for _ in range(3):
+        live_verifier.refresh()
+
+    assert len(google.requests) == 3
+    assert len(set(google.requests)) == 1  # same client address and port each time
+
+
+def test_refresh_ahead_keeps_the_unknown_key_throttle(google, live_verifier):
+    live_verifier.verify(sign(google.signer))
+    live_verifier.certs("forged")  # refetches once, claiming this interval's unknown-key fetch
+    claimed_at = live_verifier._unknown_key_fetch_at
+    live_verifier._expires_at = time.monotonic() + live_verifier.refresh_ahead - 1
+
+    live_verifier.verify(sign(google.signer))  # starts a background refresh
+    while live_verifier._refreshing:
+        time.sleep(0.01)
+
+    assert live_verifier._unknown_key_fetch_at == claimed_at
+    with pytest.raises(ValueError, match="Unknown signing key"):
+        live_verifier.certs("forged")
+    assert len(google.requests) == 3
+
+
+def test_signin_does_not_echo_verification_errors(client, google, live_verifier, monkeypatch):
+    monkeypatch.setattr(google_auth, "_verifier", live_verifier)
+    token = sign(google.signer, issued_at=time.time() - 2 * 3600)
+
+    response = client.post("/auth/google-signin", json={"token": token})
+
+    assert response.status_code == 400
+    assert response.get_json() == {"msg": "Google sign-in failed"}
@@ -0,0 +1,54 @@
+from app.models import SellerProfile, User
+from app.utils.identity import _cache
+from tests.conftest import login
+
+
+def me(client):
+    return client.get("/auth/me").get_json()
+
+
+def test_profile_change_is_seen_by_the_next_request(client, db, make_seller):
+    seller = make_seller("seller@example.com")
+    login(client, db.session.get(User, seller.user_id))
+    assert me(client)["profile"]["store_name"] == f"Store {seller.user_id}"
+    assert seller.user_id in _cache
+
+    client.put(f"/suppliers/{seller.id}/profile", json={"storeName": "Renamed", "storeAddress": "1 New Street"})
+
+    profile = me(client)["profile"]
+    assert (profile["store_name"], profile["store_address"]) == ("Renamed", "1 New Street")
+
+
+def test_verification_change_is_seen_by_the_next_request(client, db, make_seller):
+    seller = make_seller("seller@example.com", verified=False)
+    login(client, db.session.get(User, seller.user_id))
+    assert client.get("/suppliers/inventory").status_code == 403
+
+    db.session.get(SellerProfile, seller.id).is_verified = True
+    db.session.commit()
+
+    assert client.get("/suppliers/inventory").status_code == 200
+
+
+def test_user_change_is_seen_by_the_next_request(client, db, make_user):
+    user = make_user("buyer@example.com")
+    login(client, user)
+    assert me(client)["first_name"] == "buyer"
+
+    db.session.get(User, user.id).first_name = "Ada"
+    db.session.commit()
+
+    assert me(client)["first_name"] == "Ada"
+
+
+def test_unrelated_changes_keep_the_cached_identity(client, db, make_seller):
+    seller = make_seller("seller@example.com")
+    login(client, db.session.get(User, seller.user_id))
+    me(client)
+    cached = _cache[seller.user_id]
+
+    db.session.get(SellerProfile, seller.id).total_orders = 5
+    db.session.commit()
+
+    me(client)
+    assert _cache[seller.user_id] is cached
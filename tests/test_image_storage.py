@@ -0,0 +1,118 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from moto import mock_aws
+
+from app.models import Product, User
+from app.services import image_storage
+from app.services.blob_storage import S3Storage, get_storage
+from app.services.image_storage import UploadRejected, blob_key, release, store_stream, verify_upload
+from app.services.upload_gc import collect_garbage
+from tests.conftest import login
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def age(storage, key, seconds):
+    path = storage.path(key)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_deduplicated_put_touches_the_stored_blob(db):
+    storage = get_storage()
+    key, created = store_stream(io.BytesIO(PNG))
+    age(storage, key, 48 * 3600)
+
+    assert store_stream(io.BytesIO(PNG)) == (key, False)
+    assert storage.modified_at(key) > time.time() - 60
+    assert collect_garbage(grace_seconds=24 * 3600)["deleted"] == 0
+    assert storage.exists(key)
+
+
+def test_release_keeps_a_blob_a_concurrent_upload_may_attach(db):
+    storage = get_storage()
+    key, _ = store_stream(io.BytesIO(PNG + b"released"))
+
+    assert release([key]) == []
+    assert storage.exists(key)
+
+    age(storage, key, 7200)
+    assert release([key]) == [key]
+    assert not storage.exists(key)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        storage = S3Storage("uploads", "https://cdn.example.com", region="us-east-1")
+        storage.client.create_bucket(Bucket="uploads")
+        yield storage
+
+
+def test_s3_touch_refreshes_last_modified_and_keeps_metadata(s3, tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(PNG)
+    assert s3.put_file("ab/cd/abcd.png", str(path), "image/png")
+    first = s3.modified_at("ab/cd/abcd.png")
+    time.sleep(1.1)
+
+    path.write_bytes(PNG)
+    assert not s3.put_file("ab/cd/abcd.png", str(path), "image/png")
+
+    head = s3.client.head_object(Bucket="uploads", Key="ab/cd/abcd.png", ChecksumMode="ENABLED")
+    assert s3.modified_at("ab/cd/abcd.png") > first
+    assert head["ContentType"] == "image/png"
+    assert head["CacheControl"] == "public, max-age=31536000, immutable"
+    assert not path.exists()
+    assert not s3.touch("ab/cd/missing.png")
+
+
+def test_verify_upload_accepts_a_stored_image(db):
+    key, _ = store_stream(io.BytesIO(PNG + b"verified"))
+
+    verify_upload(get_storage().public_url(key))
+
+
+def test_verify_upload_rejects_missing_and_disguised_files(db):
+    storage = get_storage()
+    missing = storage.public_url(blob_key("0" * 64, "png"))
+    with pytest.raises(UploadRejected, match="has not been uploaded"):
+        verify_upload(missing)
+
+    body = b"<script>alert(1)</script>"
+    key = blob_key(hashlib.sha256(body).hexdigest(), "png")
+    os.makedirs(os.path.dirname(storage.path(key)), exist_ok=True)
+    with open(storage.path(key), "wb") as f:
+        f.write(body)
+    with pytest.raises(UploadRejected, match="not a PNG image"):
+        verify_upload(storage.public_url(key))
+
+
+def test_verify_upload_checks_the_s3_checksum(s3, monkeypatch):
+    monkeypatch.setattr(image_storage, "get_storage", lambda: s3)
+    body = PNG + b"direct"
+    good = blob_key(hashlib.sha256(body).hexdigest(), "png")
+    forged = blob_key(hashlib.sha256(b"something else").hexdigest(), "png")
+    for key in (good, forged):
+        s3.client.put_object(Bucket="uploads", Key=key, Body=body, ChecksumAlgorithm="SHA256")
+
+    verify_upload(s3.public_url(good))
+    with pytest.raises(UploadRejected, match="does not match its checksum"):
+        verify_upload(s3.public_url(forged))
+
+
+def test_product_with_an_unverified_image_is_rejected(client, db, make_seller):
+    seller = make_seller("seller@example.com")
+    login(client, db.session.get(User, seller.user_id))
+    url = get_storage().public_url(blob_key("1" * 64, "jpg"))
+
+    response = client.post("/suppliers/product", json={
+        "name": "Widget", "description": "A widget", "price": 5, "stock": 3, "images": [url],
+    })
+
+    assert response.status_code == 400
+    assert Product.query.count() == 0
@@ -0,0 +1,108 @@
+import multiprocessing
+import time
+from array import array
+
+import pytest
+
+from app.config import Config
+from app.models import OrderWorkerLease
+from app.services.order_number import MAX_WORKER_ID, OrderNumberGenerator, decode_base32, pinned_worker_id
+
+
+def test_numbers_are_sortable_and_decodable():
+    generator = OrderNumberGenerator(worker_id=7)
+    numbers = [generator.next() for _ in range(10000)]
+
+    assert numbers == sorted(numbers)
+    assert len(set(numbers)) == len(numbers)
+    assert all((decode_base32(n[4:10] + n[11:]) >> 12) & MAX_WORKER_ID == 7 for n in numbers)
+
+
+@pytest.mark.parametrize("value", ["1024", "-1", "abc"])
+def test_out_of_range_pinned_worker_id_fails_loudly(monkeypatch, value):
+    monkeypatch.setattr(Config, "ORDER_WORKER_ID", value)
+    with pytest.raises(ValueError):
+        pinned_worker_id()
+
+
+@pytest.fixture
+def make_generator(db):
+    generators = []
+
+    def make_generator(**kwargs):
+        generators.append(OrderNumberGenerator(**kwargs))
+        return generators[-1]
+
+    yield make_generator
+    for generator in generators:
+        generator.release()
+
+
+def test_live_leases_are_exclusive(db, make_generator):
+    generators = [make_generator() for _ in range(20)]
+    worker_ids = [g.worker_id for g in generators]
+
+    assert len(set(worker_ids)) == len(worker_ids)
+    assert db.session.query(OrderWorkerLease).count() == 20
+
+    generators[0].release()
+    assert db.session.query(OrderWorkerLease).count() == 19
+
+
+def _hold_all_but(db, *free_ids):
+    db.session.add_all([
+        OrderWorkerLease(worker_id=i, holder="other-host:1:x", expires_at=time.time() + 3600)
+        for i in range(MAX_WORKER_ID + 1) if i not in free_ids
+    ])
+    db.session.commit()
+
+
+def test_reclaimed_lease_is_never_shared(db, make_generator):
+    first = make_generator(lease_ttl=0.3)
+    first_id = first.worker_id
+    spare_id = (first_id + 1) % (MAX_WORKER_ID + 1)
+    _hold_all_but(db, first_id, spare_id)
+
+    time.sleep(0.4)  # first's lease lapses without renewal
+    second = make_generator(lease_ttl=60)
+    second.next_id()
+    first.next_id()  # must notice if its id was taken and move to the spare
+
+    assert {first.worker_id, second.worker_id} == {first_id, spare_id}
+
+
+def test_exhausted_worker_ids_fail_loudly(db, make_generator):
+    _hold_all_but(db)
+    with pytest.raises(RuntimeError):
+        make_generator().next()
+
+
+def _generate(count):
+    """Runs in a fresh process: lease an id like a web worker would and issue count ids"""
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        generator = OrderNumberGenerator()
+        ids = array("q", (generator.next_id() for _ in range(count)))
+        if count % 2:
+            generator.release()  # half the processes exit cleanly, the rest leave their lease to expire
+        return ids.tobytes()
+
+
+@pytest.mark.slow
+def test_unique_across_processes_and_recycled_workers():
+    """3 waves of 8 processes x 100k ids (2.4M total), each wave replacing the last
+    the way recycled gunicorn workers do"""
+    seen = set()
+    total = 0
+    context = multiprocessing.get_context("spawn")
+    for wave in range(3):
+        with context.Pool(8) as pool:
+            for chunk in pool.map(_generate, [100_000 + (i % 2) for i in range(8)]):
+                ids = array("q")
+                ids.frombytes(chunk)
+                total += len(ids)
+                seen.update(ids)
+    assert total == 3 * (8 * 100_000 + 4)
+    assert len(seen) == total
@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func
+
+from app.models import InventoryLog, Order, Product, SellerProfile
+from tests.conftest import login
+
+
+def order(client, product, quantity=1, **extra):
+    return client.post("/orders/", json={"items": [{"productId": product.id, "quantity": quantity, **extra}]})
+
+
+def test_place_order_reserves_stock(client, make_user, make_seller, make_product, db):
+    buyer = make_user("buyer@example.com")
+    product = make_product(make_seller("seller@example.com"), stock=10)
+
+    response = order(login(client, buyer), product, quantity=3, unitPrice=product.price)
+
+    assert response.status_code == 201
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 7
+
+
+def test_cancelling_an_order_releases_its_stock(client, make_user, make_seller, make_product, db):
+    buyer = make_user("buyer@example.com")
+    product = make_product(make_seller("seller@example.com"), stock=3)
+    order_id = order(login(client, buyer), product, quantity=3).get_json()["id"]
+
+    response = client.patch(f"/orders/{order_id}/status", json={"status": "CANCELLED"})
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    product = db.session.get(Product, product.id)
+    assert (product.stock, product.in_stock, product.order_count) == (3, True, 0)
+    assert sorted(log.change for log in InventoryLog.query.filter_by(product_id=product.id)) == [-3, 3]
+    assert client.patch(f"/orders/{order_id}/status", json={"status": "CANCELLED"}).status_code == 409
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 3
+
+
+@pytest.mark.parametrize("price", ["abc", [], {"x": 1}])
+def test_non_numeric_unit_price_is_rejected(client, make_user, make_seller, make_product, price):
+    buyer = make_user("buyer@example.com")
+    product = make_product(make_seller("seller@example.com"))
+
+    response = order(login(client, buyer), product, unitPrice=price)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "unitPrice must be a number"}
+
+
+@pytest.mark.slow
+def test_concurrent_orders_for_one_seller(app, make_user, make_seller, make_product, db, postgres_only):
+    """Load: sustained concurrent orders against one seller's products.
+
+    Buyers race for the same rows; the run must neither oversell nor lose
+    an order, and must keep up with tens of orders per second for the seller.
+    """
+    seller = make_seller("seller@example.com")
+    products = [make_product(seller, name=f"P{i}", stock=300) for i in range(3)]
+    buyers = [make_user(f"buyer{i}@example.com") for i in range(16)]
+    product_ids = [p.id for p in products]
+    seller_id = seller.id
+    stop_at = time.monotonic() + 5
+    placed, rejected = [], []
+    lock = threading.Lock()
+
+    clients = [login(app.test_client(), buyer) for buyer in buyers]
+
+    def buyer_loop(client, index):
+        n = 0
+        while time.monotonic() < stop_at:
+            items = [{"productId": product_ids[(index + n) % 3], "quantity": 2},
+                     {"productId": product_ids[(index + n + 1) % 3], "quantity": 1}]
+            response = client.post("/orders/", json={"items": items})
+            with lock:
+                (placed if response.status_code == 201 else rejected).append(response)
+            n += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(len(buyers)) as pool:
+        list(pool.map(buyer_loop, clients, range(len(clients))))
+    elapsed = time.monotonic() - started
+
+    assert all(r.status_code == 409 for r in rejected), [r.get_json() for r in rejected if r.status_code != 409]
+    db.session.expire_all()
+    reserved = -db.session.query(func.sum(InventoryLog.change)).scalar()
+    remaining = db.session.query(func.sum(Product.stock)).filter(Product.id.in_(product_ids)).scalar()
+    assert remaining >= 0
+    assert reserved + remaining == 900
+    assert db.session.query(Order).count() == len(placed)
+    assert len({r.get_json()["orderNumber"] for r in placed}) == len(placed)
+    assert db.session.get(SellerProfile, seller_id).total_orders == len(placed)
+
+    rate = len(placed) / elapsed
+    print(f"{len(placed)} orders ({len(rejected)} rejected for stock) in {elapsed:.1f}s: {rate:.0f} orders/s")
+    assert rate >= 20
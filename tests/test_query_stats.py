@@ -0,0 +1,85 @@
+import pytest
+
+from app.models import Category, Inquiry, ProductType, User
+from app.utils.query_stats import assert_max_queries
+from tests.conftest import login
+
+PAGE = 5  # rows per endpoint, enough for an N+1 to blow the budget
+
+
+@pytest.fixture
+def busy_seller(db, client, make_user, make_seller, make_product):
+    """A seller with a page's worth of inquiries, orders and chats, and some other suppliers"""
+    seller = make_seller("seller@example.com")
+    product = make_product(seller, stock=1000)
+    category = Category(name="Food")
+    db.session.add(category)
+    db.session.flush()
+    for i in range(PAGE):
+        product_type = ProductType(name=f"Type {i}", category_id=category.id)
+        other = make_seller(f"other{i}@example.com")
+        other.product_types.append(product_type)
+        seller.product_types.append(product_type)
+
+    for i in range(PAGE):
+        buyer = make_user(f"buyer{i}@example.com")
+        db.session.add(Inquiry(buyer_id=buyer.id, seller_id=seller.id, product_id=product.id, message="Hi"))
+        db.session.commit()
+        login(client, buyer)
+        assert client.post("/orders/", json={"items": [{"productId": product.id, "quantity": 1}]}).status_code == 201
+        room_id = client.post("/chats/", json={"sellerId": seller.id, "productId": product.id}).get_json()["id"]
+        for n in range(PAGE):
+            client.post(f"/chats/{room_id}/messages", json={"content": f"Message {n}"})
+
+    login(client, db.session.get(User, seller.user_id))
+    return seller, room_id
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/suppliers/{seller}/inquiries", 1),
+    ("/suppliers/{seller}/orders", 2),
+    ("/chats/", 2),
+    ("/chats/{room}/messages", 3),
+    ("/suppliers/", 4),
+])
+def test_hot_endpoints_stay_within_query_budget(client, busy_seller, path, budget):
+    seller, room_id = busy_seller
+    path = path.format(seller=seller.id, room=room_id)
+    client.get(path)  # warm the identity cache, as on a second request
+
+    with assert_max_queries(budget):
+        response = client.get(path)
+
+    assert response.status_code == 200
+
+
+def test_assert_max_queries_reports_repeated_statements(make_user):
+    user_ids = [make_user(f"user{i}@example.com").id for i in range(3)]
+
+    with pytest.raises(AssertionError, match=r"3 queries, expected at most 2. Repeated:\n  3x SELECT"):
+        with assert_max_queries(2):
+            for user_id in user_ids:
+                User.query.filter_by(id=user_id).first()
+
+
+@pytest.mark.parametrize("setting, sent", [
+    (None, True),  # TESTING is on in the test app
+    (False, False),
+    (True, True),
+])
+def test_server_timing_header(app, client, monkeypatch, setting, sent):
+    monkeypatch.setitem(app.config, "SQL_STATS_SERVER_TIMING", setting)
+
+    response = client.get("/suppliers/")
+
+    timing = response.headers.get("Server-Timing")
+    assert (timing is not None) == sent
+    if sent:
+        assert timing.startswith("db;dur=") and timing.endswith('desc="2 queries"')
+
+
+def test_server_timing_is_off_by_default_outside_debug_and_testing(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SQL_STATS_SERVER_TIMING", None)
+    monkeypatch.setattr(app, "testing", False)
+
+    assert "Server-Timing" not in client.get("/suppliers/").headers
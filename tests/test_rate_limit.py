@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils import rate_limit as rate_limit_module
+from app.utils.rate_limit import MemoryBackend, PostgresBackend, rate_limit
+
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit_module, "_backend", MemoryBackend())
+
+
+def test_bucket_refuses_past_capacity(app, limited):
+    view = rate_limit("test", per_ip="2/minute", per_account="10/minute")(lambda: "ok")
+
+    with app.test_request_context(json={"email": "a@example.com"}, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        results = [view() for _ in range(3)]
+
+    assert results[:2] == ["ok", "ok"]
+    assert results[2].status_code == 429
+    assert 1 <= int(results[2].headers["Retry-After"]) <= 30
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_keys=2)
+    backend.take("a", 1, 1)
+    backend.take("b", 1, 1)
+    backend.take("a", 1, 1)
+    backend.take("c", 1, 1)
+
+    assert list(backend._buckets) == ["a", "c"]
+
+
+def per_call_us(fn, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+@pytest.mark.slow
+def test_rate_limit_overhead(app, limited):
+    """Benchmark: what @rate_limit adds to a request, in microseconds per call.
+
+    Checks one per-IP and one per-account bucket on the memory backend, alone
+    and with 8 threads contending for its lock; the floor only catches a
+    regression by an order of magnitude.
+    """
+    calls = 50000
+
+    def bare():
+        return "ok"
+
+    view = rate_limit("bench", per_ip="1000000000/second", per_account="1000000000/second")(bare)
+
+    with app.test_request_context(json={"email": "a@example.com"}, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        view()  # parses and caches the JSON body, as the view itself would
+        overhead = per_call_us(view, calls) - per_call_us(bare, calls)
+
+    def contended(index):
+        with app.test_request_context(json={"email": f"{index}@example.com"}):
+            return per_call_us(view, calls // 8)
+
+    with ThreadPoolExecutor(8) as pool:
+        threaded = max(pool.map(contended, range(8)))
+
+    print(f"@rate_limit overhead: {overhead:.1f}us per call; "
+          f"{threaded:.1f}us wall time per call in each of 8 threads sharing the GIL")
+    assert overhead < 100
+
+
+@pytest.mark.slow
+def test_postgres_rate_limit_latency(app, db, postgres_only):
+    """Benchmark: one shared-bucket check on the Postgres backend, in microseconds"""
+    backend = PostgresBackend(db.engine)
+    backend.take("bench:warmup", 10, 1)
+    latency = per_call_us(lambda: backend.take("bench:ip:10.0.0.1", 1000000000, 1000000000), 500)
+
+    print(f"postgres rate-limit check: {latency:.0f}us")
+    assert latency < 20000
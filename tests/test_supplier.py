@@ -0,0 +1,123 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import Config
+from app.models import Inquiry, SellerProfile, User
+from app.routes import supplier
+from tests.conftest import login
+
+
+@pytest.fixture
+def inquiries(db, make_user, make_seller):
+    buyer = make_user("buyer@example.com")
+    seller = make_seller("seller@example.com")
+    seller.unread_messages = 2
+    rows = [Inquiry(buyer_id=buyer.id, seller_id=seller.id, message=f"Inquiry {i}") for i in range(2)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return seller, rows
+
+
+def test_mark_inquiries_read(client, db, inquiries):
+    seller, rows = inquiries
+    login(client, db.session.get(User, seller.user_id))
+
+    response = client.post(f"/suppliers/{seller.id}/inquiries/read", json={"ids": [str(rows[0].id)]})
+
+    assert response.get_json() == {"updated": 1}
+    db.session.expire_all()
+    assert db.session.get(SellerProfile, seller.id).unread_messages == 1
+
+
+def test_mark_all_inquiries_read(client, db, inquiries):
+    seller, _ = inquiries
+    login(client, db.session.get(User, seller.user_id))
+
+    assert client.post(f"/suppliers/{seller.id}/inquiries/read", json={"all": True}).get_json() == {"updated": 2}
+    assert client.post(f"/suppliers/{seller.id}/inquiries/read", json={"all": True}).get_json() == {"updated": 0}
+
+    db.session.expire_all()
+    assert db.session.get(SellerProfile, seller.id).unread_messages == 0
+    assert not Inquiry.query.filter_by(is_read=False).count()
+
+
+@pytest.mark.parametrize("ids", [["abc"], [None], [[1]], [{"id": 1}]])
+def test_mark_inquiries_read_rejects_non_numeric_ids(client, db, inquiries, ids):
+    seller, _ = inquiries
+    login(client, db.session.get(User, seller.user_id))
+
+    response = client.post(f"/suppliers/{seller.id}/inquiries/read", json={"ids": ids})
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Inquiry ids must be integers"}
+
+
+def png():
+    image = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(image, "PNG")
+    return image.getvalue()
+
+
+@pytest.fixture
+def seller_client(client, db, make_seller, monkeypatch):
+    seller = make_seller("seller@example.com")
+    # Variants render in a process pool that would outlive the test's tables
+    client.rendered = []
+    monkeypatch.setattr(supplier, "submit_variants", lambda app, key: client.rendered.append(key))
+    return login(client, db.session.get(User, seller.user_id))
+
+
+def upload_raw(client, body, content_type="image/png"):
+    return client.post("/suppliers/upload-image", data=body, content_type=content_type)
+
+
+def upload_form(client, body):
+    return client.post("/suppliers/upload-image", data={"image": (io.BytesIO(body), "photo.png")},
+                       content_type="multipart/form-data")
+
+
+@pytest.mark.parametrize("upload", [upload_raw, upload_form])
+def test_upload_image_stores_an_image(seller_client, upload):
+    response = upload(seller_client, png())
+
+    assert response.status_code == 201
+    assert response.get_json()["url"].endswith(".png")
+    assert len(seller_client.rendered) == 1
+
+
+@pytest.mark.parametrize("upload", [upload_raw, upload_form])
+def test_upload_image_rejects_non_images(seller_client, upload):
+    response = upload(seller_client, b"%PDF-1.7 " + b"x" * 1024)
+
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("upload", [upload_raw, upload_form])
+def test_upload_image_rejects_declared_oversize_bodies(app, seller_client, upload, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 4096)
+
+    assert upload(seller_client, png() + b"\x00" * 8192).status_code == 413
+
+
+@pytest.mark.parametrize("upload", [upload_raw, upload_form])
+def test_upload_image_rejects_oversize_images_while_streaming(seller_client, upload, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_IMAGE_UPLOAD_BYTES", 4096)
+
+    assert upload(seller_client, png() + b"\x00" * 8192).status_code == 413
+
+
+def test_multipart_non_image_is_rejected_before_the_body_is_read(seller_client):
+    boundary = "b0undary"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"a.png\"\r\n"
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + b"%PDF-1.7 " + b"x" * (4 * 1024 * 1024) + f"\r\n--{boundary}--\r\n".encode()
+    stream = io.BytesIO(body)
+
+    response = seller_client.post("/suppliers/upload-image", input_stream=stream, content_length=len(body),
+                                  content_type=f"multipart/form-data; boundary={boundary}")
+
+    assert response.status_code == 415
+    assert stream.tell() < 1024 * 1024  # the parser stopped on the first chunk
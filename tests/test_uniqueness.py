@@ -0,0 +1,31 @@
+from app.services.uniqueness import UniquenessFilter
+
+
+def test_filter_rebuilds_in_the_background(app, db, make_user):
+    make_user("taken@example.com")
+    bloom = UniquenessFilter(rebuild_interval=3600)
+
+    assert bloom.might_contain("email", "free@example.com")  # no filter yet: ask the database
+    rebuild = bloom._rebuild
+    bloom.add("email", "flushed-during-rebuild@example.com")
+    rebuild.join(10)
+
+    assert bloom.might_contain("email", "taken@example.com")
+    assert bloom.might_contain("email", "flushed-during-rebuild@example.com")
+    assert not bloom.might_contain("email", "free@example.com")
+    assert bloom._rebuild is None
+
+
+def test_stale_filter_keeps_serving_while_rebuilding(app, db, make_user):
+    bloom = UniquenessFilter(rebuild_interval=3600)
+    bloom.might_contain("email", "x")
+    bloom._rebuild.join(10)
+    old = bloom._bloom
+
+    make_user("new@example.com")
+    bloom._built_at -= 7200
+    assert not bloom.might_contain("email", "new@example.com")  # answered by the old filter
+    bloom._rebuild.join(10)
+
+    assert bloom._bloom is not old
+    assert bloom.might_contain("email", "new@example.com")
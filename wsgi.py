@@ -0,0 +1,14 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+run.py stays the development server.
+"""
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import create_app
+from app.config import Config
+
+app = create_app()
+
+if Config.PROXY_FIX_X_FOR:
+    # Rate limits key on request.remote_addr, which must be the client, not the proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR, x_proto=Config.PROXY_FIX_X_FOR)